@@ -1,70 +1,550 @@
+import time
+
+_import_started = time.perf_counter()
+
 import logging
-import sys
-from flask import Flask, request, jsonify
+import uuid
+import contextvars
+import threading
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from limits import parse as parse_limit
 import os
 import requests
-from github import Github
-import google.generativeai as genai
 from dotenv import load_dotenv
 import json
 import re
+import copy
+import hashlib
+import base64
+import tempfile
+from urllib.parse import parse_qs, urlparse
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from cache import SQLiteCache, TieredCache, TTLCache
+from clients import ClientRegistry
+from ratelimit import CallShed, GitHubScheduler, QuotaExhausted
+from jobs import JobQueue, QueueFull
+from batches import BatchRunner
+from prefetch import Prefetcher
+from renderers import SectionSplicer, placeholder, render_section
+from state import LimiterStorage, SharedCache, state_from_url
+from llm import GeminiGovernor, LLMUnavailable
+from logs import configure_logging, request_id_var
+from metrics import ErrorCountingHandler, MetricsRegistry, request_stages, server_timing_header, stage, stage_totals, start_request
+from repo_index import RepoIndex, detect_stacks
+from singleflight import SingleFlight
+from prompts import (PromptTemplate, PromptTooLarge, TokenCounter, compact_json, fit_values, merge_reports, minify,
+                     report as compaction_report, trim_text)
+from markdown_sections import find_target_sections, join_sections, replace_section, section_diff, split_sections
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# Logging is configured by create_app(); records are queued and written by a background
+# thread, to stdout (for platforms like Render) and to a rotating file for local debugging
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+log_listener = None
+
+# Prometheus-style metrics for this worker process, served at /api/metrics
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'Time to produce a response, by route')
+metrics.describe('github_request_seconds', 'Duration of GitHub API calls, by operation')
+metrics.describe('gemini_request_seconds', 'Duration of Gemini calls, by operation')
+metrics.describe('detect_project_type_seconds', 'Time spent classifying a repository')
+metrics.describe('gemini_tokens_total', 'Gemini tokens used, by kind (prompt or response)')
+metrics.describe('gemini_prompt_chars', 'Size of prompts sent to Gemini, in characters',
+                 buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000))
+metrics.describe('sections_rendered_total', 'README sections rendered from repository metadata without a model call, by section')
+metrics.describe('prompt_tokens_saved_total', 'Prompt tokens saved by compaction and trimming, by prompt kind')
+metrics.describe('prompt_trimmed_total', 'Prompts whose user content was trimmed to the token budget, by kind')
+metrics.describe('errors_total', 'Errors logged by the application, by exception type')
+logger.addHandler(ErrorCountingHandler(metrics))
+
+# Add a Server-Timing header breaking each response down by stage
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+# Import the Gemini and GitHub client libraries and build the model at startup instead of
+# on first use. With `gunicorn --preload` this happens once, before workers are forked.
+PRELOAD_CLIENTS = os.getenv('PRELOAD_CLIENTS', 'false').lower() in ('1', 'true', 'yes')
 
-# Configure logging
-# Log to a file for local debugging
-log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend_debug.log')
-logging.basicConfig(filename=log_file_path, level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-# Also log to stdout for platforms like Render
-app.logger.addHandler(logging.StreamHandler(sys.stdout))
-app.logger.setLevel(logging.INFO)
+# Time spent in each startup step, in milliseconds, reported by /api/stats
+startup_report = {}
 
+# All routes live on this blueprint; create_app() registers it on a new app
+api = Blueprint('api', __name__)
 
-# Set up rate limiting
+# Rate limit counters and caches live in each worker process by default (memory://), so
+# with N workers every limit is N times as loose and each worker warms its own caches.
+# sqlite:///path/to/state.db shares them between the workers on one host, and
+# redis://host:port/db between hosts.
+SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', 'memory://')
+shared_state = state_from_url(SHARED_STATE_URL)
+
+def make_cache(namespace, maxsize, ttl):
+    """A TTLCache for this process, or a cache in the shared state backend when one is configured"""
+    if shared_state.shared:
+        return SharedCache(shared_state, namespace, ttl=ttl)
+    return TTLCache(maxsize=maxsize, ttl=ttl)
+
+# Set up rate limiting; the limiter is attached to the app in create_app()
 limiter = Limiter(
     get_remote_address,
-    app=app,
     default_limits=["500 per day", "200 per hour"],
-    storage_uri="memory://",
+    storage_uri=f"{LimiterStorage.STORAGE_SCHEME[0]}://" if shared_state.shared else "memory://",
+    storage_options={'state': shared_state} if shared_state.shared else {},
+    enabled=os.getenv('RATELIMIT_ENABLED', 'true').lower() != 'false',
 )
 
-# Set up CORS
-frontend_origins = os.getenv("FRONTEND_ORIGINS")
-app.logger.info(f"CORS Check: FRONTEND_ORIGINS environment variable is set to: '{frontend_origins}'")
+# README generations per client, shared by every route that starts one
+GENERATION_LIMIT = os.getenv('GENERATION_LIMIT', '60 per hour')
+generation_limit = limiter.shared_limit(lambda: GENERATION_LIMIT, scope='generation')
+# Batches are charged one generation per repository against a limit of their own, sized for
+# whole organizations, so a batch neither starves nor is starved by interactive generation
+BATCH_GENERATION_LIMIT = os.getenv('BATCH_GENERATION_LIMIT', '1000 per day')
 
-if frontend_origins:
-    origins = [origin.strip() for origin in frontend_origins.split(',')]
-else:
-    # Default to allowing localhost for development if not set
-    origins = ["http://localhost:3000", "http://localhost:5001"]
+def charge_generations(count, limit=None, scope='generation'):
+    """Spend count generations from one of the client's limits, returning seconds to wait if too few are left"""
+    if not limiter.enabled or count <= 0:
+        return None
+    item, identifiers = parse_limit(limit or GENERATION_LIMIT), (get_remote_address(), scope)
+    if not limiter.limiter.test(item, *identifiers, cost=count):
+        reset_time = limiter.limiter.get_window_stats(item, *identifiers).reset_time
+        return max(int(reset_time - time.time()), 1)
+    limiter.limiter.hit(item, *identifiers, cost=count)
+    return None
 
-app.logger.info(f"CORS Check: Flask-CORS is configured with the following origins: {origins}")
+# Configure Gemini AI
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT')
 
-CORS(app, resources={r"/api/*": {"origins": origins}})
+# google.generativeai takes most of the import time, so the model is built on first use
+model = None
+_model_lock = threading.Lock()
 
-# Configure Gemini AI
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-1.5-flash')
+def get_model():
+    """Return the Gemini model, importing and configuring the client library on first use"""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                started = time.perf_counter()
+                import google.generativeai as genai
+                if GEMINI_API_ENDPOINT:
+                    # A non-default endpoint (e.g. a local stub for benchmarks) is reached over REST
+                    genai.configure(api_key=os.getenv('GEMINI_API_KEY'), transport='rest',
+                                    client_options={'api_endpoint': GEMINI_API_ENDPOINT})
+                else:
+                    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+                model = genai.GenerativeModel(GEMINI_MODEL)
+                startup_report['gemini_init_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return model
+
+def gemini_retryable_errors():
+    from google.api_core import exceptions as google_exceptions
+    return (google_exceptions.TooManyRequests, google_exceptions.ServerError, ConnectionError, TimeoutError)
+
+# Every model call goes through the governor: a cap on calls in flight, a deadline per call,
+# retries with backoff for rate limits and server errors, and a circuit breaker
+llm_governor = GeminiGovernor(
+    max_concurrent=int(os.getenv('GEMINI_MAX_CONCURRENT', 8)),
+    timeout=float(os.getenv('GEMINI_TIMEOUT', 60)),
+    retries=int(os.getenv('GEMINI_RETRIES', 2)),
+    failure_threshold=int(os.getenv('GEMINI_CIRCUIT_THRESHOLD', 5)),
+    reset_timeout=float(os.getenv('GEMINI_CIRCUIT_RESET', 30)),
+    retryable_errors=gemini_retryable_errors,
+)
+
+# Prompts are compacted and user content is trimmed to fit this many tokens.
+# PROMPT_TOKEN_COUNTER=model counts with the model's count_tokens call (one request per
+# count); the default estimates from length, calibrated on the token counts Gemini reports.
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 16000))
+token_counter = TokenCounter()
+if os.getenv('PROMPT_TOKEN_COUNTER', 'estimate').lower() == 'model':
+    token_counter.exact = lambda text: get_model().count_tokens(text).total_tokens
+
+# 'document' asks for the whole README in one call; 'sections' generates each section in parallel
+README_GENERATION_MODE = os.getenv('README_GENERATION_MODE', 'document').lower()
+section_generation_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('SECTION_GENERATION_WORKERS', 4)),
+    thread_name_prefix='section-generation',
+)
+
+# Background generation jobs, so web workers are not held for a whole Gemini call
+job_queue = JobQueue(
+    # Outside the source tree, but shared by every worker process on the host
+    os.getenv('JOB_DB_PATH', os.path.join(tempfile.gettempdir(), 'rmgen-jobs.db')),
+    workers=int(os.getenv('JOB_WORKERS', 2)),
+    max_pending=int(os.getenv('JOB_QUEUE_MAX', 20)),
+    ttl=int(os.getenv('JOB_TTL', 3600)),
+)
+# Longest a status request may long-poll, in seconds. It holds a web worker meanwhile, so
+# it is kept short; clients poll again for jobs that take longer.
+JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', 2))
+
+# Bulk README generation across many repositories, with progress kept next to the jobs
+batch_runner = BatchRunner(
+    job_queue.path,
+    inspect_workers=int(os.getenv('BATCH_INSPECT_WORKERS', 4)),
+    generate_workers=int(os.getenv('BATCH_GENERATE_WORKERS', 2)),
+    ttl=int(os.getenv('BATCH_TTL', 7 * 86400)),
+)
+BATCH_MAX_REPOS = int(os.getenv('BATCH_MAX_REPOS', 500))
+
+def batch_max_repos():
+    """The most repositories a batch can hold: BATCH_MAX_REPOS, unless BATCH_GENERATION_LIMIT allows fewer"""
+    return min(BATCH_MAX_REPOS, parse_limit(BATCH_GENERATION_LIMIT).amount)
+
+if batch_max_repos() < BATCH_MAX_REPOS:
+    logger.warning(f"BATCH_MAX_REPOS is {BATCH_MAX_REPOS}, but BATCH_GENERATION_LIMIT ({BATCH_GENERATION_LIMIT}) "
+                   f"caps batches at {batch_max_repos()} repositories")
+BATCH_CONFIG_FIELDS = ('selected_sections', 'section_content', 'project_type', 'team_context', 'generation_mode',
+                       'bypass_cache')
+GITHUB_NAME_PATTERN = re.compile(r'[A-Za-z0-9_.-]{1,100}')
+
+# Speculative work started when a repository is picked in the wizard: the repository is
+# inspected and the likely sections drafted while the user answers the setup questions.
+# Each section draft is one model call out of the user's PREFETCH_BUDGET per hour.
+prefetcher = Prefetcher(
+    shared_state,
+    workers=int(os.getenv('PREFETCH_WORKERS', 2)),
+    budget=int(os.getenv('PREFETCH_BUDGET', 20)),
+    ttl=int(os.getenv('PREFETCH_TTL', 900)),
+)
+PREFETCH_SECTIONS = [section_id.strip() for section_id in os.getenv('PREFETCH_SECTIONS', 'installation,usage').split(',')
+                     if section_id.strip()]
+PREFETCH_FIELDS = ('selected_sections', 'section_content', 'project_type', 'team_context', 'generation_mode')
+
+# Generated README text keyed by a hash of the model name and the full prompt.
+# Set LLM_CACHE_DB to a file path to also keep responses on disk across restarts.
+llm_response_cache = TieredCache(
+    TTLCache(
+        maxsize=int(os.getenv('LLM_CACHE_MAXSIZE', 512)),
+        ttl=int(os.getenv('LLM_CACHE_TTL', 3600)),
+    ),
+    SQLiteCache(os.getenv('LLM_CACHE_DB'), ttl=int(os.getenv('LLM_CACHE_TTL', 3600))) if os.getenv('LLM_CACHE_DB')
+    else SharedCache(shared_state, 'llm', ttl=int(os.getenv('LLM_CACHE_TTL', 3600))) if shared_state.shared else None,
+)
 
 # GitHub API configuration
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GITHUB_GRAPHQL_URL = os.getenv('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+# 'rest' or 'graphql'; GraphQL needs GITHUB_TOKEN and collapses inspection into one request
+GITHUB_FETCH_BACKEND = os.getenv('GITHUB_FETCH_BACKEND', 'rest').lower()
+# How contributor display names are resolved: 'auto' (GraphQL batch with a token,
+# otherwise concurrent REST lookups), 'graphql', 'concurrent', or 'none' to use logins
+CONTRIBUTOR_NAMES = os.getenv('CONTRIBUTOR_NAMES', 'auto').lower()
+
+GITHUB_TIMEOUT = int(os.getenv('GITHUB_TIMEOUT', 15))
+GITHUB_POOL_SIZE = int(os.getenv('GITHUB_POOL_SIZE', 10))
+GITHUB_PAGE_SIZE = 100  # Items per page of GitHub listings, the most GitHub allows
+# PyGithub spaces each client's requests 0.25 s apart by default, which would queue every
+# GitHub call in the process behind the shared client; quotas are handled by github_scheduler
+GITHUB_REQUEST_SPACING = float(os.getenv('GITHUB_REQUEST_SPACING', 0)) or None
+
+def github_rate_limit_errors():
+    from github import RateLimitExceededException
+    return (RateLimitExceededException,)
+
+def create_github_client(token):
+    """Build a PyGithub client for a user's token, or the server client when token is None"""
+    # PyGithub is imported on first use rather than at startup
+    from github import Github
+    if token is None:
+        token = GITHUB_TOKEN
+    options = {'base_url': GITHUB_API_URL, 'timeout': GITHUB_TIMEOUT, 'per_page': GITHUB_PAGE_SIZE, 'pool_size': GITHUB_POOL_SIZE,
+               'seconds_between_requests': GITHUB_REQUEST_SPACING}
+    if token:
+        return Github(token, **options)
+    return Github(**options)
+
+# Every GitHub call is admitted against the quota GitHub last reported for its token
+github_scheduler = GitHubScheduler(
+    low_priority_reserve=int(os.getenv('GITHUB_LOW_PRIORITY_RESERVE', 200)),
+    rate_limit_errors=github_rate_limit_errors,
+)
+
+def quota_key(token=None):
+    """Label a token for quota accounting without exposing it"""
+    return 'server' if token is None else 'user:' + hashlib.sha256(token.encode('utf-8')).hexdigest()[:12]
+
+def github_stage(operation):
+    return stage(metrics, 'github_request', f'github-{operation}', operation=operation)
 
-def validate_github_repo(owner, repo_name):
-    """Validate GitHub repository and fetch metadata"""
+def github_call(key, operation, fn, *args, priority='high'):
+    """Make a scheduled GitHub call, timing it as the given operation"""
+    with github_stage(operation):
+        return github_scheduler.call(key, fn, *args, priority=priority)
+
+# Reusable GitHub clients and a keep-alive HTTP session shared by all requests
+github_clients = ClientRegistry(
+    create_github_client,
+    pool_size=GITHUB_POOL_SIZE,
+    max_user_clients=int(os.getenv('GITHUB_USER_CLIENTS_MAX', 128)),
+)
+
+# Repository listings per OAuth token (keyed by a digest of the token)
+user_repos_cache = make_cache(
+    'user_repos',
+    maxsize=int(os.getenv('REPO_LIST_CACHE_MAXSIZE', 256)),
+    ttl=int(os.getenv('REPO_LIST_CACHE_TTL', 300)),
+)
+REPO_LIST_MAX_PER_PAGE = 100
+# Seconds after which a listing is fetched again in full, however often it was revalidated
+REPO_LIST_MAX_AGE = int(os.getenv('REPO_LIST_MAX_AGE', 3600))
+
+# Validated repository metadata, shared by every request in this process (or every worker, with SHARED_STATE_URL)
+repo_metadata_cache = make_cache(
+    'repo_metadata',
+    maxsize=int(os.getenv('REPO_CACHE_MAXSIZE', 256)),
+    ttl=int(os.getenv('REPO_CACHE_TTL', 300)),
+)
+
+# Display names of contributor logins; these rarely change, so they are kept for a day
+contributor_name_cache = make_cache(
+    'contributor_names',
+    maxsize=int(os.getenv('CONTRIBUTOR_NAME_CACHE_MAXSIZE', 4096)),
+    ttl=int(os.getenv('CONTRIBUTOR_NAME_CACHE_TTL', 86400)),
+)
+
+# Recursive file trees keyed by repository and commit SHA; a commit's tree never changes,
+# so an unchanged repository's tree is fetched once and kept until it is evicted. Indexes
+# are large Python objects, so this cache always stays in the process.
+repo_tree_cache = TTLCache(
+    maxsize=int(os.getenv('REPO_TREE_CACHE_MAXSIZE', 64)),
+    ttl=int(os.getenv('REPO_TREE_CACHE_TTL', 86400)),
+)
+EMPTY_TREE_INDEX = RepoIndex(None, {})
+
+# README contents by repository and blob SHA, fetched on demand by /api/repo-readme.
+# Blobs are immutable, so entries never go stale; the TTL only bounds memory use.
+readme_cache = make_cache(
+    'readmes',
+    maxsize=int(os.getenv('README_CACHE_MAXSIZE', 128)),
+    ttl=int(os.getenv('README_CACHE_TTL', 86400)),
+)
+BLOB_SHA_PATTERN = re.compile(r'[0-9a-f]{40}|[0-9a-f]{64}')
+
+# Concurrent lookups of the same repository, and concurrent identical prompts, wait for
+# one upstream call and share its result (e.g. when a link is shared in a team channel)
+repo_flights = SingleFlight()
+llm_flights = SingleFlight()
+
+# Bounded pool for the independent GitHub sub-requests made while inspecting a repository
+github_fetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('GITHUB_FETCH_WORKERS', 8)),
+    thread_name_prefix='github-fetch',
+)
+
+def repo_not_modified(owner, repo_name, etag, token=None):
+    """Revalidate a cached repository with a conditional request (304s are free)"""
+    key = quota_key(token)
+    github_scheduler.admit(key)
+    headers = {'Accept': 'application/vnd.github+json', 'If-None-Match': etag}
+    if token or GITHUB_TOKEN:
+        headers['Authorization'] = f'Bearer {token or GITHUB_TOKEN}'
     try:
-        if GITHUB_TOKEN:
-            g = Github(GITHUB_TOKEN)
-        else:
-            g = Github()
-        
-        repo = g.get_repo(f"{owner}/{repo_name}")
+        with github_stage('revalidate_repo'):
+            response = github_clients.session.get(f"{GITHUB_API_URL}/repos/{owner}/{repo_name}", headers=headers, timeout=GITHUB_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Conditional request for {owner}/{repo_name} failed: {e}")
+        return False
+    github_scheduler.record_headers(key, response.headers)
+    return response.status_code == 304
+
+def validate_github_repo(owner, repo_name, token=None):
+    """Validate GitHub repository and fetch metadata, serving repeat lookups from cache.
+
+    A user's OAuth token, when given, is used instead of the server token so the
+    lookup spends the user's quota. Raises QuotaExhausted if that token is out of quota.
+    """
+    cache_key = f"{owner}/{repo_name}".lower()
+    for key in (cache_key, private_repo_key(cache_key, token)):
+        metadata = repo_metadata_cache.get(key) if key else None
+        if metadata is not None:
+            return {'valid': True, 'metadata': copy.deepcopy(metadata)}
+
+    (result, fetched_with), shared = repo_flights.do(cache_key, _lookup_github_repo, cache_key, owner, repo_name, token)
+    if shared and fetched_with not in (None, quota_key(token)):
+        # The shared lookup was made with someone else's token and its result may
+        # not apply to this caller (a private repository, or one it could not see)
+        (result, _), shared = repo_flights.do((cache_key, quota_key(token)), _lookup_github_repo,
+                                              cache_key, owner, repo_name, token)
+    return copy.deepcopy(result) if shared else result
+
+def private_repo_key(cache_key, token):
+    """Cache key for a private repository's metadata, which only the token that fetched it may reuse"""
+    return f"{quota_key(token)}:{cache_key}" if token else None
+
+def _lookup_github_repo(cache_key, owner, repo_name, token):
+    """Revalidate or fetch a repository that missed the cache.
+
+    Returns (result, fetched_with): fetched_with is None when the result may be
+    shared with any caller, otherwise the quota key of the token that fetched it.
+    """
+    # An expired entry can still be reused if GitHub says the repo is unchanged
+    private_key = private_repo_key(cache_key, token)
+    for key, fetched_with in ((cache_key, None), (private_key, quota_key(token))):
+        stale = repo_metadata_cache.peek(key) if key else None
+        if stale and stale[1] and repo_not_modified(owner, repo_name, stale[1], token):
+            repo_metadata_cache.refresh(key)
+            return {'valid': True, 'metadata': copy.deepcopy(stale[0])}, fetched_with
+
+    result = fetch_github_repo(owner, repo_name, token)
+    private = result.pop('private', False)
+    if result['valid']:
+        # Add owner and repo_name to metadata for later use
+        result['metadata']['owner'] = owner
+        result['metadata']['repo_name'] = repo_name
+        etag = result.pop('etag', None)
+        # Results missing shed resources are not cached, and private repos fetched
+        # with a user's token are cached for that token alone, so generate requests
+        # that refer to the repository do not inspect it again
+        partial = result.pop('partial', False)
+        if not partial:
+            key = private_key if token and private else cache_key
+            repo_metadata_cache.set(key, copy.deepcopy(result['metadata']), etag=etag)
+    return result, None if result['valid'] and not private else quota_key(token)
+
+def github_rest_get(path, operation, token=None, params=None, priority='high'):
+    """GET a GitHub REST resource over the shared session and return its JSON body"""
+    key = quota_key(token)
+    github_scheduler.admit(key, priority)
+    headers = {'Accept': 'application/vnd.github+json'}
+    if token or GITHUB_TOKEN:
+        headers['Authorization'] = f'Bearer {token or GITHUB_TOKEN}'
+    with github_stage(operation):
+        response = github_clients.session.get(f"{GITHUB_API_URL}{path}", headers=headers, params=params,
+                                              timeout=GITHUB_TIMEOUT)
+    github_scheduler.record_headers(key, response.headers)
+    response.raise_for_status()
+    return response.json()
+
+def cached_tree_index(owner, repo_name, sha, fetch_tree):
+    """Return the index of a commit's recursive tree, calling fetch_tree(sha) only on a cache miss"""
+    cache_key = f"{owner}/{repo_name}@{sha}".lower()
+    index = repo_tree_cache.get(cache_key)
+    if index is None:
+        index = RepoIndex.from_tree(sha, fetch_tree(sha))
+        repo_tree_cache.set(cache_key, index)
+    return index
+
+def _fetch_tree_index(key, owner, repo_name, repo):
+    """Index the default branch's tree; only the branch head is looked up for a known commit"""
+    ref = github_call(key, 'ref', repo.get_git_ref, f"heads/{repo.default_branch}")
+    return cached_tree_index(owner, repo_name, ref.object.sha,
+                             lambda sha: github_call(key, 'tree', repo.get_git_tree, sha, True).raw_data)
+
+def _submit(fn, *args, **kwargs):
+    """Run fn on the fetch pool in a copy of this context, so its timings reach the request"""
+    return github_fetch_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def _future_result(future, default, resource):
+    """Return a sub-request's result, or a default if that resource could not be fetched"""
+    try:
+        return future.result()
+    except QuotaExhausted:
+        raise
+    except Exception as e:
+        logger.debug(f"Could not fetch {resource}: {e}")
+        return default
+
+def readme_descriptor(readme):
+    """Describe a README blob ({'path', 'sha', 'size'} or None) without its content"""
+    if not readme or not readme.get('sha'):
+        return {'present': False}
+    return {'present': True, 'path': readme['path'], 'sha': readme['sha'], 'size': readme['size']}
+
+def fetch_readme_blob(owner, repo_name, sha, token=None):
+    """Return the text of a README blob, fetching each blob at most once per token"""
+    cache_key = f"{quota_key(token)}:{owner}/{repo_name}@{sha}".lower()
+    content = readme_cache.get(cache_key)
+    if content is None:
+        blob = github_rest_get(f"/repos/{owner}/{repo_name}/git/blobs/{sha}", 'readme', token)
+        content = base64.b64decode(blob['content']).decode('utf-8', errors='replace')
+        readme_cache.set(cache_key, content)
+    return content
+
+def _fetch_contributors(repo):
+    return list(repo.get_contributors()[:10])  # Top 10 contributors
+
+def _fetch_contributor_names_graphql(logins, token=None):
+    """Look up display names for many users with one aliased GraphQL query.
+
+    Logins that do not resolve to a user, such as bots, get None like users without a name.
+    """
+    params = ', '.join(f'$l{i}: String!' for i in range(len(logins)))
+    fields = ' '.join(f'u{i}: user(login: $l{i}) {{ name }}' for i in range(len(logins)))
+    data = github_graphql(f'query({params}) {{ {fields} }}', {f'l{i}': login for i, login in enumerate(logins)},
+                          token=token, priority='low')
+    return {login: (data.get(f'u{i}') or {}).get('name') for i, login in enumerate(logins)}
+
+def _fetch_contributor_names_concurrently(contributors, token=None):
+    """Resolve display names with one /users/{login} request per contributor, in parallel"""
+    futures = {
+        c.login: _submit(github_call, quota_key(token), 'user', lambda c=c: c.name, priority='low')
+        for c in contributors
+    }
+    names = {}
+    for login, future in futures.items():
+        try:
+            names[login] = future.result()
+        except Exception as e:
+            logger.debug(f"Could not fetch name for {login}: {e}")
+    return names
+
+def enrich_contributors(contributors, token=None):
+    """Attach display names to contributors, reusing names cached from earlier requests"""
+    mode = CONTRIBUTOR_NAMES
+    if mode == 'auto':
+        mode = 'graphql' if token or GITHUB_TOKEN else 'concurrent'
+
+    names = {}
+    if mode != 'none':
+        missing = []
+        for contributor in contributors:
+            name = contributor_name_cache.get(contributor.login)
+            if name is None:
+                missing.append(contributor)
+            else:
+                names[contributor.login] = name
+        if missing:
+            try:
+                if mode == 'graphql':
+                    fetched = _fetch_contributor_names_graphql([c.login for c in missing], token)
+                else:
+                    fetched = _fetch_contributor_names_concurrently(missing, token)
+            except Exception as e:
+                logger.warning(f"Could not fetch contributor names: {e}")
+                fetched = {}
+            for login, name in fetched.items():
+                # Users without a display name are cached as '' so they are not looked up again
+                contributor_name_cache.set(login, name or '')
+                names[login] = name or ''
+
+    return [{
+        'login': contributor.login,
+        'name': names.get(contributor.login) or contributor.login,
+        'contributions': contributor.contributions
+    } for contributor in contributors]
+
+def fetch_github_repo_rest(owner, repo_name, token=None):
+    """Inspect a repository in a single pass, fetching each GitHub resource at most once"""
+    try:
+        key = quota_key(token)
+        g = github_clients.github(token)
+        repo = github_call(key, 'repo', g.get_repo, f"{owner}/{repo_name}")
+
+        # The remaining resources are independent of each other, so fetch them concurrently.
+        # Topics and contributors are nice to have and are shed first when quota runs low.
+        topics = _submit(github_call, key, 'topics', repo.get_topics, priority='low')
+        tree_index = _submit(_fetch_tree_index, key, owner, repo_name, repo)
+        contributors_future = _submit(github_call, key, 'contributors', _fetch_contributors, repo, priority='low')
         
         # Safely get license
         try:
@@ -72,12 +552,7 @@ def validate_github_repo(owner, repo_name):
         except AttributeError:
             license_name = "Not specified"
 
-        # Detect team context
-        try:
-            num_contributors = repo.get_contributors().totalCount
-            detected_team_context = 'Team' if num_contributors > 1 else 'Solo'
-        except:
-            detected_team_context = 'Solo' # Default
+        contributors = enrich_contributors(_future_result(contributors_future, [], 'contributors'), token)
 
         # Get repository metadata
         metadata = {
@@ -87,92 +562,252 @@ def validate_github_repo(owner, repo_name):
             'license': license_name,
             'stars': repo.stargazers_count,
             'forks': repo.forks_count,
-            'topics': repo.get_topics(),
+            'topics': _future_result(topics, [], 'topics'),
             'default_branch': repo.default_branch,
             'created_at': repo.created_at.isoformat(),
             'updated_at': repo.updated_at.isoformat(),
-            'detected_team_context': detected_team_context
+            'detected_team_context': 'Team' if len(contributors) > 1 else 'Solo',
+            'contributors': contributors
         }
+
+        index = _future_result(tree_index, EMPTY_TREE_INDEX, 'tree')
+        # Only the README's size and blob SHA; /api/repo-readme serves its content on demand
+        metadata['readme'] = readme_descriptor(index.readme)
+        metadata['detected_project_type'], metadata['detected_stacks'] = detect_project_type({
+            'name': repo.name,
+            'description': repo.description,
+            'topics': metadata['topics'],
+            'is_template': repo.is_template,
+            'language': repo.language,
+            'index': index,
+        })
         
-        # Try to get existing README content
-        try:
-            readme = repo.get_contents("README.md")
-            metadata['existing_readme'] = readme.decoded_content.decode('utf-8')
-        except:
-            metadata['existing_readme'] = None
+        github_scheduler.record_client(key, g)
+        etag = repo.etag if isinstance(repo.etag, str) else None
+        return {
+            'valid': True,
+            'metadata': metadata,
+            'etag': etag,
+            'private': repo.private is True,
+            'partial': any(isinstance(f.exception(), CallShed) for f in (topics, contributors_future)),
+        }
         
-        # Get contributors
-        try:
-            contributors = []
-            for contributor in repo.get_contributors()[:10]:  # Top 10 contributors
-                contributors.append({
-                    'login': contributor.login,
-                    'name': contributor.name or contributor.login,
-                    'contributions': contributor.contributions
+    except QuotaExhausted:
+        raise
+    except Exception as e:
+        logger.error(f"Error validating GitHub repo: {e}", exc_info=True)
+        return {'valid': False, 'error': str(e)}
+
+REPO_INSPECTION_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+    name
+    description
+    primaryLanguage { name }
+    licenseInfo { name }
+    stargazerCount
+    forkCount
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+    defaultBranchRef {
+      name
+      target { oid ... on Commit { history(first: 100) { nodes { author { user { login name } } } } } }
+    }
+    createdAt
+    updatedAt
+    isTemplate
+    isPrivate
+    readme: object(expression: "HEAD:README.md") { ... on Blob { oid byteSize } }
+  }
+}
+"""
+
+class GraphQLError(Exception):
+    """Raised when the GitHub GraphQL API reports errors for a query"""
+
+def github_graphql(query, variables, token=None, priority='high'):
+    """Run a query against the GitHub GraphQL API and return its data"""
+    key = quota_key(token)
+    github_scheduler.admit(key, priority, resource='graphql')
+    with github_stage('graphql'):
+        response = github_clients.session.post(
+            GITHUB_GRAPHQL_URL,
+            headers={'Authorization': f'Bearer {token or GITHUB_TOKEN}'},
+            json={'query': query, 'variables': variables},
+            timeout=GITHUB_TIMEOUT,
+        )
+    github_scheduler.record_headers(key, response.headers)
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get('errors'):
+        message = '; '.join(error.get('message', 'Unknown error') for error in payload['errors'])
+        if payload.get('data') is None:
+            raise GraphQLError(message)
+        # The fields that failed (e.g. a login that is not a User) are null and the rest are usable
+        logger.warning(f"GitHub GraphQL query returned partial data: {message}")
+    return payload['data']
+
+def _isoformat(timestamp):
+    # Match the isoformat() output of the datetimes PyGithub returns
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).isoformat()
+
+def fetch_github_repo_graphql(owner, repo_name, token=None):
+    """Inspect a repository with a single GraphQL query.
+
+    GraphQL has no contributors listing, so contributions are counted over the
+    last 100 commits on the default branch rather than the whole history.
+    """
+    try:
+        repo = github_graphql(REPO_INSPECTION_QUERY, {'owner': owner, 'name': repo_name}, token=token)['repository']
+        if repo is None:
+            raise GraphQLError(f"Could not resolve to a Repository with the name '{owner}/{repo_name}'.")
+
+        branch = repo.get('defaultBranchRef') or {}
+        history = ((branch.get('target') or {}).get('history') or {}).get('nodes', [])
+        commit_counts = {}
+        for commit in history:
+            user = (commit.get('author') or {}).get('user')
+            if user:
+                entry = commit_counts.setdefault(user['login'], {
+                    'login': user['login'],
+                    'name': user.get('name') or user['login'],
+                    'contributions': 0
                 })
-            metadata['contributors'] = contributors
-        except:
-            metadata['contributors'] = []
-        
-        return {'valid': True, 'metadata': metadata}
-        
+                entry['contributions'] += 1
+        contributors = sorted(commit_counts.values(), key=lambda c: c['contributions'], reverse=True)[:10]
+
+        topics = [node['topic']['name'] for node in repo['repositoryTopics']['nodes']]
+        index = EMPTY_TREE_INDEX
+        sha = (branch.get('target') or {}).get('oid')
+        if sha:
+            # GraphQL cannot list a tree recursively, so the tree comes from the REST API
+            try:
+                index = cached_tree_index(owner, repo_name, sha, lambda sha: github_rest_get(
+                    f"/repos/{owner}/{repo_name}/git/trees/{sha}", 'tree', token, params={'recursive': 1}))
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                logger.debug(f"Could not fetch tree: {e}")
+        metadata = {
+            'name': repo['name'],
+            'description': repo.get('description') or '',
+            'language': (repo.get('primaryLanguage') or {}).get('name') or 'Unknown',
+            'license': (repo.get('licenseInfo') or {}).get('name') or 'Not specified',
+            'stars': repo['stargazerCount'],
+            'forks': repo['forkCount'],
+            'topics': topics,
+            'default_branch': branch.get('name'),
+            'created_at': _isoformat(repo['createdAt']),
+            'updated_at': _isoformat(repo['updatedAt']),
+            'detected_team_context': 'Team' if len(contributors) > 1 else 'Solo',
+            'readme': readme_descriptor(repo.get('readme') and {
+                'path': 'README.md', 'sha': repo['readme'].get('oid'), 'size': repo['readme'].get('byteSize'),
+            }),
+            'contributors': contributors
+        }
+        metadata['detected_project_type'], metadata['detected_stacks'] = detect_project_type({
+            'name': repo['name'],
+            'description': repo.get('description'),
+            'topics': topics,
+            'is_template': repo.get('isTemplate'),
+            'language': (repo.get('primaryLanguage') or {}).get('name'),
+            'index': index,
+        })
+        return {'valid': True, 'metadata': metadata, 'private': repo.get('isPrivate') is True}
+
+    except QuotaExhausted:
+        raise
     except Exception as e:
-        app.logger.error(f"Error validating GitHub repo: {e}", exc_info=True)
+        logger.error(f"Error validating GitHub repo via GraphQL: {e}", exc_info=True)
         return {'valid': False, 'error': str(e)}
 
-def detect_project_type(metadata):
-    """Attempt to auto-detect project type based on repository content"""
+REPO_FETCH_BACKENDS = {
+    'rest': fetch_github_repo_rest,
+    'graphql': fetch_github_repo_graphql,
+}
+
+def fetch_github_repo(owner, repo_name, token=None):
+    """Fetch repository metadata with the configured backend"""
+    backend = GITHUB_FETCH_BACKEND
+    if backend not in REPO_FETCH_BACKENDS:
+        logger.warning(f"Unknown GITHUB_FETCH_BACKEND '{backend}', falling back to REST")
+        backend = 'rest'
+    elif backend == 'graphql' and not (token or GITHUB_TOKEN):
+        # The GraphQL API does not allow anonymous access
+        backend = 'rest'
+    return REPO_FETCH_BACKENDS[backend](owner, repo_name, token)
+
+def detect_project_type(repo_facts):
+    """Attempt to auto-detect project type from already-fetched repository facts.
+
+    Returns (project_type, stacks), where stacks lists every stack found in the
+    repository's tree with a confidence score, most confident first.
+    """
+    with stage(metrics, 'detect_project_type', 'detect-project-type'):
+        return _detect_project_type(repo_facts)
+
+def _detect_project_type(repo_facts):
     try:
-        if GITHUB_TOKEN:
-            g = Github(GITHUB_TOKEN)
-        else:
-            g = Github()
-        
-        repo = g.get_repo(f"{metadata['owner']}/{metadata['repo_name']}")
+        stacks = detect_stacks(repo_facts.get('index') or EMPTY_TREE_INDEX)
 
         # Check for keywords in name, description, and topics
-        topics = repo.get_topics()
-        description = repo.description.lower() if repo.description else ''
-        name = repo.name.lower()
+        topics = repo_facts.get('topics') or []
+        description = (repo_facts.get('description') or '').lower()
+        name = (repo_facts.get('name') or '').lower()
         
         web_keywords = ['blog', 'website', 'portfolio', 'http', 'server', 'api', 'frontend', 'backend', 'webapp', 'web-app']
         if any(key in topics for key in web_keywords) or \
            any(key in description for key in web_keywords) or \
            any(key in name for key in web_keywords):
-            return 'Web Application'
+            return 'Web Application', stacks
         
-        if repo.is_template:
-            return 'Template'
+        if repo_facts.get('is_template'):
+            return 'Template', stacks
+
+        # Otherwise report the most confident stack found in the tree
+        if stacks:
+            return stacks[0]['type'], stacks
+
+        # If no specific files are found, use the primary language as a fallback
+        language = repo_facts.get('language')
+        if language:
+            return f"{language} Application", stacks
+        return 'Generic Project', stacks # A more neutral default than 'Template'
 
-        # Check for common files to determine project type
-        contents = repo.get_contents("")
-        file_names = [content.name.lower() for content in contents]
-        
-        if any(name in file_names for name in ['package.json', 'yarn.lock', 'webpack.config.js']):
-            return 'Web Application'
-        elif any(name in file_names for name in ['requirements.txt', 'setup.py', 'Pipfile']):
-            return 'Python Application'
-        elif any(name in file_names for name in ['pom.xml', 'build.gradle']):
-            return 'Java Application'
-        elif any(name in file_names for name in ['Cargo.toml']):
-            return 'Rust Application'
-        elif any(name in file_names for name in ['go.mod']):
-            return 'Go Application'
-        elif any(name in file_names for name in ['Dockerfile', 'docker-compose.yml']):
-            return 'Containerized Application'
-        else:
-            # If no specific files are found, use the primary language as a fallback
-            language = repo.language
-            if language:
-                return f"{language} Application"
-            else:
-                return 'Generic Project' # A more neutral default than 'Template'
-            
     except Exception as e:
-        app.logger.error(f"Error detecting project type: {e}", exc_info=True)
-        return 'Generic Project' # Also use the neutral default in case of errors
+        logger.error(f"Error detecting project type: {e}", exc_info=True)
+        return 'Generic Project', [] # Also use the neutral default in case of errors
 
-@app.route('/api/validate-repo', methods=['POST'])
+def request_token():
+    """The signed-in user's GitHub token from an `Authorization: Bearer` header, if any.
+
+    Lookups made with it spend the user's quota rather than the server's.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    return auth_header[len('Bearer '):] or None
+
+def resolve_repo_metadata(data, token=None):
+    """Expand a {'owner', 'repo_name'} reference in data['repo'] into data['repo_metadata'].
+
+    Fields sent inline in repo_metadata (e.g. a name edited by the user) take
+    precedence over the looked-up ones. If the lookup fails, the inline fields
+    are used on their own.
+    """
+    ref = data.get('repo') or {}
+    if not (ref.get('owner') and ref.get('repo_name')):
+        return data
+    try:
+        result = validate_github_repo(ref['owner'], ref['repo_name'], token)
+    except QuotaExhausted as e:
+        logger.warning(f"Could not resolve {ref['owner']}/{ref['repo_name']}: {e}")
+        return data
+    if not result['valid']:
+        logger.warning(f"Could not resolve {ref['owner']}/{ref['repo_name']}: {result.get('error')}")
+        return data
+    return dict(data, repo_metadata=dict(result['metadata'], **(data.get('repo_metadata') or {})))
+
+@api.route('/api/validate-repo', methods=['POST'])
 @limiter.limit("100 per hour")
 def validate_repository():
     """Validate GitHub repository URL or owner/repo combination"""
@@ -197,114 +832,607 @@ def validate_repository():
             return jsonify({'valid': False, 'error': 'Missing repository information'})
         
         # Validate repository
-        result = validate_github_repo(owner, repo_name)
-        
-        if result['valid']:
-            # Add owner and repo_name to metadata for later use
-            result['metadata']['owner'] = owner
-            result['metadata']['repo_name'] = repo_name
-            
-            # Auto-detect project type
-            project_type = detect_project_type({'owner': owner, 'repo_name': repo_name})
-            result['metadata']['detected_project_type'] = project_type
+        result = validate_github_repo(owner, repo_name, request_token())
         
         return jsonify(result)
         
+    except QuotaExhausted as e:
+        logger.warning(str(e))
+        response = jsonify({'valid': False, 'error': 'GitHub API rate limit exceeded, please try again later'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
     except Exception as e:
-        app.logger.error(f"Error in validate_repository: {e}", exc_info=True)
+        logger.error(f"Error in validate_repository: {e}", exc_info=True)
         return jsonify({'valid': False, 'error': str(e)})
 
-@app.route('/api/generate-readme', methods=['POST'])
-@limiter.limit("60 per hour")
+def build_project_context(data, sections):
+    """Describe the project for a prompt covering the given sections"""
+    project_type = data.get('project_type', 'Template')
+    team_context = data.get('team_context', 'Solo')
+    repo_metadata = data.get('repo_metadata', {})
+    
+    # Build project context conditionally
+    context_lines = [
+        f"- Project Type: {project_type}",
+        f"- Team Context: {team_context} (use \"I\" for Solo, \"We\" for Team)"
+    ]
+    if repo_metadata:
+        context_lines.append(f"- Repository: {repo_metadata.get('name', 'Unknown')}")
+        context_lines.append(f"- Description: {repo_metadata.get('description', 'No description provided')}")
+        context_lines.append(f"- Primary Language: {repo_metadata.get('language', 'Unknown')}")
+        stacks = repo_metadata.get('detected_stacks') or []
+        if len(stacks) > 1:
+            # Monorepos: tell the model where each part of the project lives
+            described = ', '.join(f"{stack['type']} ({', '.join(stack['paths'])})" for stack in stacks)
+            context_lines.append(f"- Stacks: {described}")
+
+    if 'license' in [section.lower() for section in sections] and repo_metadata.get('license'):
+        context_lines.append(f"- License: {repo_metadata.get('license')}")
+
+    return "\n".join(context_lines)
+
+README_PROMPT = PromptTemplate("""
+    You are an expert technical writer creating a README.md file. Your task is to generate content ONLY for the sections specified by the user.
+
+    **CRITICAL INSTRUCTIONS:**
+    1. You MUST ONLY generate the sections listed here: {sections}.
+    2. Do NOT invent or add any sections that are not in that list.
+    3. If the user has provided content for a section, use it as the primary source and enhance it.
+    4. If the user has NOT provided content, generate it based on the project context below.
+    5. When generating a project tagline or overview, be creative and do not simply repeat the project name.
+    6. Generate the output as a single, complete README.md file in Markdown format.{placeholders}
+
+    **Formatting Rules:**
+    - All section headers (e.g., `## My Header`) must be in Title Case.
+    - Do NOT leave a blank line between a section header and the content that follows it.
+
+    ---
+    **Project Context:**
+    {project_context}
+
+    ---
+    **User-Provided Content for Each Section:**
+    {section_content}
+
+    ---
+    Begin generating the README.md file now.
+    """)
+
+def prompt_report(kind, raw_prompt, prompt, trimmed=(), dropped=()):
+    """Report what compaction did to a prompt and count it in the metrics"""
+    result = compaction_report(token_counter, raw_prompt, prompt, trimmed, dropped)
+    metrics.inc('prompt_tokens_saved_total', result['tokens_saved'], kind=kind)
+    if trimmed:
+        metrics.inc('prompt_trimmed_total', kind=kind)
+    return result
+
+def render_local_sections(data):
+    """Render the selected sections that need no model call, returning {section_id: markdown}"""
+    metadata = data.get('repo_metadata') or {}
+    section_content = data.get('section_content') or {}
+    rendered = {}
+    for section_id in data.get('selected_sections', []):
+        body = render_section(section_id, metadata, section_content.get(section_id))
+        if body is not None:
+            rendered[section_id] = f"## {section_title(section_id)}\n{body}"
+            metrics.inc('sections_rendered_total', section=section_id.lower())
+    return rendered
+
+def build_readme_prompt(data, rendered=()):
+    """Build the Gemini prompt for a generate-readme request body, returning (prompt, report).
+
+    Sections in rendered are written locally; the model only places a
+    placeholder line for each, which SectionSplicer replaces.
+    """
+    # Extract all the user inputs and context
+    selected_sections = data.get('selected_sections', [])
+    model_sections = [section_id for section_id in selected_sections if section_id not in rendered]
+    section_content = data.get('section_content', {})
+    fields = {
+        'sections': ', '.join(model_sections),
+        'project_context': build_project_context(data, model_sections),
+        'placeholders': '',
+    }
+    if rendered:
+        order = ', '.join(placeholder(section_id) if section_id in rendered else section_id
+                          for section_id in selected_sections)
+        fields['placeholders'] = ('\n7. Other sections are filled in later. Write their placeholder lines exactly as '
+                                  f'given, each on its own line with no header, so everything appears in this order: {order}')
+
+    # Empty fields and content left over from deselected sections only cost tokens
+    selected = {section_id.lower() for section_id in model_sections}
+    content = {
+        section_id: minify(text if isinstance(text, str) else compact_json(text))
+        for section_id, text in section_content.items()
+        if section_id.lower() in selected and text and str(text).strip()
+    }
+    # Rendered sections are written locally, not dropped
+    dropped = [section_id for section_id in section_content if section_id not in content and section_id not in rendered]
+    labels = sum(token_counter.estimate(f'[{section_id}]\n\n\n') for section_id in content)
+    budget = PROMPT_TOKEN_BUDGET - token_counter.estimate(README_PROMPT.render(**fields, section_content='')) - labels
+    content, trimmed = fit_values(content, budget, token_counter)
+
+    # Labelled plain text rather than JSON, which escapes every newline and quote
+    blocks = '\n\n'.join(f'[{section_id}]\n{text}' for section_id, text in content.items())
+    prompt = README_PROMPT.render(**fields, section_content=blocks or 'None provided.')
+    raw_prompt = README_PROMPT.render_raw(**fields, section_content=json.dumps(section_content, indent=2))
+    return prompt, prompt_report('generate', raw_prompt, prompt, trimmed, dropped)
+
+def section_title(section_id):
+    """Title Case header text for a section id such as 'tech-stack'"""
+    return ' '.join(word.capitalize() for word in re.split(r'[-_\s]+', section_id) if word)
+
+SECTION_PROMPT = PromptTemplate("""
+    You are an expert technical writer creating one section of a README.md file.
+
+    **CRITICAL INSTRUCTIONS:**
+    1. Write ONLY the body of the "{title}" section. Do NOT include its `##` header or any other sections.
+    2. If the user has provided content for this section, use it as the primary source and enhance it.
+    3. If the user has NOT provided content, generate it based on the project context below.
+    4. Any sub-headers must use `###` or deeper and be in Title Case.
+
+    ---
+    **Project Context:**
+    {project_context}
+
+    ---
+    **User-Provided Content for This Section:**
+    {user_content}
+
+    ---
+    Begin the section body now.
+    """)
+
+def build_section_prompt(data, section_id):
+    """Build the Gemini prompt for the body of a single README section, returning (prompt, report)"""
+    raw_content = data.get('section_content', {}).get(section_id) or 'None provided.'
+    fields = {'title': section_title(section_id), 'project_context': build_project_context(data, [section_id])}
+    budget = PROMPT_TOKEN_BUDGET - token_counter.estimate(SECTION_PROMPT.render(**fields, user_content=''))
+    user_content = trim_text(minify(raw_content), budget, token_counter)
+
+    prompt = SECTION_PROMPT.render(**fields, user_content=user_content)
+    raw_prompt = SECTION_PROMPT.render_raw(**fields, user_content=raw_content)
+    trimmed = [section_id] if user_content.endswith('trimmed ...]') else []
+    return prompt, prompt_report('section', raw_prompt, prompt, trimmed)
+
+def _section_body(text):
+    # Drop a header the model added anyway and any blank lines before the content
+    lines = text.strip('\n').split('\n')
+    if lines and lines[0].lstrip().startswith('#'):
+        lines = lines[1:]
+    return '\n'.join(lines).strip()
+
+def _section_results(data, bypass_cache=False, rendered=()):
+    """Start generating the selected sections concurrently, returning (results, report).
+
+    results yields (section_id, markdown, cached) in the user's order as each
+    section becomes ready, with markdown None for a section that failed.
+    Sections in rendered are used as they are.
+    """
+    selected_sections = data.get('selected_sections', [])
+    prompts = {section_id: build_section_prompt(data, section_id)
+               for section_id in selected_sections if section_id not in rendered}
+    # Each section runs in a copy of this context, so its request id and timings reach the request
+    futures = {
+        section_id: section_generation_pool.submit(contextvars.copy_context().run, generate_text,
+                                                   prompts[section_id][0], bypass_cache=bypass_cache)
+        for section_id in prompts
+    }
+
+    def results():
+        for section_id in selected_sections:
+            if section_id in rendered:
+                yield section_id, rendered[section_id], True
+                continue
+            try:
+                text, cached = futures[section_id].result()
+            except Exception as e:
+                logger.error(f"Section '{section_id}' could not be generated: {e}")
+                yield section_id, None, False
+                continue
+            # Title Case header directly followed by the content, as in the full-document prompt
+            yield section_id, f"## {section_title(section_id)}\n{_section_body(text)}", cached
+
+    report = merge_reports([section_report for _, section_report in prompts.values()])
+    return results(), report
+
+def generate_readme_by_section(data, bypass_cache=False, rendered=()):
+    """Generate each selected section concurrently and assemble them in the user's order.
+
+    Sections are cached individually, so a retry after a failure only regenerates
+    the sections that did not succeed. Sections in rendered are used as they are.
+    Returns (content, cached, failed_sections, report).
+    """
+    results, report = _section_results(data, bypass_cache, rendered)
+    parts, failed, all_cached = [], [], True
+    for section_id, markdown, cached in results:
+        if markdown is None:
+            failed.append(section_id)
+            continue
+        all_cached = all_cached and cached
+        parts.append(markdown)
+    return '\n\n'.join(parts) + '\n', all_cached, failed, report
+
+def stream_readme_by_section(data, bypass_cache=False, rendered=()):
+    """Stream a README generated section by section as Server-Sent Events.
+
+    Each section is sent as soon as it and the sections before it are ready, so
+    sections already drafted by a prefetch arrive at once. Ends with a `done`
+    event, or an `error` event naming the sections that could not be generated.
+    """
+    results, report = _section_results(data, bypass_cache, rendered)
+
+    def generate():
+        failed, all_cached, sent = [], True, False
+        for section_id, markdown, cached in results:
+            if markdown is None:
+                failed.append(section_id)
+                continue
+            all_cached = all_cached and cached
+            yield _sse_event({'delta': ('\n\n' if sent else '') + markdown})
+            sent = True
+        if failed:
+            yield _sse_event({'error': f"Failed to generate sections: {', '.join(failed)}", 'failed_sections': failed},
+                             event='error')
+            return
+        yield _sse_event({'delta': '\n'})
+        yield _sse_event({'cached': all_cached, 'prompt': report}, event='done')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+REFINE_PROMPT = PromptTemplate("""
+    You are an expert technical writer. Your task is to refine the provided README content based on the user's specific instructions.
+
+    **CRITICAL INSTRUCTIONS:**
+    1. You MUST ONLY modify the existing README content. Do NOT generate new sections unless explicitly asked by the user's prompt.
+    2. Ensure the output is a complete, valid Markdown document.
+    3. Address the user's prompt precisely. If the prompt is vague, make a reasonable interpretation.
+
+    ---
+    **Current README Content:**
+    {current_content}
+
+    ---
+    **User's Refinement Prompt:**
+    {prompt}
+
+    ---
+    Begin the refined README.md content now.
+    """)
+
+def _fit_refine_prompt(template, kind, content, prompt):
+    """Render a refinement prompt, raising PromptTooLarge rather than trimming.
+
+    The content is sent back as the refined README, so trimming it would
+    silently delete the trimmed part from the user's document.
+    """
+    text = template.render(current_content=minify(content), prompt=minify(prompt))
+    tokens = token_counter.estimate(text)
+    if tokens > PROMPT_TOKEN_BUDGET:
+        raise PromptTooLarge(tokens, PROMPT_TOKEN_BUDGET)
+    return text, prompt_report(kind, template.render_raw(current_content=content, prompt=prompt), text)
+
+def build_refine_prompt(current_content, prompt):
+    """Build the Gemini prompt for refining an existing README, returning (prompt, report)"""
+    return _fit_refine_prompt(REFINE_PROMPT, 'refine', current_content, prompt)
+
+def llm_cache_key(prompt):
+    """Content-address a prompt so identical requests share one cached response"""
+    return hashlib.sha256(f"{GEMINI_MODEL}\n{prompt}".encode('utf-8')).hexdigest()
+
+def gemini_stage(operation, prompt):
+    metrics.observe('gemini_prompt_chars', len(prompt), operation=operation)
+    return stage(metrics, 'gemini_request', f'gemini-{operation}', operation=operation)
+
+def record_token_usage(response, prompt):
+    """Count the prompt and response tokens Gemini reports for a call"""
+    usage = getattr(response, 'usage_metadata', None)
+    for kind, field in (('prompt', 'prompt_token_count'), ('response', 'candidates_token_count')):
+        count = getattr(usage, field, None)
+        if isinstance(count, int):
+            metrics.inc('gemini_tokens_total', count, kind=kind)
+            if kind == 'prompt':
+                # Keeps prompt size estimates in line with the model's tokenizer
+                token_counter.calibrate(len(prompt), count)
+
+def generate_text(prompt, bypass_cache=False):
+    """Run a prompt through Gemini, reusing the cached response for an identical prompt.
+
+    Returns a (text, cached) tuple.
+    """
+    key = llm_cache_key(prompt)
+    if bypass_cache:
+        return _generate_uncached(key, prompt), False
+
+    cached = llm_response_cache.get(key)
+    if cached is not None:
+        return cached, True
+    # Identical prompts already being generated wait for that call instead of making their own
+    text, _ = llm_flights.do(key, _generate_uncached, key, prompt)
+    return text, False
+
+def _generate_uncached(key, prompt):
+    with gemini_stage('generate', prompt):
+        response = llm_governor.generate(get_model(), prompt)
+    record_token_usage(response, prompt)
+    text = response.text
+    llm_response_cache.set(key, text)
+    return text
+
+SECTION_REFINE_PROMPT = PromptTemplate("""
+    You are an expert technical writer. Your task is to refine the provided README sections based on the user's specific instructions.
+
+    **CRITICAL INSTRUCTIONS:**
+    1. Return ONLY the sections below, in the same order, each starting with its original `##` header line exactly as given.
+    2. Do NOT add, remove or rename sections.
+    3. Ensure each section is valid Markdown.
+    4. Address the user's prompt precisely. If the prompt is vague, make a reasonable interpretation.
+
+    ---
+    **README Sections to Refine:**
+    {current_content}
+
+    ---
+    **User's Refinement Prompt:**
+    {prompt}
+
+    ---
+    Begin the refined sections now.
+    """)
+
+def build_section_refine_prompt(sections_text, prompt):
+    """Build the Gemini prompt for refining only some sections of a README, returning (prompt, report)"""
+    return _fit_refine_prompt(SECTION_REFINE_PROMPT, 'refine_sections', sections_text, prompt)
+
+def refine_readme_content(current_content, prompt, bypass_cache=False):
+    """Refine a README, sending only the sections the prompt refers to when possible.
+
+    Returns a dict with the refined content, whether it was cached, the scope
+    of the refinement ('sections' or 'document'), a section-level diff and the
+    prompt compaction report. Raises PromptTooLarge if the content does not fit.
+    """
+    sections = split_sections(current_content)
+    targets = find_target_sections(sections, prompt)
+
+    if targets:
+        targeted = [sections[index] for index in targets]
+        sections_text = join_sections(targeted)
+        section_prompt, report = build_section_refine_prompt(sections_text, prompt)
+        refined_text, cached = generate_text(section_prompt, bypass_cache=bypass_cache)
+        refined = [section for section in split_sections(refined_text.strip('\n') + '\n') if section['level'] == 2]
+        if [section['title'] for section in refined] == [section['title'] for section in targeted]:
+            new_sections = list(sections)
+            for index, section in zip(targets, refined):
+                new_sections[index] = replace_section(sections[index], section['text'])
+            return {
+                'content': join_sections(new_sections),
+                'cached': cached,
+                'scope': 'sections',
+                'diff': section_diff(sections, new_sections),
+                'prompt': report,
+            }
+        logger.warning("Section refinement did not return the requested sections; refining the whole document")
+
+    document_prompt, report = build_refine_prompt(current_content, prompt)
+    refined_content, cached = generate_text(document_prompt, bypass_cache=bypass_cache)
+    return {
+        'content': refined_content,
+        'cached': cached,
+        'scope': 'document',
+        'diff': section_diff(sections, split_sections(refined_content)),
+        'prompt': report,
+    }
+
+def llm_unavailable_response(error):
+    """Ask the client to retry once the model is expected to accept calls again"""
+    response = jsonify({'success': False, 'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def _sse_event(payload, event=None):
+    message = f"event: {event}\n" if event else ''
+    return message + f"data: {json.dumps(payload)}\n\n"
+
+def stream_model_response(prompt, bypass_cache=False, report=None, splicer=None):
+    """Stream a Gemini response to the client as Server-Sent Events.
+
+    Each chunk is sent as a `data: {"delta": ...}` message, followed by a final
+    `done` event carrying the prompt compaction report, or an `error` event if
+    generation fails part way through. A cached response is sent as a single delta.
+    With a SectionSplicer, locally rendered sections replace their placeholders as
+    they stream past; with no prompt, only those sections are sent.
+    """
+    key = llm_cache_key(prompt) if prompt is not None else None
+    cached = None if bypass_cache or key is None else llm_response_cache.get(key)
+    if cached is None and key is not None:
+        try:
+            llm_governor.check()
+        except LLMUnavailable as e:
+            return llm_unavailable_response(e)
+
+    def generate():
+        if key is None:
+            yield _sse_event({'delta': splicer.finish()})
+            yield _sse_event({'prompt': report}, event='done')
+            return
+        if cached is not None:
+            yield _sse_event({'delta': splicer.splice(cached) if splicer else cached})
+            yield _sse_event({'cached': True, 'prompt': report}, event='done')
+            return
+        try:
+            parts = []
+            chunk = None
+            with gemini_stage('stream', prompt):
+                for chunk in llm_governor.stream(get_model(), prompt):
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks that only carry safety ratings have no text
+                        continue
+                    if text:
+                        parts.append(text)
+                        delta = splicer.feed(text) if splicer else text
+                        if delta:
+                            yield _sse_event({'delta': delta})
+            if splicer:
+                tail = splicer.finish()
+                if tail:
+                    yield _sse_event({'delta': tail})
+            # Usage totals arrive with the final chunk
+            record_token_usage(chunk, prompt)
+            # Only complete responses are cached; an empty one (e.g. blocked by safety filters) is not
+            if parts:
+                llm_response_cache.set(key, ''.join(parts))
+            yield _sse_event({'prompt': report}, event='done')
+        except Exception as e:
+            logger.error(f"Error streaming Gemini response: {e}", exc_info=True)
+            yield _sse_event({'error': str(e)}, event='error')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def generation_mode(data):
+    """'document' or 'sections', as the request asks or README_GENERATION_MODE configures"""
+    return data.get('generation_mode') or README_GENERATION_MODE
+
+def plan_readme_generation(data):
+    """Render the request's data sections locally and pick how the model writes the rest.
+
+    Returns the rendered sections and 'rendered' when they are the whole README
+    (nothing is left for the model), otherwise the request's generation mode.
+    """
+    rendered = render_local_sections(data)
+    if rendered and all(section_id in rendered for section_id in data.get('selected_sections', [])):
+        return rendered, 'rendered'
+    return rendered, generation_mode(data)
+
+def generate_readme_content(data):
+    """Generate a README for a generate-readme request body, returning the response payload"""
+    bypass_cache = bool(data.get('bypass_cache'))
+    rendered, mode = plan_readme_generation(data)
+
+    if mode == 'rendered':
+        # Every section comes from repository metadata, so there is nothing for the model to write
+        generated_content, cached, report = SectionSplicer(rendered).finish(), False, merge_reports([])
+    elif mode == 'sections':
+        generated_content, cached, failed, report = generate_readme_by_section(data, bypass_cache=bypass_cache,
+                                                                               rendered=rendered)
+        if failed:
+            return {
+                'success': False,
+                'error': f"Failed to generate sections: {', '.join(failed)}",
+                'failed_sections': failed
+            }
+    else:
+        # Call Gemini API
+        prompt, report = build_readme_prompt(data, rendered)
+        generated_content, cached = generate_text(prompt, bypass_cache=bypass_cache)
+        if rendered:
+            generated_content = SectionSplicer(rendered).splice(generated_content)
+
+    return {
+        'success': True,
+        'content': generated_content,
+        'cached': cached,
+        'prompt': report,
+        'rendered_sections': list(rendered),
+    }
+
+@api.route('/api/generate-readme', methods=['POST'])
+@generation_limit
 def generate_readme():
     """Generate README content using Gemini AI"""
     try:
-        data = request.get_json()
-        
-        # Extract all the user inputs and context
-        project_type = data.get('project_type', 'Template')
-        team_context = data.get('team_context', 'Solo')
-        selected_sections = data.get('selected_sections', [])
-        section_content = data.get('section_content', {})
-        repo_metadata = data.get('repo_metadata', {})
-        
-        # Build project context conditionally
-        context_lines = [
-            f"- Project Type: {project_type}",
-            f"- Team Context: {team_context} (use \"I\" for Solo, \"We\" for Team)"
-        ]
-        if repo_metadata:
-            context_lines.append(f"- Repository: {repo_metadata.get('name', 'Unknown')}")
-            context_lines.append(f"- Description: {repo_metadata.get('description', 'No description provided')}")
-            context_lines.append(f"- Primary Language: {repo_metadata.get('language', 'Unknown')}")
-
-        if 'License' in selected_sections and repo_metadata.get('license'):
-            context_lines.append(f"- License: {repo_metadata.get('license')}")
-
-        project_context_str = "\n".join(context_lines)
-
-        prompt = f"""
-        You are an expert technical writer creating a README.md file. Your task is to generate content ONLY for the sections specified by the user.
-
-        **CRITICAL INSTRUCTIONS:**
-        1.  You MUST ONLY generate the sections listed here: {', '.join(selected_sections)}.
-        2.  Do NOT invent or add any sections that are not in that list.
-        3.  If the user has provided content for a section, use it as the primary source and enhance it.
-        4.  If the user has NOT provided content, generate it based on the project context below.
-        5.  When generating a project tagline or overview, be creative and do not simply repeat the project name.
-        6.  Generate the output as a single, complete README.md file in Markdown format.
-
-        **Formatting Rules:**
-        -   All section headers (e.g., `## My Header`) must be in Title Case.
-        -   Do NOT leave a blank line between a section header and the content that follows it.
-
-        ---
-        **Project Context:**
-        {project_context_str}
-
-        ---
-        **User-Provided Content for Each Section:**
-        {json.dumps(section_content, indent=2)}
-
-        ---
-        Begin generating the README.md file now.
-        """
-        
-        # Call Gemini API
-        response = model.generate_content(
-            prompt
-        )
-        generated_content = response.text
-        
-        return jsonify({
-            'success': True,
-            'content': generated_content
-        })
+        token = request_token()
+        data = resolve_repo_metadata(request.get_json(), token)
+        claim_prefetch(data, token)
+        return jsonify(generate_readme_content(data))
         
+    except LLMUnavailable as e:
+        return llm_unavailable_response(e)
     except Exception as e:
-        app.logger.error(f"Error generating README: {e}", exc_info=True)
+        logger.error(f"Error generating README: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/github-callback', methods=['POST'])
+@api.route('/api/generate-readme/stream', methods=['POST'])
+@generation_limit
+def generate_readme_stream():
+    """Generate README content, streaming it to the client as it is produced"""
+    try:
+        token = request_token()
+        data = resolve_repo_metadata(request.get_json(), token)
+        claim_prefetch(data, token)
+        rendered, mode = plan_readme_generation(data)
+        if mode == 'rendered':
+            prompt, report = None, merge_reports([])
+        elif mode == 'sections':
+            return stream_readme_by_section(data, bypass_cache=bool(data.get('bypass_cache')), rendered=rendered)
+        else:
+            prompt, report = build_readme_prompt(data, rendered)
+    except Exception as e:
+        logger.error(f"Error preparing README stream: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return stream_model_response(prompt, bypass_cache=bool(data.get('bypass_cache')), report=report,
+                                 splicer=SectionSplicer(rendered) if rendered else None)
+
+@api.route('/api/repo-readme', methods=['GET'])
+def get_repo_readme():
+    """Fetch a repository's README by the blob SHA validate-repo reported for it"""
+    owner = request.args.get('owner', '')
+    repo_name = request.args.get('repo_name', '')
+    sha = request.args.get('sha', '').lower()
+    if not owner or not repo_name or not BLOB_SHA_PATTERN.fullmatch(sha):
+        return jsonify({'success': False, 'error': 'Missing owner, repo_name or a valid sha'}), 400
+
+    # A blob never changes, so a client holding this SHA already has the content
+    if request.if_none_match.contains(sha):
+        response = Response(status=304)
+        response.set_etag(sha)
+        return response
+    try:
+        content = fetch_readme_blob(owner, repo_name, sha, request_token())
+    except QuotaExhausted as e:
+        logger.warning(str(e))
+        response = jsonify({'success': False, 'error': 'GitHub API rate limit exceeded, please try again later'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except requests.exceptions.HTTPError as e:
+        status = e.response.status_code if e.response is not None else 502
+        logger.warning(f"Could not fetch README {owner}/{repo_name}@{sha}: {e}")
+        return jsonify({'success': False, 'error': 'README not found'}), 404 if status in (404, 422) else 502
+    except Exception as e:
+        logger.error(f"Error fetching README: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)})
+    response = jsonify({'success': True, 'sha': sha, 'content': content})
+    response.set_etag(sha)
+    response.headers['Cache-Control'] = 'private, max-age=86400, immutable'
+    return response
+
+@api.route('/api/github-callback', methods=['POST'])
 def github_callback():
     """Exchange GitHub auth code for an access token."""
-    app.logger.debug("github_callback function called.")
+    logger.debug("github_callback function called.")
     try:
         data = request.get_json()
         code = data.get('code')
-        app.logger.debug(f"Received code: {code[:5]}...") # Print first 5 chars of code
-
         if not code:
-            app.logger.debug("No code provided.")
+            logger.debug("No code provided.")
             return jsonify({'success': False, 'error': 'No code provided'}), 400
 
         client_id = os.getenv('GITHUB_CLIENT_ID')
         client_secret = os.getenv('GITHUB_CLIENT_SECRET')
         redirect_uri = os.getenv('GITHUB_REDIRECT_URI', 'http://localhost:3000/auth/callback')
-        app.logger.debug(f"Client ID: {client_id}, Redirect URI: {redirect_uri}")
+        logger.debug(f"Client ID: {client_id}, Redirect URI: {redirect_uri}")
 
         # Exchange code for access token
-        response = requests.post(
+        response = github_clients.session.post(
             'https://github.com/login/oauth/access_token',
             headers={'Accept': 'application/json'},
             data={
@@ -312,38 +1440,38 @@ def github_callback():
                 'client_secret': client_secret,
                 'code': code,
                 'redirect_uri': redirect_uri,
-            }
+            },
+            timeout=GITHUB_TIMEOUT
         )
-        app.logger.debug(f"GitHub OAuth response status: {response.status_code}")
+        logger.debug(f"GitHub OAuth response status: {response.status_code}")
         response.raise_for_status()
         token_data = response.json()
-        app.logger.debug(f"GitHub OAuth token data: {token_data}")
 
         if 'error' in token_data:
-            app.logger.debug(f"Error in token data: {token_data['error_description']}")
+            logger.debug(f"Error in token data: {token_data['error_description']}")
             return jsonify({'success': False, 'error': token_data['error_description']}), 400
 
         access_token = token_data.get('access_token')
         if not access_token:
-            app.logger.debug("Could not retrieve access token from token_data.")
+            logger.debug("Could not retrieve access token from token_data.")
             return jsonify({'success': False, 'error': 'Could not retrieve access token'}), 400
 
-        app.logger.debug(f"Successfully retrieved access token (first 5 chars): {access_token[:5]}...")
+        logger.debug("Successfully retrieved access token.")
         return jsonify({'success': True, 'access_token': access_token})
 
     except requests.exceptions.RequestException as e:
-        app.logger.error(f"Network error during GitHub OAuth: {e}", exc_info=True)
+        logger.error(f"Network error during GitHub OAuth: {e}", exc_info=True)
         return jsonify({'success': False, 'error': f'Network error: {e}'}), 500
     except Exception as e:
-        app.logger.error(f"An unexpected error occurred in github_callback: {e}", exc_info=True)
+        logger.error(f"An unexpected error occurred in github_callback: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/github-oauth-url', methods=['GET'])
+@api.route('/api/github-oauth-url', methods=['GET'])
 def get_github_oauth_url():
     """Get GitHub OAuth URL for user authentication"""
     client_id = os.getenv('GITHUB_CLIENT_ID')
     if not client_id:
-        app.logger.error("GitHub OAuth not configured: GITHUB_CLIENT_ID is missing.")
+        logger.error("GitHub OAuth not configured: GITHUB_CLIENT_ID is missing.")
         return jsonify({'error': 'GitHub OAuth not configured'})
     
     redirect_uri = os.getenv('GITHUB_REDIRECT_URI', 'http://localhost:3000/auth/callback')
@@ -353,52 +1481,251 @@ def get_github_oauth_url():
     
     return jsonify({'oauth_url': oauth_url})
 
-@app.route('/api/github-repos', methods=['GET'])
+def _serialize_repo(repo):
+    return {
+        'id': repo.id,
+        'name': repo.name,
+        'full_name': repo.full_name,
+        'description': repo.description,
+        'language': repo.language,
+        'private': repo.private,
+        'fork': repo.fork,
+        'updated_at': repo.updated_at.isoformat(),
+        'stars': repo.stargazers_count,
+        'forks': repo.forks_count
+    }
+
+def _parse_timestamp(value):
+    timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Dates without an offset are taken to be UTC, like GitHub's own timestamps
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+def _repo_list_probe(access_token):
+    """Fetch the user's most recently updated repository.
+
+    Any push, rename or new repository changes this page, so its ETag stands in
+    for recent changes to the listing. With one repository per page, the number
+    of the last page is the user's repository count, which changes when an older
+    repository is deleted or transferred. Returns (status_code, etag, total), or
+    (None, None, None) on failure; total is None when it is not known.
+    """
+    key = quota_key(access_token)
+    headers = {'Accept': 'application/vnd.github+json', 'Authorization': f'Bearer {access_token}'}
+    try:
+        github_scheduler.admit(key)
+        with github_stage('repo_list_probe'):
+            response = github_clients.session.get(
+                f"{GITHUB_API_URL}/user/repos",
+                params={'sort': 'updated', 'direction': 'desc', 'per_page': 1},
+                headers=headers,
+                timeout=GITHUB_TIMEOUT,
+            )
+        github_scheduler.record_headers(key, response.headers)
+        new_etag = response.headers.get('ETag')
+        return response.status_code, new_etag if isinstance(new_etag, str) else None, _listing_total(response)
+    except (requests.exceptions.RequestException, QuotaExhausted) as e:
+        logger.warning(f"Repository list probe failed: {e}")
+        return None, None, None
+
+def _listing_total(response):
+    if response.status_code != 200:
+        return None
+    last = response.links.get('last') if isinstance(response.links, dict) else None
+    if last:
+        pages = parse_qs(urlparse(last['url']).query).get('page')
+        return int(pages[0]) if pages and pages[0].isdigit() else None
+    # A single page holds everything there is
+    body = response.json()
+    return len(body) if isinstance(body, list) else None
+
+def _listing_validator(etag):
+    # Stored in the cache entry's etag slot, so revalidating it keeps the time of the full fetch
+    return {'etag': etag, 'fetched_at': time.time()} if etag else None
+
+def _cached_user_repos(cache_key, access_token):
+    """Return (repos, probe): a cached repository listing, revalidated with GitHub if it has expired.
+
+    repos is None when the listing must be fetched again, and probe is the
+    _repo_list_probe result made while revalidating, or None if there was none.
+    """
+    repos = user_repos_cache.get(cache_key)
+    if repos is not None:
+        return repos, None
+    stale = user_repos_cache.peek(cache_key)
+    if not stale or not isinstance(stale[1], dict) or time.time() - stale[1]['fetched_at'] >= REPO_LIST_MAX_AGE:
+        return None, None
+    # A 304 carries no page count, so the probe is unconditional and compared here
+    probe = _repo_list_probe(access_token)
+    status, etag, total = probe
+    if status == 200 and etag == stale[1]['etag'] and total == len(stale[0]):
+        user_repos_cache.refresh(cache_key)
+        return stale[0], None
+    return None, probe
+
+def _repo_filter(args):
+    """Build a predicate for the q, language and updated_after query parameters"""
+    query = args.get('q', '').lower()
+    language = args.get('language', '').lower()
+    updated_after = _parse_timestamp(args['updated_after']) if args.get('updated_after') else None
+
+    def matches(repo):
+        if query and query not in repo['full_name'].lower():
+            return False
+        if language and (repo['language'] or '').lower() != language:
+            return False
+        if updated_after and _parse_timestamp(repo['updated_at']) <= updated_after:
+            return False
+        return True
+    return matches
+
+REPO_SORT_KEYS = {
+    'updated': lambda repo: repo['updated_at'],
+    'name': lambda repo: repo['name'].lower(),
+    'stars': lambda repo: repo['stars'],
+}
+
+def _user_repo_listing(access_token):
+    """Return the token's GitHub client and a lazy listing of its user's repositories, most recently updated first"""
+    g = github_clients.github(access_token)
+    user = github_call(quota_key(access_token), 'user', g.get_user)
+    return g, user.get_repos(sort='updated', direction='desc')
+
+def _list_user_repos(cache_key, access_token, etag):
+    """List every repository of the token's user and cache the listing"""
+    g, listing = _user_repo_listing(access_token)
+    with github_stage('list_repos'):
+        repos = [_serialize_repo(repo) for repo in listing]
+    github_scheduler.record_client(quota_key(access_token), g)
+    user_repos_cache.set(cache_key, repos, etag=_listing_validator(etag))
+    logger.debug(f"Found {len(repos)} repositories.")
+    return repos
+
+def _list_user_repos_in_background(cache_key, access_token, etag):
+    try:
+        _list_user_repos(cache_key, access_token, etag)
+    except Exception as e:
+        logger.warning(f"Listing repositories in the background failed: {e}")
+
+def _repo_page(args, total):
+    """Read page and per_page, returning (page, per_page, index of the page's first repository)"""
+    page = max(args.get('page', 1, type=int), 1)
+    if 'page' in args or 'per_page' in args:
+        per_page = min(max(args.get('per_page', 30, type=int), 1), REPO_LIST_MAX_PER_PAGE)
+    else:
+        # Unpaginated requests get the whole listing, as before
+        per_page = max(total, 1)
+    return page, per_page, (page - 1) * per_page
+
+def _repo_page_response(repos, total, page, per_page, start, cached):
+    return jsonify({
+        'success': True,
+        'repos': repos,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'next_page': page + 1 if start + per_page < total else None,
+        'cached': cached
+    })
+
+def _stream_repos(repos, matches):
+    """Stream repositories as NDJSON, one object per line, ending with a summary line"""
+    count = 0
+    for repo in repos:
+        if matches(repo):
+            count += 1
+            yield json.dumps({'repo': repo}) + '\n'
+    yield json.dumps({'done': True, 'count': count}) + '\n'
+
+@api.route('/api/github-repos', methods=['GET'])
 def get_user_repos():
-    """Get authenticated user's repositories"""
-    app.logger.debug("get_user_repos function called.")
+    """Get authenticated user's repositories.
+
+    Supports page/per_page pagination, q (name substring), language and
+    updated_after filters, sort (updated, name, stars) with direction, and
+    ?stream=1 to receive NDJSON lines as GitHub pages arrive.
+    """
+    logger.debug("get_user_repos function called.")
     try:
         # This would typically be called after OAuth callback with user's access token
         access_token = request.headers.get('Authorization', '').replace('Bearer ', '')
         
         if not access_token:
-            app.logger.debug("No access token provided in header.")
+            logger.debug("No access token provided in header.")
             return jsonify({'error': 'No access token provided'}), 401
-        
-        app.logger.debug(f"Received access token (first 5 chars): {access_token[:5]}...")
+
+        sort = request.args.get('sort', 'updated')
+        if sort not in REPO_SORT_KEYS:
+            return jsonify({'error': f"Unsupported sort '{sort}'"}), 400
+        descending = request.args.get('direction', 'asc' if sort == 'name' else 'desc') == 'desc'
+        try:
+            matches = _repo_filter(request.args)
+        except ValueError:
+            return jsonify({'error': 'updated_after must be an ISO 8601 date'}), 400
+
+        cache_key = hashlib.sha256(access_token.encode('utf-8')).hexdigest()
+        repos, probe = _cached_user_repos(cache_key, access_token)
+        cached = repos is not None
         
         try:
-            g = Github(access_token)
-            user = g.get_user()
-            app.logger.debug(f"Successfully authenticated GitHub user: {user.login}")
-            
-            repos = []
-            for repo in user.get_repos():
-                repos.append({
-                    'id': repo.id,
-                    'name': repo.name,
-                    'full_name': repo.full_name,
-                    'description': repo.description,
-                    'language': repo.language,
-                    'private': repo.private,
-                    'fork': repo.fork,
-                    'updated_at': repo.updated_at.isoformat(),
-                    'stars': repo.stargazers_count,
-                    'forks': repo.forks_count
-                })
-            
-            app.logger.debug(f"Found {len(repos)} repositories.")
-            return jsonify({'success': True, 'repos': repos})
+            if not cached:
+                # Probe before listing so a change made during the listing invalidates the ETag
+                _, etag, total = probe or _repo_list_probe(access_token)
+                in_github_order = sort == 'updated' and descending
+                paginated = 'page' in request.args or 'per_page' in request.args
+                unfiltered = not any(request.args.get(name) for name in ('q', 'language', 'updated_after'))
+
+                if total is not None and in_github_order and paginated and unfiltered and not request.args.get('stream'):
+                    # Fetch only the GitHub pages holding the requested slice and list the rest in the
+                    # background, so a cold first page does not wait for the whole listing
+                    page, per_page, start = _repo_page(request.args, total)
+                    g, listing = _user_repo_listing(access_token)
+                    first = start // GITHUB_PAGE_SIZE
+                    last = (start + per_page - 1) // GITHUB_PAGE_SIZE
+                    with github_stage('list_repos'):
+                        fetched = [_serialize_repo(repo) for number in range(first, last + 1)
+                                   for repo in listing.get_page(number)]
+                    offset = start - first * GITHUB_PAGE_SIZE
+                    _submit(_list_user_repos_in_background, cache_key, access_token, etag)
+                    return _repo_page_response(fetched[offset:offset + per_page], total, page, per_page, start, False)
+
+                if request.args.get('stream') and in_github_order:
+                    g, listing = _user_repo_listing(access_token)
+                    # Already in the requested order, so forward each page as it arrives
+                    def generate():
+                        fetched = []
+                        def fetch():
+                            for repo in listing:
+                                fetched.append(_serialize_repo(repo))
+                                yield fetched[-1]
+                        yield from _stream_repos(fetch(), matches)
+                        user_repos_cache.set(cache_key, fetched, etag=_listing_validator(etag))
+                    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+                repos = _list_user_repos(cache_key, access_token, etag)
+
+            repos = sorted(repos, key=REPO_SORT_KEYS[sort], reverse=descending)
+            if request.args.get('stream'):
+                return Response(_stream_repos(repos, matches), mimetype='application/x-ndjson')
+
+            repos = [repo for repo in repos if matches(repo)]
+            total = len(repos)
+            page, per_page, start = _repo_page(request.args, total)
+            return _repo_page_response(repos[start:start + per_page], total, page, per_page, start, cached)
             
+        except QuotaExhausted as e:
+            logger.warning(str(e))
+            response = jsonify({'error': 'GitHub API rate limit exceeded, please try again later'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
         except Exception as e:
-            app.logger.error(f"GitHub API call failed: {e}", exc_info=True)
+            logger.error(f"GitHub API call failed: {e}", exc_info=True)
             return jsonify({'error': f'GitHub API error: {str(e)}'}), 500
             
     except Exception as e:
-        app.logger.error(f"An unexpected error occurred in get_user_repos: {e}", exc_info=True)
+        logger.error(f"An unexpected error occurred in get_user_repos: {e}", exc_info=True)
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
-@app.route('/api/refine-readme', methods=['POST'])
+@api.route('/api/refine-readme', methods=['POST'])
 @limiter.limit("60 per hour")
 def refine_readme():
     """Refine README content using Gemini AI based on user prompt"""
@@ -410,46 +1737,561 @@ def refine_readme():
         if not current_content or not prompt:
             return jsonify({'success': False, 'error': 'Missing current_content or prompt'}), 400
 
-        refine_instruction = f"""
-        You are an expert technical writer. Your task is to refine the provided README content based on the user's specific instructions.
+        result = refine_readme_content(current_content, prompt, bypass_cache=bool(data.get('bypass_cache')))
 
-        **CRITICAL INSTRUCTIONS:**
-        1.  You MUST ONLY modify the existing README content. Do NOT generate new sections unless explicitly asked by the user's prompt.
-        2.  Ensure the output is a complete, valid Markdown document.
-        3.  Address the user's prompt precisely. If the prompt is vague, make a reasonable interpretation.
+        return jsonify(dict(result, success=True))
 
-        ---
-        **Current README Content:**
-        {current_content}
+    except LLMUnavailable as e:
+        return llm_unavailable_response(e)
+    except PromptTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        logger.error(f"Error refining README: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        ---
-        **User's Refinement Prompt:**
-        {prompt}
+@api.route('/api/refine-readme/stream', methods=['POST'])
+@limiter.limit("60 per hour")
+def refine_readme_stream():
+    """Refine README content, streaming the result to the client as it is produced.
 
-        ---
-        Begin the refined README.md content now.
-        """
+    A prompt that names specific sections is refined as refine-readme does it,
+    sending only those sections to the model; the spliced README then arrives as
+    a single delta, and the `done` event also carries the `scope` and `diff`.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    current_content = data.get('current_content', '')
+    prompt = data.get('prompt', '')
 
-        response = model.generate_content(
-            refine_instruction
-        )
-        refined_content = response.text
+    if not current_content or not prompt:
+        return jsonify({'success': False, 'error': 'Missing current_content or prompt'}), 400
 
-        return jsonify({
-            'success': True,
-            'content': refined_content
-        })
+    bypass_cache = bool(data.get('bypass_cache'))
+    if not find_target_sections(split_sections(current_content), prompt):
+        try:
+            refine_prompt, report = build_refine_prompt(current_content, prompt)
+        except PromptTooLarge as e:
+            return jsonify({'success': False, 'error': str(e)}), 413
+        return stream_model_response(refine_prompt, bypass_cache=bypass_cache, report=report)
+
+    try:
+        llm_governor.check()
+    except LLMUnavailable as e:
+        return llm_unavailable_response(e)
+
+    def generate():
+        try:
+            # The refined sections are only spliced in once all of them have arrived
+            result = refine_readme_content(current_content, prompt, bypass_cache=bypass_cache)
+        except Exception as e:
+            logger.error(f"Error refining README sections: {e}", exc_info=True)
+            yield _sse_event({'error': str(e)}, event='error')
+            return
+        yield _sse_event({'delta': result['content']})
+        yield _sse_event({'cached': result['cached'], 'prompt': result['prompt'], 'scope': result['scope'],
+                          'diff': result['diff']}, event='done')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def _refine_job(current_content, prompt, bypass_cache):
+    return dict(refine_readme_content(current_content, prompt, bypass_cache=bypass_cache), success=True)
+
+def _submit_job(kind, fn, *args):
+    """Queue a generation job, answering 429 with Retry-After when the queue is full"""
+    try:
+        job_id = job_queue.submit(kind, fn, *args)
+    except QueueFull as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    response = jsonify({'success': True, 'job_id': job_id, 'status': 'queued'})
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response, 202
+
+@api.route('/api/jobs/generate-readme', methods=['POST'])
+@generation_limit
+def submit_generate_readme_job():
+    """Queue README generation and return a job id to poll"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    return _submit_job('generate-readme', generate_readme_content, resolve_repo_metadata(data, request_token()))
+
+@api.route('/api/jobs/refine-readme', methods=['POST'])
+@limiter.limit("60 per hour")
+def submit_refine_readme_job():
+    """Queue README refinement and return a job id to poll"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    current_content = data.get('current_content', '')
+    prompt = data.get('prompt', '')
+
+    if not current_content or not prompt:
+        return jsonify({'success': False, 'error': 'Missing current_content or prompt'}), 400
+
+    return _submit_job('refine-readme', _refine_job, current_content, prompt, bool(data.get('bypass_cache')))
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+@limiter.exempt
+def get_job(job_id):
+    """Get a job's status and result; pass ?wait=N to long-poll for up to N seconds (at most JOB_MAX_WAIT)"""
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+def list_owner_repos(owner, token=None, include_forks=False, include_archived=False):
+    """List a user's or organization's repositories as (owner, repo_name) pairs, up to batch_max_repos()"""
+    repos = []
+    page = 1
+    max_repos = batch_max_repos()
+    while len(repos) < max_repos:
+        listing = github_rest_get(f'/users/{owner}/repos', 'list_owner_repos', token,
+                                  params={'per_page': 100, 'page': page, 'type': 'owner', 'sort': 'full_name'})
+        for repo in listing:
+            if (repo.get('fork') and not include_forks) or (repo.get('archived') and not include_archived):
+                continue
+            repos.append((repo['owner']['login'], repo['name']))
+        if len(listing) < 100:
+            break
+        page += 1
+    return repos[:max_repos]
+
+def _batch_repos(data, token):
+    """Read the repositories a batch request names, or enumerate its owner's; raises ValueError if invalid"""
+    def valid_name(name):
+        return isinstance(name, str) and GITHUB_NAME_PATTERN.fullmatch(name)
+
+    if data.get('owner'):
+        if not valid_name(data['owner']):
+            raise ValueError('Invalid owner')
+        return list_owner_repos(data['owner'], token, bool(data.get('include_forks')), bool(data.get('include_archived')))
+
+    repos = []
+    for ref in data.get('repos') or []:
+        if isinstance(ref, dict):
+            owner, repo_name = ref.get('owner'), ref.get('repo_name')
+        else:
+            owner, _, repo_name = str(ref).partition('/')
+        if not (valid_name(owner) and valid_name(repo_name)):
+            raise ValueError(f'Invalid repository: {ref}')
+        repos.append((owner, repo_name))
+    if len(repos) > batch_max_repos():
+        raise ValueError(f'A batch can hold at most {batch_max_repos()} repositories')
+    return list(dict.fromkeys(repos))
+
+def _inspect_batch_repo(item, token):
+    result = validate_github_repo(item['owner'], item['repo_name'], token)
+    if not result['valid']:
+        raise ValueError(result.get('error') or 'Repository not found')
+    return result['metadata']
+
+def _generate_batch_readme(item, metadata, config):
+    data = dict(config, repo_metadata=metadata)
+    data.setdefault('project_type', metadata.get('detected_project_type'))
+    # Retries happen in llm_governor; repositories that still fail can be retried with a resume
+    result = generate_readme_content(data)
+    if not result['success']:
+        raise ValueError(result['error'])
+    return {'content': result['content'], 'cached': result['cached'], 'prompt': result['prompt']}
+
+def _start_batch(batch_id, config, token):
+    """Run a batch's remaining repositories with the requesting user's token, which is never stored"""
+    return batch_runner.start(
+        batch_id,
+        lambda item: _inspect_batch_repo(item, token),
+        lambda item, metadata: _generate_batch_readme(item, metadata, config),
+    )
+
+def _requested_batch(batch_id, token):
+    """Look up a batch made with the same token as this request, or None"""
+    batch = batch_runner.get(batch_id)
+    if batch is None or batch['config'].pop('requested_by', None) != quota_key(token):
+        return None
+    return batch
+
+def _charge_batch(count):
+    """Charge a batch's repositories to the batch generation limit, returning a 429 response if too few are left"""
+    retry_after = charge_generations(count, BATCH_GENERATION_LIMIT, scope='batch_generation')
+    if retry_after is None:
+        return None
+    response = jsonify({'success': False,
+                        'error': f'{count} READMEs would exceed the batch generation limit of {BATCH_GENERATION_LIMIT}'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def _batch_response(batch, status_code):
+    response = jsonify({'success': True, 'batch': batch})
+    response.headers['Location'] = f"/api/batches/{batch['id']}/results"
+    return response, status_code
+
+@api.route('/api/batches', methods=['POST'])
+@limiter.limit("10 per hour")
+def create_batch():
+    """Generate READMEs for a list of repositories, or every repository of an owner.
+
+    The body holds `repos` (["owner/name", ...]) or `owner`, plus the section
+    configuration shared by every repository. Progress is streamed from
+    /api/batches/<id>/results.
+    """
+    try:
+        data = request.get_json() or {}
+        token = request_token()
+        try:
+            repos = _batch_repos(data, token)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not repos:
+            return jsonify({'success': False, 'error': 'No repositories to generate READMEs for'}), 400
+
+        over_limit = _charge_batch(len(repos))
+        if over_limit:
+            return over_limit
+
+        config = {field: data[field] for field in BATCH_CONFIG_FIELDS if field in data}
+        batch_id = batch_runner.create(dict(config, requested_by=quota_key(token)), repos)
+        _start_batch(batch_id, config, token)
+        logger.info(f"Started batch {batch_id} over {len(repos)} repositories")
+        return _batch_response(_requested_batch(batch_id, token), 202)
+
+    except QuotaExhausted as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        logger.error(f"Error creating batch: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
 
+@api.route('/api/batches/<batch_id>', methods=['GET'])
+@limiter.exempt
+def get_batch(batch_id):
+    """Get a batch's status and per-status repository counts"""
+    batch = _requested_batch(batch_id, request_token())
+    if batch is None:
+        return jsonify({'success': False, 'error': 'Batch not found'}), 404
+    return jsonify({'success': True, 'batch': batch})
+
+@api.route('/api/batches/<batch_id>/results', methods=['GET'])
+@limiter.exempt
+def stream_batch_results(batch_id):
+    """Stream a batch's per-repository results as NDJSON as they finish.
+
+    Pass ?after=<seq> to skip the results already received, e.g. when reconnecting.
+    The last line is {"done": true, "batch": ...}.
+    """
+    token = request_token()
+    if _requested_batch(batch_id, token) is None:
+        return jsonify({'success': False, 'error': 'Batch not found'}), 404
+    after = request.args.get('after', 0, type=int)
+
+    def generate():
+        for item in batch_runner.follow(batch_id, after):
+            yield json.dumps(item) + '\n'
+        yield json.dumps({'done': True, 'batch': _requested_batch(batch_id, token)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/api/batches/<batch_id>/resume', methods=['POST'])
+@limiter.limit("10 per hour")
+def resume_batch(batch_id):
+    """Resume an interrupted batch, retrying only the repositories that did not succeed"""
+    token = request_token()
+    batch = _requested_batch(batch_id, token)
+    if batch is None:
+        return jsonify({'success': False, 'error': 'Batch not found'}), 404
+    if batch['status'] != 'completed':
+        over_limit = _charge_batch(batch['total'] - batch['counts']['succeeded'])
+        if over_limit:
+            return over_limit
+    if not _start_batch(batch_id, batch['config'], token):
+        return jsonify({'success': False, 'error': f"Batch is {batch['status']}"}), 409
+    logger.info(f"Resumed batch {batch_id} with {batch['total'] - batch['counts']['succeeded']} repositories left")
+    return _batch_response(_requested_batch(batch_id, token), 202)
+
+def prefetch_user(token=None):
+    """Whose budget speculative work spends: the signed-in user's, or the client address's"""
+    return quota_key(token) if token else f'ip:{get_remote_address()}'
+
+def wizard_defaults(metadata):
+    """The setup answers the wizard suggests for a repository, as SetupQuestions picks them"""
+    detected = metadata.get('detected_project_type')
+    if detected in ('Web Application', 'Template'):
+        project_type = detected
+    else:
+        project_type = 'Downloadable Application' if detected else 'Template'
+    return {'project_type': project_type, 'team_context': metadata.get('detected_team_context') or 'Solo'}
+
+def _draft_section(prefetch, data, section_id):
+    """Draft one section into the LLM cache if the budget and spare model capacity allow, returning the outcome"""
+    prompt, _ = build_section_prompt(data, section_id)
+    if llm_response_cache.get(llm_cache_key(prompt)) is not None:
+        return 'ready'
+    if llm_governor.stats()['in_flight'] * 2 >= llm_governor.max_concurrent:
+        # Speculative calls only use spare capacity, leaving the rest for requests someone is waiting on
+        return 'skipped'
+    if not prefetch.take():
+        return 'over_budget'
+    prefetch.step(section_id, 'drafting')
+    try:
+        _, cached = generate_text(prompt)
+    except LLMUnavailable:
+        prefetch.refund()
+        return 'skipped'
     except Exception as e:
-        app.logger.error(f"Error refining README: {e}", exc_info=True)
+        logger.warning(f"Drafting section '{section_id}' for prefetch {prefetch.id} failed: {e}")
+        return 'failed'
+    if cached:
+        prefetch.refund()
+    return 'ready'
+
+def _run_prefetch(prefetch, owner, repo_name, config, token):
+    """Inspect a repository, then draft the sections the wizard is likely to ask for if it generates by section"""
+    prefetch.step('inspect', 'running')
+    result = validate_github_repo(owner, repo_name, token)
+    if not result['valid']:
+        raise ValueError(result.get('error') or 'Repository not found')
+    prefetch.step('inspect', 'ready')
+
+    # The generate request the wizard sends if the user keeps its suggestions; drafts are
+    # cached under their prompts, so they are only reused where the real request matches
+    metadata = result['metadata']
+    data = {**wizard_defaults(metadata), 'selected_sections': PREFETCH_SECTIONS, **config, 'repo_metadata': metadata}
+    if generation_mode(data) != 'sections':
+        # A whole-document prompt can't reuse section drafts, so only the inspection is worth doing
+        return
+    section_content = data.get('section_content') or {}
+    for section_id in data['selected_sections']:
+        if prefetch.cancelled:
+            return
+        if render_section(section_id, metadata, section_content.get(section_id)) is not None:
+            outcome = 'rendered'
+        else:
+            outcome = _draft_section(prefetch, data, section_id)
+            metrics.inc('prefetch_drafts_total', outcome=outcome)
+        prefetch.step(section_id, outcome)
+
+def claim_prefetch(data, token):
+    """Stop the drafting for the prefetch a generate request follows; the request writes what is still missing"""
+    if data.get('prefetch_id'):
+        prefetcher.cancel(str(data['prefetch_id']), prefetch_user(token))
+
+@api.route('/api/prefetch', methods=['POST'])
+@limiter.limit("100 per hour")
+def start_prefetch():
+    """Inspect a repository and draft its likely sections in the background while the wizard is filled in.
+
+    The body holds `owner` and `repo_name`, plus whichever of selected_sections,
+    section_content, project_type and team_context are known so far; the
+    wizard's suggestions stand in for the rest. Starting a prefetch cancels the
+    user's previous one. Send the returned id as `prefetch_id` with the generate
+    request to reuse the drafts.
+    """
+    try:
+        data = request.get_json() or {}
+        owner, repo_name = data.get('owner'), data.get('repo_name')
+        if not all(isinstance(name, str) and GITHUB_NAME_PATTERN.fullmatch(name) for name in (owner, repo_name)):
+            return jsonify({'success': False, 'error': 'Invalid repository'}), 400
+        token = request_token()
+        user = prefetch_user(token)
+        config = {field: data[field] for field in PREFETCH_FIELDS if data.get(field)}
+        prefetch = prefetcher.start(user, lambda p: _run_prefetch(p, owner, repo_name, config, token),
+                                    owner=owner, repo_name=repo_name)
+        metrics.inc('prefetches_total')
+        return jsonify({'success': True, 'prefetch': prefetch, 'budget_remaining': prefetcher.remaining(user)}), 202
+
+    except Exception as e:
+        logger.error(f"Error starting prefetch: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/prefetch/<prefetch_id>', methods=['GET'])
+@limiter.exempt
+def get_prefetch(prefetch_id):
+    """Get a prefetch's status and the outcome of each step"""
+    user = prefetch_user(request_token())
+    prefetch = prefetcher.get(prefetch_id, user)
+    if prefetch is None:
+        return jsonify({'success': False, 'error': 'Prefetch not found'}), 404
+    return jsonify({'success': True, 'prefetch': prefetch, 'budget_remaining': prefetcher.remaining(user)})
+
+@api.route('/api/prefetch/<prefetch_id>', methods=['DELETE'])
+@limiter.exempt
+def cancel_prefetch(prefetch_id):
+    """Cancel a prefetch; a draft already being written finishes, but no further ones start"""
+    prefetch = prefetcher.cancel(prefetch_id, prefetch_user(request_token()))
+    if prefetch is None:
+        return jsonify({'success': False, 'error': 'Prefetch not found'}), 404
+    return jsonify({'success': True, 'prefetch': prefetch})
+
+def cache_stats():
+    return {
+        'repo_metadata': repo_metadata_cache.stats(),
+        'contributor_names': contributor_name_cache.stats(),
+        'llm_responses': llm_response_cache.stats(),
+        'user_repos': user_repos_cache.stats(),
+        'repo_trees': repo_tree_cache.stats(),
+        'readmes': readme_cache.stats(),
+    }
+
+@api.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Report cache counters for this worker process"""
+    return jsonify({'caches': cache_stats(), 'jobs': job_queue.stats(), 'batches': batch_runner.stats(),
+                    'prefetch': prefetcher.stats(),
+                    'pools': github_clients.stats(), 'rate_limits': github_scheduler.stats(), 'llm': llm_governor.stats(),
+                    'coalescing': {'repos': repo_flights.stats(), 'llm': llm_flights.stats()},
+                    'shared_state': {'backend': shared_state.name, 'healthy': shared_state.check()},
+                    'startup': startup_report})
+
+def _cache_metrics():
+    caches = cache_stats()
+    llm = llm_governor.stats()
+    return [
+        ('cache_hits_total', 'counter', [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('cache_misses_total', 'counter', [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('cache_revalidations_total', 'counter', [({'cache': name}, stats['revalidated']) for name, stats in caches.items()]),
+        # Caches in the shared state backend do not know their size
+        ('cache_entries', 'gauge', [({'cache': name}, stats['size']) for name, stats in caches.items() if 'size' in stats]),
+        ('gemini_in_flight', 'gauge', [({}, llm['in_flight'])]),
+        ('gemini_circuit_open', 'gauge', [({}, int(llm['circuit'] != 'closed'))]),
+        ('job_queue_pending', 'gauge', [({}, job_queue.stats()['pending'])]),
+        ('coalesced_calls_total', 'counter', [
+            ({'flight': name}, flights.stats()['coalesced'])
+            for name, flights in (('repos', repo_flights), ('llm', llm_flights))
+        ]),
+    ]
+
+metrics.add_collector(_cache_metrics)
+
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    start_request()
+    # Reuse a well-formed id from a proxy so log lines can be correlated across services
+    request_id = request.headers.get('X-Request-ID', '')
+    g.request_id = request_id if REQUEST_ID_PATTERN.fullmatch(request_id) else uuid.uuid4().hex
+    request_id_var.set(g.request_id)
+
+@api.after_app_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        # Requests rejected by an earlier before_request hook (e.g. the rate limiter)
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('http_request_duration_seconds', elapsed, route=route, method=request.method, status=response.status_code)
+    if SERVER_TIMING:
+        # For streamed responses this covers the work done before the first byte
+        response.headers['Server-Timing'] = server_timing_header(request_stages(), elapsed)
+    response.headers['X-Request-ID'] = g.request_id
+    logger.info('Request completed', extra={
+        'method': request.method,
+        'route': route,
+        'status': response.status_code,
+        'duration_ms': round(elapsed * 1000, 1),
+        'stages_ms': {name: round(seconds * 1000, 1) for name, seconds in stage_totals(request_stages()).items()},
+    })
+    return response
+
+@api.route('/api/metrics', methods=['GET'])
+@limiter.exempt
+def get_metrics():
+    """Expose metrics for this worker process in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    app.logger.debug("Health check endpoint called.")
+    logger.debug("Health check endpoint called.")
     return jsonify({'status': 'healthy', 'service': 'RMGen Backend'})
 
+def _warm_up():
+    """Import the client libraries and build the model without making any network calls"""
+    started = time.perf_counter()
+    import github  # noqa: F401
+    startup_report['github_import_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    get_model()
+    github_scheduler.rate_limit_errors
+    llm_governor.retryable_errors
+
+def create_app():
+    """Create the Flask app, configuring logging and attaching the limiter, CORS and routes"""
+    global log_listener
+    started = time.perf_counter()
+    if log_listener is None:
+        log_listener = configure_logging(
+            logging.getLogger(),
+            level=LOG_LEVEL,
+            path=os.getenv('LOG_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend_debug.log')),
+            max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            backups=int(os.getenv('LOG_BACKUPS', 5)),
+            rotate_when=os.getenv('LOG_ROTATE_WHEN'),
+            fmt=os.getenv('LOG_FORMAT', 'json'),
+            sample_rates={
+                logging.DEBUG: float(os.getenv('LOG_SAMPLE_DEBUG', 1.0)),
+                logging.INFO: float(os.getenv('LOG_SAMPLE_INFO', 1.0)),
+            },
+        )
+
+    flask_app = Flask(__name__)
+    flask_app.logger.setLevel(LOG_LEVEL)
+    limiter.init_app(flask_app)
+
+    # Set up CORS
+    frontend_origins = os.getenv("FRONTEND_ORIGINS")
+    logger.info(f"CORS Check: FRONTEND_ORIGINS environment variable is set to: '{frontend_origins}'")
+
+    if frontend_origins:
+        origins = [origin.strip() for origin in frontend_origins.split(',')]
+    else:
+        # Default to allowing localhost for development if not set
+        origins = ["http://localhost:3000", "http://localhost:5001"]
+
+    logger.info(f"CORS Check: Flask-CORS is configured with the following origins: {origins}")
+
+    CORS(flask_app, resources={r"/api/*": {"origins": origins}})
+
+    flask_app.register_blueprint(api)
+
+    if PRELOAD_CLIENTS:
+        _warm_up()
+    startup_report['import_ms'] = round((started - _import_started) * 1000, 1)
+    startup_report['create_app_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info('Startup completed', extra={'startup_ms': dict(startup_report)})
+    return flask_app
+
+def _reset_after_fork():
+    """Replace state that must not be shared with a parent process, e.g. under gunicorn --preload"""
+    global section_generation_pool, github_fetch_pool
+    # Threads do not survive a fork, so the pools are rebuilt empty. The preloaded model
+    # is kept: it opens its connection on the first call, which happens in the worker.
+    section_generation_pool = ThreadPoolExecutor(
+        max_workers=section_generation_pool._max_workers,
+        thread_name_prefix='section-generation',
+    )
+    github_fetch_pool = ThreadPoolExecutor(
+        max_workers=github_fetch_pool._max_workers,
+        thread_name_prefix='github-fetch',
+    )
+    job_queue.reset_after_fork()
+    batch_runner.reset_after_fork()
+    prefetcher.reset_after_fork()
+    github_clients.reset_after_fork()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+app = create_app()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import _pid_alive
+
+FINISHED = ('succeeded', 'failed')
+
+
+class BatchRunner:
+    """Runs batches of per-repository work as a two-stage pipeline, keeping progress in SQLite.
+
+    Each item goes through inspect(item) on one bounded pool and then
+    generate(item, inspected) on another, so the GitHub lookups for later items
+    overlap the model calls for earlier ones. At most `buffer` inspected items
+    wait for a generation slot at once. Every item is written to the database as
+    it finishes, so a batch interrupted by a worker restart can be resumed
+    without redoing the items that already succeeded.
+    """
+
+    def __init__(self, path, inspect_workers=4, generate_workers=2, buffer=None, ttl=7 * 86400):
+        self.path = path
+        self.inspect_workers = inspect_workers
+        self.generate_workers = generate_workers
+        self.buffer = buffer or generate_workers * 2
+        self.ttl = ttl
+        self._setup()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS batches ('
+                'id TEXT PRIMARY KEY, config TEXT NOT NULL, status TEXT NOT NULL, total INTEGER NOT NULL, '
+                'pid INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS batch_items ('
+                'batch_id TEXT NOT NULL, position INTEGER NOT NULL, owner TEXT NOT NULL, repo_name TEXT NOT NULL, '
+                'status TEXT NOT NULL, result TEXT, error TEXT, seq INTEGER, PRIMARY KEY (batch_id, position))'
+            )
+        self.recover()
+
+    def _setup(self):
+        self._inspect_pool = ThreadPoolExecutor(max_workers=self.inspect_workers, thread_name_prefix='batch-inspect')
+        self._generate_pool = ThreadPoolExecutor(max_workers=self.generate_workers, thread_name_prefix='batch-generate')
+        self._buffer = threading.BoundedSemaphore(self.buffer)
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._running = set()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+
+    def reset_after_fork(self):
+        """Give a forked worker its own database connection, pools and locks, and recover dead workers' batches"""
+        self._setup()
+        self.recover()
+
+    def _orphaned(self, batch_id, status, pid):
+        return (status == 'running' and batch_id not in self._running and pid != os.getpid()
+                and not _pid_alive(pid))
+
+    def recover(self):
+        """Mark batches run by a process that no longer exists as interrupted, to wait for a resume"""
+        with self._lock, self._conn:
+            for batch_id, pid in self._conn.execute("SELECT id, pid FROM batches WHERE status = 'running'").fetchall():
+                if self._orphaned(batch_id, 'running', pid):
+                    self._set_status(batch_id, 'interrupted')
+
+    def _set_status(self, batch_id, status):
+        self._conn.execute('UPDATE batches SET status = ?, pid = ?, updated_at = ? WHERE id = ?',
+                           (status, os.getpid(), time.time(), batch_id))
+
+    def create(self, config, repos):
+        """Record a batch over repos (a list of (owner, repo_name)) and return its id; start it with start()"""
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM batch_items WHERE batch_id IN (SELECT id FROM batches WHERE updated_at < ?)',
+                               (now - self.ttl,))
+            self._conn.execute('DELETE FROM batches WHERE updated_at < ?', (now - self.ttl,))
+            self._conn.execute(
+                "INSERT INTO batches (id, config, status, total, pid, created_at, updated_at) "
+                "VALUES (?, ?, 'created', ?, ?, ?, ?)",
+                (batch_id, json.dumps(config), len(repos), os.getpid(), now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO batch_items (batch_id, position, owner, repo_name, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(batch_id, position, owner, repo_name) for position, (owner, repo_name) in enumerate(repos)],
+            )
+        return batch_id
+
+    def start(self, batch_id, inspect, generate):
+        """Run every item of a batch that has not succeeded yet.
+
+        Returns False without starting anything if the batch is unknown,
+        complete, or still running in a live process.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT status, pid FROM batches WHERE id = ?', (batch_id,)).fetchone()
+            if row is None or row[0] == 'completed':
+                return False
+            if row[0] == 'running' and (batch_id in self._running or (row[1] != os.getpid() and _pid_alive(row[1]))):
+                return False
+            self._set_status(batch_id, 'running')
+            # Sequence numbers are kept, so retried items finish with higher ones than any a client has seen
+            self._conn.execute(
+                "UPDATE batch_items SET status = 'pending', result = NULL, error = NULL "
+                "WHERE batch_id = ? AND status != 'succeeded'", (batch_id,)
+            )
+            items = self._conn.execute(
+                "SELECT position, owner, repo_name FROM batch_items WHERE batch_id = ? AND status = 'pending' "
+                'ORDER BY position', (batch_id,)
+            ).fetchall()
+            if not items:
+                self._set_status(batch_id, 'completed')
+                return True
+            self._running.add(batch_id)
+        for position, owner, repo_name in items:
+            item = {'position': position, 'owner': owner, 'repo_name': repo_name}
+            self._inspect_pool.submit(self._inspect, batch_id, item, inspect, generate)
+        return True
+
+    def _inspect(self, batch_id, item, inspect, generate):
+        # Wait for room in the buffer first, so inspection never runs far ahead of generation
+        self._buffer.acquire()
+        try:
+            inspected = inspect(item)
+        except Exception as e:
+            self._buffer.release()
+            self._record(batch_id, item, 'failed', error=str(e))
+            return
+        self._generate_pool.submit(self._generate, batch_id, item, inspected, generate)
+
+    def _generate(self, batch_id, item, inspected, generate):
+        try:
+            outcome = {'status': 'succeeded', 'result': generate(item, inspected)}
+        except Exception as e:
+            outcome = {'status': 'failed', 'error': str(e)}
+        finally:
+            self._buffer.release()
+        self._record(batch_id, item, **outcome)
+
+    def _record(self, batch_id, item, status, result=None, error=None):
+        with self._finished, self._conn:
+            (seq,) = self._conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM batch_items WHERE batch_id = ?',
+                                        (batch_id,)).fetchone()
+            self._conn.execute(
+                'UPDATE batch_items SET status = ?, result = ?, error = ?, seq = ? WHERE batch_id = ? AND position = ?',
+                (status, json.dumps(result) if result is not None else None, error, seq, batch_id, item['position']),
+            )
+            (remaining,) = self._conn.execute(
+                "SELECT COUNT(*) FROM batch_items WHERE batch_id = ? AND status = 'pending'", (batch_id,)
+            ).fetchone()
+            if remaining:
+                self._conn.execute('UPDATE batches SET updated_at = ? WHERE id = ?', (time.time(), batch_id))
+            else:
+                self._set_status(batch_id, 'completed')
+                self._running.discard(batch_id)
+            self._finished.notify_all()
+
+    def get(self, batch_id):
+        """Return a batch's status, config and item counts, or None if it is unknown or expired.
+
+        A batch whose process has died is marked interrupted here, so following it ends.
+        """
+        query = ('SELECT id, config, status, total, created_at, updated_at, pid FROM batches '
+                 'WHERE id = ? AND updated_at >= ?')
+        with self._lock, self._conn:
+            row = self._conn.execute(query, (batch_id, time.time() - self.ttl)).fetchone()
+            if row is not None and self._orphaned(batch_id, row[2], row[6]):
+                self._set_status(batch_id, 'interrupted')
+                row = self._conn.execute(query, (batch_id, time.time() - self.ttl)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._conn.execute(
+                'SELECT status, COUNT(*) FROM batch_items WHERE batch_id = ? GROUP BY status', (batch_id,)
+            ).fetchall())
+        return {
+            'id': row[0],
+            'config': json.loads(row[1]),
+            'status': row[2],
+            'total': row[3],
+            'counts': {status: counts.get(status, 0) for status in ('pending',) + FINISHED},
+            'created_at': row[4],
+            'updated_at': row[5],
+        }
+
+    def results(self, batch_id, after=0):
+        """Return the items finished since sequence number `after`, in the order they finished"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, position, owner, repo_name, status, result, error FROM batch_items '
+                "WHERE batch_id = ? AND seq > ? AND status != 'pending' ORDER BY seq", (batch_id, after)
+            ).fetchall()
+        return [{
+            'seq': row[0],
+            'position': row[1],
+            'owner': row[2],
+            'repo_name': row[3],
+            'status': row[4],
+            'result': json.loads(row[5]) if row[5] is not None else None,
+            'error': row[6],
+        } for row in rows]
+
+    def follow(self, batch_id, after=0, poll=0.5):
+        """Yield a batch's finished items as they finish, until it stops running"""
+        while True:
+            batch = self.get(batch_id)
+            for item in self.results(batch_id, after):
+                after = item['seq']
+                yield item
+            if batch is None or batch['status'] != 'running':
+                return
+            # Batches run by other processes only show up in the database, so wake periodically
+            with self._finished:
+                self._finished.wait(poll)
+
+    def stats(self):
+        with self._lock:
+            return {'running': len(self._running), 'inspect_workers': self.inspect_workers,
+                    'generate_workers': self.generate_workers}
@@ -0,0 +1,274 @@
+"""Load-test the backend under gunicorn against local GitHub and Gemini stubs.
+
+    python bench/run.py --concurrency 1,8,32 --requests 200 --output baseline.json
+    python bench/run.py --compare baseline.json
+
+Prints (or writes) a JSON report with latency percentiles, throughput, error
+counts and upstream calls per request for every endpoint and concurrency level.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stubs import RedisStub, start_stubs
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+README_CONTENT = (
+    '# Example\n\n## Overview\nAn example project.\n\n'
+    '## Installation\nRun `pip install example`.\n\n## Usage\nRun `example --help`.\n'
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values, percent):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# Each scenario builds the i-th request. Unless --warm is given, requests are made
+# distinct (different repositories, tokens, bypass_cache) so every one reaches the stubs.
+_request_ids = itertools.count()
+
+def _validate_repo(i, warm):
+    repo = 'repo-0' if warm else f'repo-{i}'
+    return 'POST', '/api/validate-repo', {'json': {'owner': 'bench', 'repo_name': repo}}
+
+
+def _generate_readme(i, warm):
+    return 'POST', '/api/generate-readme', {'json': {
+        'project_name': 'example',
+        'project_type': 'Python Application',
+        'selected_sections': ['overview', 'installation', 'usage'],
+        'bypass_cache': not warm,
+    }}
+
+
+def _refine_readme(i, warm):
+    return 'POST', '/api/refine-readme', {'json': {
+        'current_content': README_CONTENT,
+        'prompt': 'Make the Installation section more detailed',
+        'bypass_cache': not warm,
+    }}
+
+
+def _github_repos(i, warm):
+    token = 'bench-token' if warm else f'bench-token-{i}'
+    return 'GET', '/api/github-repos', {'headers': {'Authorization': f'Bearer {token}'}}
+
+
+SCENARIOS = {
+    'validate-repo': _validate_repo,
+    'generate-readme': _generate_readme,
+    'refine-readme': _refine_readme,
+    'github-repos': _github_repos,
+}
+
+
+class Backend:
+    """The app running under gunicorn, pointed at the stubs"""
+
+    def __init__(self, github, gemini, workers, threads, fetch_backend, shared_state='memory://'):
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self._tmp = tempfile.TemporaryDirectory()
+        if shared_state == 'sqlite://':
+            shared_state = f"sqlite:///{os.path.join(self._tmp.name, 'state.db')}"
+        env = dict(
+            os.environ,
+            GITHUB_API_URL=github.url,
+            GITHUB_GRAPHQL_URL=f'{github.url}/graphql',
+            GITHUB_TOKEN='bench-server-token',
+            GITHUB_FETCH_BACKEND=fetch_backend,
+            GEMINI_API_ENDPOINT=gemini.url,
+            GEMINI_API_KEY='bench',
+            JOB_DB_PATH=os.path.join(self._tmp.name, 'jobs.db'),
+            LOG_FILE=os.path.join(self._tmp.name, 'backend.log'),
+            RATELIMIT_ENABLED='false',
+            SHARED_STATE_URL=shared_state,
+        )
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+             '--bind', f'127.0.0.1:{self.port}', '--log-level', 'warning', 'app:app'],
+            cwd=BACKEND_DIR, env=env,
+        )
+
+    def wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self._process.returncode}')
+            try:
+                if requests.get(f'{self.url}/api/health', timeout=1).ok:
+                    return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('gunicorn did not become ready in time')
+
+    def stop(self):
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._tmp.cleanup()
+
+
+def run_level(backend, stubs, scenario, concurrency, total, warm, timeout):
+    """Send total requests with concurrency in flight and summarise them"""
+    build = SCENARIOS[scenario]
+    local = threading.local()
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def send(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, kwargs = build(next(_request_ids), warm)
+        started = time.perf_counter()
+        try:
+            status = session.request(method, backend.url + path, timeout=timeout, **kwargs).status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    before = [stub.snapshot() for stub in stubs.values()]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(total)))
+    elapsed = time.perf_counter() - started
+
+    upstream = {}
+    for (name, stub), counts in zip(stubs.items(), before):
+        for route, count in stub.snapshot().items():
+            calls = count - counts.get(route, 0)
+            if calls:
+                upstream[f'{name} {route}'] = round(calls / total, 3)
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': total,
+        'rps': round(total / elapsed, 2),
+        'latency_ms': {
+            name: round(_percentile(latencies, percent) * 1000, 2)
+            for name, percent in (('p50', 50), ('p95', 95), ('p99', 99))
+        } | {'max': round(latencies[-1] * 1000, 2)},
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'errors': sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400)),
+        'upstream_calls_per_request': upstream,
+    }
+
+
+def compare(baseline, current):
+    """Print how each result moved relative to a baseline report"""
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline['results']}
+    print(f"{'scenario':<18}{'conc':>5}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}{'rps':>16}", file=sys.stderr)
+    for result in current['results']:
+        old = previous.get((result['scenario'], result['concurrency']))
+        if old is None:
+            continue
+
+        def cell(new, before):
+            change = (new - before) / before * 100 if before else 0
+            return f'{new:>8.1f} ({change:+.0f}%)'
+        latency, old_latency = result['latency_ms'], old['latency_ms']
+        print(f"{result['scenario']:<18}{result['concurrency']:>5}"
+              f"{cell(latency['p50'], old_latency['p50']):>16}{cell(latency['p95'], old_latency['p95']):>16}"
+              f"{cell(latency['p99'], old_latency['p99']):>16}{cell(result['rps'], old['rps']):>16}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated endpoints to drive')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and level')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--fetch-backend', default='rest', choices=['rest', 'graphql'])
+    parser.add_argument('--shared-state', default='memory', choices=['memory', 'sqlite', 'redis'],
+                        help='where workers keep caches and rate limits (redis uses a local stand-in)')
+    parser.add_argument('--github-latency', type=float, default=0.05, help='seconds added to each GitHub call')
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help='seconds added to each Gemini call')
+    parser.add_argument('--jitter', type=float, default=0.01, help='extra random latency, up to this many seconds')
+    parser.add_argument('--github-error-rate', type=float, default=0.0, help='fraction of GitHub calls that fail')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0, help='fraction of Gemini calls that fail')
+    parser.add_argument('--warm', action='store_true', help='repeat identical requests so caches can serve them')
+    parser.add_argument('--timeout', type=float, default=120, help='client timeout per request in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='baseline report to compare the results with')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    github, gemini = start_stubs(args.github_latency, args.gemini_latency, args.jitter,
+                                 args.github_error_rate, args.gemini_error_rate, args.seed)
+    redis = RedisStub().start() if args.shared_state == 'redis' else None
+    backend = Backend(github, gemini, args.workers, args.threads, args.fetch_backend,
+                      redis.url if redis else f'{args.shared_state}://')
+    try:
+        backend.wait_until_ready()
+        results = []
+        for scenario in scenarios:
+            for level in levels:
+                result = run_level(backend, {'github': github, 'gemini': gemini}, scenario, level,
+                                   args.requests, args.warm, args.timeout)
+                results.append(result)
+                print(f"{scenario} x{level}: p50 {result['latency_ms']['p50']} ms, "
+                      f"p99 {result['latency_ms']['p99']} ms, {result['rps']} rps, {result['errors']} errors",
+                      file=sys.stderr)
+    finally:
+        backend.stop()
+        github.stop()
+        gemini.stop()
+        if redis:
+            redis.stop()
+
+    report = {
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
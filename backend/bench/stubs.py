@@ -0,0 +1,479 @@
+"""Local stand-ins for the GitHub REST/GraphQL and Gemini APIs and Redis, used by the benchmarks.
+
+Every repository, user and prompt is accepted and answered with canned but
+well-formed data. Each stub can add latency and fail a fraction of requests,
+and counts the calls it receives per route.
+"""
+import base64
+import fnmatch
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+README_TEXT = '# Example\n\nAn example project.\n\n## Installation\n\n```\npip install example\n```\n'
+ROOT_FILES = ['README.md', 'requirements.txt', 'setup.py', 'app.py', 'tests']
+TREE_PATHS = ROOT_FILES + ['tests/test_app.py', 'frontend', 'frontend/package.json', 'frontend/src', 'frontend/src/index.ts']
+HEAD_SHA = 'a' * 40
+README_SHA = 'b' * 40
+GENERATED_README = (
+    '## Overview\nAn example project used to benchmark README generation.\n\n'
+    '## Installation\n```bash\npip install example\n```\n\n'
+    '## Usage\nRun `example --help` to get started.\n'
+)
+
+
+class StubServer:
+    """Threaded HTTP server with latency and error injection and per-route call counts"""
+
+    def __init__(self, handler, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record(self, route):
+        """Count a call and decide its fate, returning True if it should fail"""
+        with self._lock:
+            self.calls[route] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this Nagle's algorithm delays keep-alive replies
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def stub(self):
+        return self.server.stub
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _timestamp():
+    return '2024-01-01T00:00:00Z'
+
+
+class GitHubHandler(_StubHandler):
+    """Answers the REST and GraphQL calls the backend makes for any owner/repo"""
+
+    REPOS_PER_USER = 60
+
+    def _rate_headers(self):
+        return {
+            'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': '4999',
+            'X-RateLimit-Reset': str(int(time.time()) + 3600),
+            'X-RateLimit-Resource': 'core',
+        }
+
+    def _repo(self, owner, name, base):
+        return {
+            'id': abs(hash((owner, name))) % 10 ** 9,
+            'name': name,
+            'full_name': f'{owner}/{name}',
+            'owner': {'login': owner, 'url': f'{base}/users/{owner}'},
+            'private': False,
+            'fork': False,
+            'url': f'{base}/repos/{owner}/{name}',
+            'description': f'Benchmark repository {name}',
+            'language': 'Python',
+            'license': {'key': 'mit', 'name': 'MIT License', 'spdx_id': 'MIT'},
+            'stargazers_count': 42,
+            'forks_count': 7,
+            'default_branch': 'main',
+            'is_template': False,
+            'created_at': _timestamp(),
+            'updated_at': _timestamp(),
+            'pushed_at': _timestamp(),
+        }
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip('/')
+        query = parse_qs(parsed.query)
+        base = f'http://{self.headers["Host"]}'
+
+        routes = [
+            (r'/repos/([^/]+)/([^/]+)', 'repo'),
+            (r'/repos/([^/]+)/([^/]+)/topics', 'topics'),
+            (r'/repos/([^/]+)/([^/]+)/contents', 'contents'),
+            (r'/repos/([^/]+)/([^/]+)/contents/(.+)', 'file'),
+            (r'/repos/([^/]+)/([^/]+)/contributors', 'contributors'),
+            (r'/repos/([^/]+)/([^/]+)/git/refs/heads/(.+)', 'ref'),
+            (r'/repos/([^/]+)/([^/]+)/git/trees/(.+)', 'tree'),
+            (r'/repos/([^/]+)/([^/]+)/git/blobs/(.+)', 'blob'),
+            (r'/users/([^/]+)', 'user'),
+            (r'/user', 'authenticated_user'),
+            (r'/user/repos', 'user_repos'),
+        ]
+        for pattern, route in routes:
+            match = re.fullmatch(pattern, path)
+            if match:
+                break
+        else:
+            self.stub.record('GET unknown')
+            return self._send_json(404, {'message': 'Not Found'})
+
+        if self.stub.record(f'GET {route}'):
+            return self._send_json(502, {'message': 'Injected failure'})
+        headers = self._rate_headers()
+
+        if route == 'repo':
+            owner, name = match.groups()
+            etag = f'"{owner}/{name}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            return self._send_json(200, self._repo(owner, name, base), dict(headers, ETag=etag))
+        if route == 'topics':
+            return self._send_json(200, {'names': ['python', 'benchmark']}, headers)
+        if route == 'contents':
+            owner, name = match.groups()
+            return self._send_json(200, [{
+                'type': 'dir' if entry == 'tests' else 'file',
+                'name': entry,
+                'path': entry,
+                'sha': f'{entry}-sha',
+                'url': f'{base}/repos/{owner}/{name}/contents/{entry}',
+            } for entry in ROOT_FILES], headers)
+        if route == 'file':
+            owner, name, file_path = match.groups()
+            if file_path != 'README.md':
+                return self._send_json(404, {'message': 'Not Found'}, headers)
+            return self._send_json(200, {
+                'type': 'file',
+                'encoding': 'base64',
+                'name': 'README.md',
+                'path': 'README.md',
+                'sha': 'readme-sha',
+                'content': base64.b64encode(README_TEXT.encode('utf-8')).decode('ascii'),
+                'url': f'{base}/repos/{owner}/{name}/contents/README.md',
+            }, headers)
+        if route == 'contributors':
+            return self._send_json(200, [
+                {'login': f'user{i}', 'contributions': 100 - i, 'url': f'{base}/users/user{i}'}
+                for i in range(3)
+            ], headers)
+        if route == 'ref':
+            owner, name, branch = match.groups()
+            return self._send_json(200, {
+                'ref': f'refs/heads/{branch}',
+                'url': f'{base}/repos/{owner}/{name}/git/refs/heads/{branch}',
+                'object': {'type': 'commit', 'sha': HEAD_SHA, 'url': f'{base}/repos/{owner}/{name}/git/commits/{HEAD_SHA}'},
+            }, headers)
+        if route == 'tree':
+            owner, name, sha = match.groups()
+            return self._send_json(200, {
+                'sha': sha,
+                'url': f'{base}/repos/{owner}/{name}/git/trees/{sha}',
+                'truncated': False,
+                'tree': [{
+                    'path': path,
+                    'type': 'tree' if path in ('tests', 'frontend', 'frontend/src') else 'blob',
+                    'sha': README_SHA if path == 'README.md' else f'{path}-sha',
+                    'size': len(README_TEXT) if path == 'README.md' else 100,
+                } for path in TREE_PATHS],
+            }, headers)
+        if route == 'blob':
+            owner, name, sha = match.groups()
+            return self._send_json(200, {
+                'sha': sha,
+                'size': len(README_TEXT),
+                'encoding': 'base64',
+                'content': base64.b64encode(README_TEXT.encode('utf-8')).decode('ascii'),
+                'url': f'{base}/repos/{owner}/{name}/git/blobs/{sha}',
+            }, headers)
+        if route == 'user':
+            login = match.group(1)
+            return self._send_json(200, {'login': login, 'name': login.title(), 'url': f'{base}/users/{login}'}, headers)
+        if route == 'authenticated_user':
+            return self._send_json(200, {'login': 'bench-user', 'url': f'{base}/users/bench-user'}, headers)
+
+        # user_repos, paginated like GitHub with a Link header
+        per_page = int(query.get('per_page', ['30'])[0])
+        page = int(query.get('page', ['1'])[0])
+        start = (page - 1) * per_page
+        names = [f'repo-{i}' for i in range(self.REPOS_PER_USER)][start:start + per_page]
+        if start + per_page < self.REPOS_PER_USER:
+            last = -(-self.REPOS_PER_USER // per_page)
+            headers['Link'] = (f'<{base}/user/repos?per_page={per_page}&page={page + 1}>; rel="next", '
+                               f'<{base}/user/repos?per_page={per_page}&page={last}>; rel="last"')
+        headers['ETag'] = '"bench-user-repos"'
+        return self._send_json(200, [self._repo('bench-user', name, base) for name in names], headers)
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/graphql':
+            return self._send_json(404, {'message': 'Not Found'})
+        payload = self._read_json()
+        query = payload.get('query', '')
+        variables = payload.get('variables') or {}
+        route = 'graphql repository' if 'repository(' in query else 'graphql users'
+        if self.stub.record(f'POST {route}'):
+            return self._send_json(502, {'message': 'Injected failure'})
+        headers = dict(self._rate_headers(), **{'X-RateLimit-Resource': 'graphql'})
+
+        if route == 'graphql users':
+            return self._send_json(200, {'data': {
+                f'u{name[1:]}': {'name': login.title()} for name, login in variables.items()
+            }}, headers)
+        return self._send_json(200, {'data': {'repository': {
+            'name': variables.get('name'),
+            'description': f"Benchmark repository {variables.get('name')}",
+            'primaryLanguage': {'name': 'Python'},
+            'licenseInfo': {'name': 'MIT License'},
+            'stargazerCount': 42,
+            'forkCount': 7,
+            'repositoryTopics': {'nodes': [{'topic': {'name': 'python'}}]},
+            'defaultBranchRef': {'name': 'main', 'target': {'oid': HEAD_SHA, 'history': {'nodes': [
+                {'author': {'user': {'login': f'user{i % 3}', 'name': f'User{i % 3}'}}} for i in range(10)
+            ]}}},
+            'createdAt': _timestamp(),
+            'updatedAt': _timestamp(),
+            'isTemplate': False,
+            'isPrivate': False,
+            'readme': {'oid': README_SHA, 'byteSize': len(README_TEXT)},
+        }}}, headers)
+
+
+def _reply(prompt):
+    """Answer a section refinement with the sections it asked for, anything else with a README"""
+    if 'README Sections to Refine' in prompt:
+        requested = prompt.split('README Sections to Refine', 1)[1].split("User's Refinement Prompt", 1)[0]
+        headers = re.findall(r'^\s*(## .+)$', requested, re.MULTILINE)
+        return '\n\n'.join(f'{header}\nRefined section text.' for header in headers) + '\n'
+    return GENERATED_README
+
+
+class GeminiHandler(_StubHandler):
+    """Answers generateContent and streamGenerateContent calls from the REST transport"""
+
+    STREAM_CHUNKS = 4
+
+    def _response(self, text, prompt_tokens):
+        return {
+            'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP', 'index': 0}],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': len(text) // 4,
+                'totalTokenCount': prompt_tokens + len(text) // 4,
+            },
+        }
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        payload = self._read_json()
+        prompt = ''.join(
+            part.get('text', '') for content in payload.get('contents', []) for part in content.get('parts', [])
+        )
+        streaming = path.endswith(':streamGenerateContent')
+        if self.stub.record('POST streamGenerateContent' if streaming else 'POST generateContent'):
+            return self._send_json(503, {'error': {'code': 503, 'message': 'Injected failure', 'status': 'UNAVAILABLE'}})
+
+        if not streaming:
+            return self._send_json(200, self._response(_reply(prompt), len(prompt) // 4))
+
+        # Stream a JSON array one candidate at a time, as the real API does
+        text = _reply(prompt)
+        size = -(-len(text) // self.STREAM_CHUNKS)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(b'[')
+        for index, piece in enumerate(pieces):
+            if index:
+                self.wfile.write(b',')
+                time.sleep(self.stub.latency / len(pieces))
+            self.wfile.write(json.dumps(self._response(piece, len(prompt) // 4)).encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b']')
+
+
+def start_stubs(github_latency=0.0, gemini_latency=0.0, jitter=0.0, github_error_rate=0.0,
+                gemini_error_rate=0.0, seed=None):
+    """Start the GitHub and Gemini stubs, returning (github, gemini) servers"""
+    github = StubServer(GitHubHandler, github_latency, jitter, github_error_rate, seed).start()
+    gemini = StubServer(GeminiHandler, gemini_latency, jitter, gemini_error_rate, seed).start()
+    return github, gemini
+
+
+class RedisStub:
+    """In-memory stand-in for a Redis server, speaking enough RESP for the shared state backend"""
+
+    def __init__(self):
+        self.data = {}  # key -> (bytes value, expires_at or None)
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                while True:
+                    command = self._read_command()
+                    if command is None:
+                        return
+                    self.wfile.write(stub.execute(command))
+
+            def _read_command(self):
+                line = self.rfile.readline()
+                if not line.startswith(b'*'):
+                    return None
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                return args
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'redis://127.0.0.1:{self._server.server_address[1]}/0'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, args):
+        name, args = args[0].decode().upper(), args[1:]
+        with self.lock:
+            try:
+                reply = getattr(self, f'_{name.lower()}')(*args)
+            except AttributeError:
+                return f'-ERR unknown command {name}\r\n'.encode()
+            except ValueError:
+                return b'-ERR value is not an integer or out of range\r\n'
+        return _resp(reply)
+
+    def _ping(self):
+        return 'PONG'
+
+    def _select(self, db):
+        return 'OK'
+
+    def _auth(self, password):
+        return 'OK'
+
+    def _get(self, key):
+        entry = self._live(key)
+        return None if entry is None else entry[0]
+
+    def _set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._live(key) is not None:
+            return None
+        expires_at = None
+        if b'PX' in options:
+            expires_at = time.time() + int(options[options.index(b'PX') + 1]) / 1000
+        self.data[key] = (value, expires_at)
+        return 'OK'
+
+    def _del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def _incrby(self, key, amount):
+        entry = self._live(key) or (b'0', None)
+        value = int(entry[0]) + int(amount)
+        self.data[key] = (str(value).encode(), entry[1])
+        return value
+
+    def _pttl(self, key):
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int((entry[1] - time.time()) * 1000)
+
+    def _pexpire(self, key, ms):
+        entry = self._live(key)
+        if entry is None:
+            return 0
+        self.data[key] = (entry[0], time.time() + int(ms) / 1000)
+        return 1
+
+    def _scan(self, cursor, *options):
+        pattern = options[options.index(b'MATCH') + 1].decode() if b'MATCH' in options else '*'
+        keys = [key for key in list(self.data) if self._live(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+        return [b'0', keys]
+
+    def _flushdb(self):
+        self.data.clear()
+        return 'OK'
+
+
+def _resp(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, str):
+        return f'+{reply}\r\n'.encode()
+    if isinstance(reply, int):
+        return f':{reply}\r\n'.encode()
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(_resp(item) for item in reply)
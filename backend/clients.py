@@ -0,0 +1,93 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ClientRegistry:
+    """Process-wide pool of reusable GitHub clients and a keep-alive HTTP session.
+
+    The server client (built from GITHUB_TOKEN, or anonymous) is shared by every
+    request. Clients for users' OAuth tokens are kept in a bounded LRU so a user
+    browsing their repositories reuses one connection pool.
+    """
+
+    def __init__(self, github_factory, pool_size=10, max_user_clients=128):
+        self._github_factory = github_factory
+        self.pool_size = pool_size
+        self.max_user_clients = max_user_clients
+        self._setup()
+
+    def _setup(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._adapter = adapter
+        self._lock = threading.Lock()
+        self._server_client = None
+        self._user_clients = OrderedDict()
+        self._stats = {'created': 0, 'reused': 0, 'evicted': 0}
+
+    def reset_after_fork(self):
+        """Drop clients and connections inherited from a parent process.
+
+        Sockets opened before a fork are shared with the parent, so a forked
+        worker must not reuse them. The old objects are abandoned, not closed,
+        since closing them would also close the parent's connections.
+        """
+        self._setup()
+
+    def github(self, token=None):
+        """Return a pooled GitHub client for a user's token, or the shared server client"""
+        with self._lock:
+            if token is None:
+                if self._server_client is None:
+                    self._server_client = self._github_factory(None)
+                    self._stats['created'] += 1
+                else:
+                    self._stats['reused'] += 1
+                return self._server_client
+
+            # Key by a digest so raw tokens are not kept around as dictionary keys
+            key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+            client = self._user_clients.get(key)
+            if client is not None:
+                self._user_clients.move_to_end(key)
+                self._stats['reused'] += 1
+                return client
+
+            client = self._github_factory(token)
+            self._user_clients[key] = client
+            self._stats['created'] += 1
+            while len(self._user_clients) > self.max_user_clients:
+                self._user_clients.popitem(last=False)
+                self._stats['evicted'] += 1
+            return client
+
+    def clear(self):
+        with self._lock:
+            self._server_client = None
+            self._user_clients.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        connections = requests_sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        with self._lock:
+            return {
+                'github_clients': dict(self._stats, user_clients=len(self._user_clients)),
+                'http_session': {
+                    'connections_opened': connections,
+                    'requests_sent': requests_sent,
+                    'connections_reused': max(requests_sent - connections, 0),
+                },
+            }
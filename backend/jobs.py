@@ -0,0 +1,168 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Runs jobs on a bounded worker pool and keeps their status and results in SQLite.
+
+    The database can be shared by several worker processes, so any of them can
+    answer a status request for a job another one is running.
+    """
+
+    def __init__(self, path, workers=2, max_pending=20, ttl=3600):
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._setup()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, result TEXT, error TEXT, '
+                'pid INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+        self.recover()
+
+    def _setup(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-worker')
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._pending = 0
+        self._durations = []
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+
+    def reset_after_fork(self):
+        """Give a forked worker its own database connection, workers and locks.
+
+        SQLite connections must not be used across a fork, and the parent's
+        worker threads do not exist in the child. Workers forked after startup
+        also take over recovering the jobs of workers that died before them.
+        """
+        self._setup()
+        self.recover()
+
+    def _orphaned(self, status, pid):
+        # Only a process that no longer exists can leave a job unfinished for good
+        return status in ('queued', 'running') and pid != os.getpid() and not _pid_alive(pid)
+
+    def _interrupt(self, job_id):
+        self._update(job_id, status='failed', error='Interrupted by a worker restart')
+
+    def recover(self):
+        """Fail the unfinished jobs of processes that no longer exist, since they will never finish"""
+        with self._lock, self._conn:
+            for job_id, status, pid in self._conn.execute(
+                "SELECT id, status, pid FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall():
+                if self._orphaned(status, pid):
+                    self._interrupt(job_id)
+
+    def retry_after(self):
+        """Estimate how long until a queue slot frees up, in whole seconds"""
+        with self._lock:
+            average = sum(self._durations) / len(self._durations) if self._durations else 5
+            return max(1, math.ceil(average * max(self._pending - self.workers + 1, 1) / self.workers))
+
+    def submit(self, kind, fn, *args):
+        """Queue fn(*args) and return the new job id; fn must return a JSON-serialisable value"""
+        with self._lock:
+            full = self._pending >= self.max_pending
+        if full:
+            raise QueueFull(self.retry_after())
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._pending += 1
+            self._conn.execute('DELETE FROM jobs WHERE updated_at < ?', (now - self.ttl,))
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, pid, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, os.getpid(), now, now),
+            )
+        self._pool.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self._conn.execute(
+            f'UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?',
+            (*fields.values(), time.time(), job_id),
+        )
+
+    def _run(self, job_id, fn, args):
+        started = time.monotonic()
+        with self._lock, self._conn:
+            self._update(job_id, status='running')
+        try:
+            outcome = {'status': 'succeeded', 'result': json.dumps(fn(*args))}
+        except Exception as e:
+            outcome = {'status': 'failed', 'error': str(e)}
+        with self._finished, self._conn:
+            self._update(job_id, **outcome)
+            self._pending -= 1
+            self._durations = (self._durations + [time.monotonic() - started])[-50:]
+            self._finished.notify_all()
+
+    def get(self, job_id):
+        """Return a job's status and result, or None if it is unknown or expired.
+
+        A job whose process has died is failed here, so waiting on it ends.
+        """
+        query = ('SELECT id, kind, status, result, error, created_at, updated_at, pid FROM jobs '
+                 'WHERE id = ? AND updated_at >= ?')
+        with self._lock, self._conn:
+            row = self._conn.execute(query, (job_id, time.time() - self.ttl)).fetchone()
+            if row is not None and self._orphaned(row[2], row[7]):
+                self._interrupt(job_id)
+                row = self._conn.execute(query, (job_id, time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'result': json.loads(row[3]) if row[3] is not None else None,
+            'error': row[4],
+            'created_at': row[5],
+            'updated_at': row[6],
+        }
+
+    def wait(self, job_id, timeout):
+        """Long-poll a job until it finishes or timeout seconds pass"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in ('succeeded', 'failed') or remaining <= 0:
+                return job
+            # Jobs run by other processes only show up in the database, so wake periodically
+            with self._finished:
+                self._finished.wait(min(remaining, 0.5))
+
+    def stats(self):
+        with self._lock:
+            return {'pending': self._pending, 'workers': self.workers, 'max_pending': self.max_pending}
@@ -0,0 +1,208 @@
+import math
+import random
+import threading
+import time
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling the model when it is unhealthy or every call slot is busy"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class GeminiGovernor:
+    """Guards every call to a generative model.
+
+    At most max_concurrent calls are in flight at once, and each call has a
+    deadline covering the wait for a slot, every attempt and the backoff between
+    them. Errors of the retryable types are retried with jittered exponential
+    backoff. After failure_threshold consecutive failed calls the circuit opens
+    and calls are rejected for reset_timeout seconds, after which a single trial
+    call decides whether it closes again.
+
+    retryable_errors may be a tuple of exception types or a callable returning
+    one, so the client library defining them is only imported once it is needed.
+    """
+
+    def __init__(self, max_concurrent=8, timeout=60, retries=2, backoff_base=0.5, backoff_max=8,
+                 failure_threshold=5, reset_timeout=30, retryable_errors=()):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._retryable_errors = retryable_errors
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._stats = {'calls': 0, 'retries': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0}
+
+    @property
+    def retryable_errors(self):
+        if callable(self._retryable_errors):
+            self._retryable_errors = tuple(self._retryable_errors())
+        return self._retryable_errors
+
+    def check(self):
+        """Raise LLMUnavailable if the circuit is open, without starting a call"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self._stats['rejected'] += 1
+                raise LLMUnavailable('The model is temporarily unavailable', remaining)
+
+    def _admit(self):
+        """Reject the call if the circuit is open; returns True for a half-open trial call"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._trial_running:
+                self._stats['rejected'] += 1
+                raise LLMUnavailable('The model is temporarily unavailable', max(remaining, 1))
+            self._trial_running = True
+            return True
+
+    def _start(self):
+        """Admit a call and take a slot, returning (trial, deadline)"""
+        trial = self._admit()
+        deadline = time.monotonic() + self.timeout
+        try:
+            self._acquire(deadline)
+        except LLMUnavailable:
+            self._finish_trial(trial)
+            raise
+        return trial, deadline
+
+    def _finish_trial(self, trial):
+        if trial:
+            with self._lock:
+                self._trial_running = False
+
+    def _record(self, trial, success):
+        with self._lock:
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._stats['failures'] += 1
+            self._failures += 1
+            if trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def _acquire(self, deadline):
+        if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise LLMUnavailable('Too many model calls in progress', self.backoff_base * 2)
+        with self._lock:
+            self._in_flight += 1
+            self._stats['calls'] += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _backoff(self, attempt, deadline):
+        """Sleep before the next attempt, returning False if the deadline leaves no time for it"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        with self._lock:
+            self._stats['retries'] += 1
+        time.sleep(delay)
+        return True
+
+    def _attempts(self, deadline):
+        """Yield (attempt, request_options) until the retries or the deadline run out"""
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise TimeoutError(f'Model call exceeded its {self.timeout}s deadline')
+            # The client library's own retries would not respect the deadline, so turn them off
+            yield attempt, {'timeout': remaining, 'retry': None}
+
+    def generate(self, model, prompt, **kwargs):
+        """Call model.generate_content(prompt) under the concurrency cap, deadline and breaker"""
+        trial, deadline = self._start()
+        try:
+            for attempt, request_options in self._attempts(deadline):
+                try:
+                    response = model.generate_content(prompt, request_options=request_options, **kwargs)
+                except self.retryable_errors:
+                    if attempt == self.retries or not self._backoff(attempt, deadline):
+                        raise
+                    continue
+                self._record(trial, True)
+                return response
+        except self.retryable_errors + (TimeoutError,):
+            self._record(trial, False)
+            raise
+        except Exception:
+            # Errors about the request itself say nothing about the model's health
+            self._record(trial, True)
+            raise
+        finally:
+            self._finish_trial(trial)
+            self._release()
+
+    def stream(self, model, prompt, **kwargs):
+        """Stream model.generate_content(prompt, stream=True) chunks under the same guards.
+
+        A failure before the first chunk is retried; once text has been yielded
+        the error is raised to the caller, since the chunks cannot be taken back.
+        """
+        trial, deadline = self._start()
+        try:
+            for attempt, request_options in self._attempts(deadline):
+                started = False
+                try:
+                    for chunk in model.generate_content(prompt, stream=True, request_options=request_options, **kwargs):
+                        started = True
+                        yield chunk
+                except self.retryable_errors:
+                    if started or attempt == self.retries or not self._backoff(attempt, deadline):
+                        raise
+                    continue
+                self._record(trial, True)
+                return
+        except self.retryable_errors + (TimeoutError,):
+            self._record(trial, False)
+            raise
+        except Exception:
+            self._record(trial, True)
+            raise
+        finally:
+            # Also runs when a streaming client disconnects part way through
+            self._finish_trial(trial)
+            self._release()
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        with self._lock:
+            if self._opened_at is None:
+                circuit = 'closed'
+            elif self._trial_running or time.monotonic() >= self._opened_at + self.reset_timeout:
+                circuit = 'half-open'
+            else:
+                circuit = 'open'
+            return dict(self._stats, in_flight=self._in_flight, max_concurrent=self.max_concurrent, circuit=circuit)
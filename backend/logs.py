@@ -0,0 +1,167 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import traceback
+from datetime import datetime, timezone
+
+# Id of the request being handled, attached to every record logged while handling it
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+# A credential-looking value: long, and containing a digit, unlike ordinary words
+_SECRET_VALUE = r'(?=[A-Za-z._~+/=-]*\d)[A-Za-z0-9._~+/=-]{20,}'
+
+_REDACTIONS = [
+    # GitHub tokens (ghp_, gho_, ghu_, ghs_, ghr_ and fine-grained github_pat_)
+    (re.compile(r'\b(gh[pousr]_[A-Za-z0-9]{16,}|github_pat_[A-Za-z0-9_]{20,})'), '[REDACTED]'),
+    (re.compile(r'(?i)\b(bearer)\s+[A-Za-z0-9._~+/=-]{8,}'), r'\1 [REDACTED]'),
+    (re.compile(r'(?i)\b(token)\s+' + _SECRET_VALUE), r'\1 [REDACTED]'),
+    # key=value, key: value and JSON/dict forms of secret fields
+    (re.compile(r'''(?i)(["']?\b(?:access_token|refresh_token|client_secret|api_key)["']?\s*[:=]\s*["']?)[^"'&,\s}]+'''),
+     r'\1[REDACTED]'),
+    (re.compile(r'''(?i)(["']?\btoken["']?\s*[:=]\s*["']?)''' + _SECRET_VALUE), r'\1[REDACTED]'),
+    # OAuth authorization codes in callback URLs
+    (re.compile(r'([?&]code=)[^&#\s]+'), r'\1[REDACTED]'),
+]
+
+
+def redact(text):
+    """Mask OAuth codes, access tokens and API keys in a log message"""
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records at each level; unlisted levels are always kept"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with redacted message and any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(record.getMessage()),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_text:
+            entry['exception'] = redact(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message now, while its arguments are still current, and leave
+        # the rest of the formatting to the listener thread. Tracebacks are rendered
+        # here: they are rare, and rendering parses source, which is not safe to do
+        # concurrently with imports on Python 3.11.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip('\n')
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            # Never block a request on logging; drop the record instead
+            pass
+        except Exception:
+            self.handleError(record)
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def stop(self):
+        # Safe to call more than once, e.g. explicitly and again at exit
+        if self._thread is not None:
+            super().stop()
+
+
+def configure_logging(logger, level='INFO', path=None, max_bytes=10 * 1024 * 1024, backups=5,
+                      rotate_when=None, fmt='json', sample_rates=None, queue_size=10000):
+    """Send logger's records through a bounded queue to handlers on a background thread.
+
+    Records go to stdout and, if path is set, to a file rotated by size (or by
+    time if rotate_when is given, e.g. 'midnight'). Returns the started
+    QueueListener, which is stopped at exit.
+    """
+    formatter = JSONFormatter() if fmt == 'json' else TextFormatter()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if path:
+        if rotate_when:
+            handlers.append(logging.handlers.TimedRotatingFileHandler(path, when=rotate_when, backupCount=backups))
+        else:
+            handlers.append(logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.Queue(maxsize=queue_size)
+    queue_handler = _QueueHandler(records)
+    queue_handler.addFilter(RequestContextFilter())
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+
+    listener = _QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def restart_in_child():
+        # The listener thread does not survive a fork (e.g. gunicorn --preload), and
+        # records queued in the parent must not be written twice
+        if queue_handler not in logger.handlers:
+            return
+        fresh = queue.Queue(maxsize=queue_size)
+        queue_handler.queue = listener.queue = fresh
+        listener._thread = None
+        listener.start()
+
+    os.register_at_fork(after_in_child=restart_in_child)
+    return listener
@@ -0,0 +1,105 @@
+import difflib
+import re
+
+import mistune
+
+
+class _HeadingLocator(mistune.BlockParser):
+    """Block parser that records where each ATX heading starts in the source"""
+
+    def parse_axt_heading(self, m, state):
+        end = super().parse_axt_heading(m, state)
+        state.tokens[-1]['start'] = m.start()
+        return end
+
+
+_markdown = mistune.Markdown(renderer=None, block=_HeadingLocator())
+
+# Words that appear in many section titles and say nothing about which one is meant
+_GENERIC_TITLE_WORDS = {
+    'about', 'and', 'guide', 'guidelines', 'information', 'instructions',
+    'project', 'readme', 'section', 'the', 'your',
+}
+
+
+def _heading_text(token):
+    return ''.join(child.get('raw', '') for child in token.get('children', [])).strip()
+
+
+def split_sections(markdown):
+    """Split a README into top-level sections at each `##` (or `#`) heading.
+
+    Returns a list of {'title', 'level', 'text'} dicts whose texts concatenate
+    back to the original document. Content before the first `##` heading,
+    including a `#` title, is returned as a section with level 1 (or 0 if the
+    document has no title). Headings inside code blocks are ignored.
+    """
+    tokens, _ = _markdown.parse(markdown)
+    starts = [
+        (token['start'], _heading_text(token), token['attrs']['level'])
+        for token in tokens
+        if token['type'] == 'heading' and 'start' in token and token['attrs']['level'] <= 2
+    ]
+
+    sections = []
+    if not starts or starts[0][0] > 0:
+        sections.append({'title': None, 'level': 0, 'start': 0})
+    for start, title, level in starts:
+        if level == 1 and sections and sections[-1]['level'] == 0 and not markdown[:start].strip():
+            # A leading `# Title` heads the preamble rather than starting a new section
+            sections[-1] = {'title': title, 'level': 1, 'start': 0}
+        else:
+            sections.append({'title': title, 'level': level, 'start': start})
+
+    for section, following in zip(sections, sections[1:] + [{'start': len(markdown)}]):
+        section['text'] = markdown[section.pop('start'):following['start']]
+    return [section for section in sections if section['text']]
+
+
+def join_sections(sections):
+    return ''.join(section['text'] for section in sections)
+
+
+def find_target_sections(sections, prompt):
+    """Return the indexes of the `##` sections a refinement prompt refers to"""
+    prompt_text = prompt.lower()
+    prompt_words = set(re.findall(r'[a-z0-9+#]+', prompt_text))
+    targets = []
+    for index, section in enumerate(sections):
+        if section['level'] != 2 or not section['title']:
+            continue
+        title = section['title'].lower()
+        title_words = set(re.findall(r'[a-z0-9+#]+', title)) - _GENERIC_TITLE_WORDS
+        if title in prompt_text or any(len(word) > 3 and word in prompt_words for word in title_words):
+            targets.append(index)
+    return targets
+
+
+def replace_section(section, new_text):
+    """Return a copy of section with new text, keeping its original trailing spacing"""
+    trailing = section['text'][len(section['text'].rstrip('\n')):]
+    return dict(section, text=new_text.strip('\n') + (trailing or '\n'))
+
+
+def section_diff(old_sections, new_sections):
+    """Compare two versions of a document section by section, matching sections by title"""
+    old_by_title = {section['title']: section for section in old_sections}
+    new_titles = {section['title'] for section in new_sections}
+    changes = []
+    for section in new_sections:
+        old = old_by_title.get(section['title'])
+        if old is None:
+            changes.append({'title': section['title'], 'status': 'added', 'diff': section['text']})
+        elif old['text'].strip() == section['text'].strip():
+            changes.append({'title': section['title'], 'status': 'unchanged', 'diff': ''})
+        else:
+            diff = difflib.unified_diff(
+                old['text'].splitlines(keepends=True),
+                section['text'].splitlines(keepends=True),
+                fromfile='before', tofile='after',
+            )
+            changes.append({'title': section['title'], 'status': 'modified', 'diff': ''.join(diff)})
+    for section in old_sections:
+        if section['title'] not in new_titles:
+            changes.append({'title': section['title'], 'status': 'removed', 'diff': section['text']})
+    return changes
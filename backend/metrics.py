@@ -0,0 +1,168 @@
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage timings of the request being handled, for the Server-Timing header
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text exposition format.
+
+    Values are kept per process; with several workers each one reports its own.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = {}
+        self._buckets = {}
+        self._counters = {}  # name -> {label items: value}
+        self._histograms = {}  # name -> {label items: [bucket counts..., sum, count]}
+        self._collectors = []
+
+    def describe(self, name, help_text, buckets=None):
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            buckets = self._buckets.get(name, self.buckets)
+            series = self._histograms.setdefault(name, {})
+            counts = series.setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def add_collector(self, collector):
+        """Register a callable returning (name, type, samples) tuples computed at scrape time.
+
+        samples is a list of (labels dict, value) pairs.
+        """
+        self._collectors.append(collector)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                header(name, 'counter')
+                for key, value in series.items():
+                    lines.append(f'{name}{_format_labels(dict(key))} {_format_value(value)}')
+            for name, series in sorted(self._histograms.items()):
+                header(name, 'histogram')
+                buckets = self._buckets.get(name, self.buckets)
+                for key, counts in series.items():
+                    labels = dict(key)
+                    for bound, count in zip(buckets + (math.inf,), counts[:len(buckets)] + [counts[-1]]):
+                        bucket_labels = _format_labels(dict(labels, le=_format_value(bound)))
+                        lines.append(f'{name}_bucket{bucket_labels} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(counts[-2])}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {counts[-1]}')
+
+        for collector in self._collectors:
+            for name, kind, samples in collector():
+                header(name, kind)
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def start_request():
+    """Begin collecting stage timings for the current request"""
+    _request_stages.set([])
+
+
+def request_stages():
+    """Return the (stage, seconds) timings recorded for the current request"""
+    return _request_stages.get() or []
+
+
+@contextmanager
+def stage(registry, metric, stage_name, **labels):
+    """Time a block into a histogram and the current request's Server-Timing stages.
+
+    Exceptions raised by the block are counted in <metric>_errors_total by type.
+    Pool threads only see the request's stages if the task runs in a copy of the
+    submitting thread's context (contextvars.copy_context().run).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        registry.inc(f'{metric}_errors_total', error=type(e).__name__, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe(f'{metric}_seconds', elapsed, **labels)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((stage_name, elapsed))
+
+
+def stage_totals(stages):
+    """Sum the time spent in each stage, in seconds, keeping first-seen order"""
+    totals = {}
+    for name, elapsed in stages:
+        totals[name] = totals.get(name, 0) + elapsed
+    return totals
+
+
+def server_timing_header(stages, total):
+    """Summarise stage timings as a Server-Timing header value, in milliseconds"""
+    entries = [f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in stage_totals(stages).items()]
+    return ', '.join(entries + [f'total;dur={total * 1000:.1f}'])
+
+
+class ErrorCountingHandler(logging.Handler):
+    """Logging handler that counts logged errors by exception type"""
+
+    def __init__(self, registry, metric='errors_total'):
+        super().__init__(level=logging.ERROR)
+        self.registry = registry
+        self.metric = metric
+
+    def emit(self, record):
+        error = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else 'none'
+        self.registry.inc(self.metric, error=error, logger=record.name)
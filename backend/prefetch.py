@@ -0,0 +1,144 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+FINISHED = ('completed', 'failed', 'cancelled')
+
+
+class Prefetch:
+    """One user's speculative run, handed to the function doing the work to report its progress"""
+
+    def __init__(self, prefetcher, prefetch_id, user, record):
+        self.prefetcher = prefetcher
+        self.id = prefetch_id
+        self.user = user
+        self.record = record
+
+    @property
+    def cancelled(self):
+        return self.prefetcher.state.get(self.prefetcher._key(self.id, 'cancelled')) is not None
+
+    def step(self, name, status):
+        """Record the status of one piece of work, e.g. a section draft"""
+        self.record['steps'][name] = status
+        self.prefetcher._save(self)
+
+    def update(self, **fields):
+        self.record.update(fields)
+        self.prefetcher._save(self)
+
+    def take(self, amount=1):
+        """Spend from the user's budget, returning False without spending anything if too little is left"""
+        return self.prefetcher.take(self.user, amount)
+
+    def refund(self, amount=1):
+        self.prefetcher.refund(self.user, amount)
+
+
+class Prefetcher:
+    """Runs speculative work for users in the background, within a per-user budget.
+
+    Each user has at most one prefetch at a time: starting another cancels the
+    previous one. Progress is kept in a state backend, so any worker sharing the
+    backend can report on or cancel a prefetch. The work itself checks
+    `cancelled` between steps and spends from a budget of `budget` units per
+    user per `window` seconds, counted in the same backend.
+    """
+
+    def __init__(self, state, workers=2, budget=20, window=3600, ttl=900):
+        self.state = state
+        self.workers = workers
+        self.budget = budget
+        self.window = window
+        self.ttl = ttl
+        self._setup()
+
+    def _setup(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def reset_after_fork(self):
+        """Give a forked worker its own pool and lock"""
+        self._setup()
+
+    @staticmethod
+    def _key(*parts):
+        return ':'.join(('prefetch',) + parts)
+
+    def _save(self, prefetch):
+        prefetch.record['updated_at'] = time.time()
+        self.state.set(self._key(prefetch.id), dict(prefetch.record, steps=dict(prefetch.record['steps']), user=prefetch.user), ttl=self.ttl)
+
+    def start(self, user, run, **details):
+        """Cancel the user's previous prefetch and run run(prefetch) in the background, returning its record"""
+        previous = self.state.get(self._key('user', user))
+        if previous is not None:
+            self.cancel(previous, user)
+        now = time.time()
+        record = dict(details, id=uuid.uuid4().hex, status='queued', steps={}, error=None, created_at=now)
+        prefetch = Prefetch(self, record['id'], user, record)
+        self._save(prefetch)
+        self.state.set(self._key('user', user), prefetch.id, ttl=self.ttl)
+        self._pool.submit(self._run, prefetch, run)
+        return self.get(prefetch.id, user)
+
+    def _run(self, prefetch, run):
+        if prefetch.cancelled:
+            # Replaced or cancelled while it waited for a worker
+            prefetch.update(status='cancelled')
+            return
+        with self._lock:
+            self._running += 1
+        prefetch.update(status='running')
+        try:
+            run(prefetch)
+            status, error = 'cancelled' if prefetch.cancelled else 'completed', None
+        except Exception as e:
+            status, error = 'failed', str(e)
+        finally:
+            with self._lock:
+                self._running -= 1
+        prefetch.update(status=status, error=error)
+
+    def get(self, prefetch_id, user):
+        """Return a prefetch's record if it exists and belongs to user, otherwise None"""
+        record = self.state.get(self._key(prefetch_id))
+        if record is None:
+            return None
+        record = dict(record)
+        if record.pop('user') != user:
+            return None
+        if record['status'] not in FINISHED and self.state.get(self._key(prefetch_id, 'cancelled')) is not None:
+            # The work stops at its next step; nothing more is spent on it
+            record['status'] = 'cancelled'
+        return record
+
+    def cancel(self, prefetch_id, user):
+        """Stop a user's prefetch before its next step, returning its record or None if it is unknown"""
+        record = self.get(prefetch_id, user)
+        if record is None:
+            return None
+        if record['status'] not in FINISHED:
+            self.state.set(self._key(prefetch_id, 'cancelled'), '1', ttl=self.ttl)
+            record['status'] = 'cancelled'
+        return record
+
+    def take(self, user, amount=1):
+        key = self._key('budget', user)
+        if self.state.incr(key, amount, ttl=self.window) > self.budget:
+            self.state.incr(key, -amount, ttl=self.window)
+            return False
+        return True
+
+    def refund(self, user, amount=1):
+        self.state.incr(self._key('budget', user), -amount, ttl=self.window)
+
+    def remaining(self, user):
+        """Units of the user's budget left in the current window"""
+        return max(self.budget - int(self.state.get(self._key('budget', user)) or 0), 0)
+
+    def stats(self):
+        with self._lock:
+            return {'running': self._running, 'workers': self.workers, 'budget': self.budget, 'window': self.window}
@@ -0,0 +1,139 @@
+import json
+import math
+import re
+import string
+import textwrap
+import threading
+
+_TRAILING_SPACE = re.compile(r'[ \t]+$', re.MULTILINE)
+_BLANK_LINES = re.compile(r'\n{3,}')
+TRIM_MARKER = '\n[... {tokens} more tokens trimmed ...]'
+
+
+class PromptTooLarge(Exception):
+    """Raised when content that cannot be trimmed does not fit the prompt budget"""
+
+    def __init__(self, tokens, budget):
+        super().__init__(f'The content is about {tokens} tokens, over the {budget} token limit; '
+                         f'name the sections to change to refine them on their own')
+        self.tokens = tokens
+        self.budget = budget
+
+
+def minify(text):
+    """Drop trailing whitespace and collapse runs of blank lines, keeping indentation"""
+    return _BLANK_LINES.sub('\n\n', _TRAILING_SPACE.sub('', text)).strip()
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+class PromptTemplate:
+    """A prompt with {name} fields, dedented, minified and parsed once when defined"""
+
+    def __init__(self, text):
+        self.raw = text
+        self.text = minify(textwrap.dedent(text))
+        self._parts = [(literal, field) for literal, field, _, _ in string.Formatter().parse(self.text)]
+        self.fields = [field for _, field in self._parts if field]
+
+    def render(self, **values):
+        return ''.join(literal + (str(values[field]) if field else '') for literal, field in self._parts)
+
+    def render_raw(self, **values):
+        """Render the template as written, indentation included, to measure what compaction saved"""
+        return self.raw.format(**values)
+
+
+class TokenCounter:
+    """Count prompt tokens.
+
+    With exact (a callable returning a text's token count, e.g. the model's
+    count_tokens) every count is exact; otherwise tokens are estimated from the
+    length, at a characters-per-token ratio calibrated against the prompt token
+    counts the model reports for real calls.
+    """
+
+    def __init__(self, chars_per_token=4.0, exact=None):
+        self.chars_per_token = chars_per_token
+        self.exact = exact
+        self._lock = threading.Lock()
+
+    def estimate(self, text):
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def count(self, text):
+        if self.exact is not None:
+            try:
+                return self.exact(text)
+            except Exception:
+                pass
+        return self.estimate(text)
+
+    def calibrate(self, chars, tokens):
+        """Move the ratio towards one observed for a real call"""
+        if chars <= 0 or tokens <= 0:
+            return
+        with self._lock:
+            observed = min(max(chars / tokens, 1.5), 8.0)
+            self.chars_per_token += 0.1 * (observed - self.chars_per_token)
+
+
+def trim_text(text, max_tokens, counter):
+    """Cut text at a line break to about max_tokens, noting how much was left out"""
+    tokens = counter.estimate(text)
+    if tokens <= max_tokens:
+        return text
+    # Leave room for the marker itself
+    reserved = counter.estimate(TRIM_MARKER.format(tokens=tokens))
+    limit = max(int((max_tokens - reserved) * counter.chars_per_token), 0)
+    cut = text.rfind('\n', 0, limit)
+    kept = text[:cut if cut > limit // 2 else limit].rstrip()
+    return kept + TRIM_MARKER.format(tokens=tokens - counter.estimate(kept))
+
+
+def fit_values(values, budget, counter):
+    """Trim the largest values so that together they fit in budget tokens.
+
+    Values smaller than an even share of the budget are kept whole and their
+    unused share goes to the others. Returns (values, names of trimmed values).
+    """
+    sizes = {name: counter.estimate(value) for name, value in values.items()}
+    if sum(sizes.values()) <= budget:
+        return dict(values), []
+    remaining, pending = max(budget, 0), sorted(sizes, key=sizes.get)
+    limits = {}
+    while pending:
+        share = remaining // len(pending)
+        name = pending[0]
+        if sizes[name] > share:
+            break
+        limits[name] = sizes[name]
+        remaining -= sizes[name]
+        pending.pop(0)
+    for name in pending:
+        limits[name] = remaining // len(pending)
+    fitted = {name: trim_text(value, limits[name], counter) for name, value in values.items()}
+    return fitted, list(pending)
+
+
+def report(counter, raw_prompt, prompt, trimmed=(), dropped=()):
+    """Summarise a compacted prompt: its size, the tokens compaction saved, and what was cut"""
+    tokens = counter.count(prompt)
+    return {
+        'tokens': tokens,
+        'tokens_saved': max(counter.count(raw_prompt) - tokens, 0),
+        'trimmed': list(trimmed),
+        'dropped_sections': list(dropped),
+    }
+
+
+def merge_reports(reports):
+    """Combine the reports of several prompts made for one request"""
+    return {
+        'tokens': sum(r['tokens'] for r in reports),
+        'tokens_saved': sum(r['tokens_saved'] for r in reports),
+        'trimmed': [name for r in reports for name in r['trimmed']],
+        'dropped_sections': sorted({name for r in reports for name in r['dropped_sections']}),
+    }
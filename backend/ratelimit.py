@@ -0,0 +1,111 @@
+import math
+import threading
+import time
+
+
+class QuotaExhausted(Exception):
+    """Raised instead of calling GitHub when a token has no quota left until its reset"""
+
+    def __init__(self, key, reset_at):
+        self.retry_after = max(1, math.ceil(reset_at - time.time()))
+        super().__init__(f"GitHub API rate limit exhausted for {key}; resets in {self.retry_after} seconds")
+
+
+class CallShed(Exception):
+    """Raised when a low-priority call is skipped to save quota for essential calls"""
+
+
+class GitHubScheduler:
+    """Gates GitHub calls on the quota GitHub reports for each token.
+
+    Quota is tracked per token label and rate-limit resource ('core' for REST,
+    'graphql' for GraphQL). Once a token is out of quota every call fails fast
+    until the reset time, and while it is running low, low-priority calls are
+    shed so the remaining budget goes to essential ones. rate_limit_errors may
+    be a callable returning the exception types, resolved on first use.
+    """
+
+    def __init__(self, low_priority_reserve=200, rate_limit_errors=()):
+        self.low_priority_reserve = low_priority_reserve
+        self._rate_limit_errors = rate_limit_errors
+        self._lock = threading.Lock()
+        self._quota = {}  # (key, resource) -> {'remaining', 'limit', 'reset'}
+        self._stats = {'calls': 0, 'shed': 0, 'rejected': 0}
+
+    @property
+    def rate_limit_errors(self):
+        if callable(self._rate_limit_errors):
+            self._rate_limit_errors = tuple(self._rate_limit_errors())
+        return self._rate_limit_errors
+
+    def admit(self, key, priority='high', resource='core'):
+        """Raise if a call for key should not be made right now"""
+        with self._lock:
+            quota = self._quota.get((key, resource))
+            if quota and quota['reset'] <= time.time():
+                # The window has reset; assume full quota until GitHub says otherwise
+                del self._quota[(key, resource)]
+                quota = None
+            if quota and quota['remaining'] <= 0:
+                self._stats['rejected'] += 1
+                raise QuotaExhausted(key, quota['reset'])
+            if quota and priority == 'low' and quota['remaining'] < self.low_priority_reserve:
+                self._stats['shed'] += 1
+                raise CallShed(f"Skipped low-priority GitHub call: {quota['remaining']} requests left for {key}")
+            self._stats['calls'] += 1
+
+    def call(self, key, fn, *args, priority='high', resource='core'):
+        """Run fn(*args) if quota allows, converting rate-limit errors to QuotaExhausted"""
+        self.admit(key, priority, resource)
+        try:
+            return fn(*args)
+        except self.rate_limit_errors:
+            reset = time.time() + 60
+            with self._lock:
+                quota = self._quota.get((key, resource))
+                if quota and quota['reset'] > time.time():
+                    reset = quota['reset']
+                self._quota[(key, resource)] = {'remaining': 0, 'limit': quota['limit'] if quota else None, 'reset': reset}
+            raise QuotaExhausted(key, reset)
+
+    def record(self, key, remaining, limit, reset, resource='core'):
+        with self._lock:
+            self._quota[(key, resource)] = {'remaining': remaining, 'limit': limit, 'reset': reset}
+
+    def record_headers(self, key, headers):
+        """Update quota from X-RateLimit-* response headers"""
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            limit = int(headers['X-RateLimit-Limit'])
+            reset = int(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+        self.record(key, remaining, limit, reset, resource=headers.get('X-RateLimit-Resource', 'core'))
+
+    def record_client(self, key, client):
+        """Update quota from the last response a PyGithub client received"""
+        try:
+            remaining, limit = client.rate_limiting
+            reset = client.rate_limiting_resettime
+        except Exception:
+            return
+        if all(isinstance(value, int) for value in (remaining, limit, reset)) and limit >= 0:
+            self.record(key, remaining, limit, reset)
+
+    def clear(self):
+        with self._lock:
+            self._quota.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return dict(self._stats, tokens={
+                f"{key}:{resource}": {
+                    'remaining': quota['remaining'],
+                    'limit': quota['limit'],
+                    'resets_in': max(0, math.ceil(quota['reset'] - now)),
+                }
+                for (key, resource), quota in self._quota.items()
+            })
@@ -0,0 +1,132 @@
+import re
+from urllib.parse import quote
+
+SHIELDS_URL = 'https://img.shields.io'
+PLACEHOLDER = '<!-- section:{section_id} -->'
+# GitHub reports licenses it can't identify as 'Other' (SPDX id NOASSERTION)
+UNKNOWN_VALUES = {'', 'unknown', 'not specified', 'none', 'other', 'noassertion'}
+
+
+def _known(value):
+    return isinstance(value, str) and value.strip().lower() not in UNKNOWN_VALUES
+
+
+def _link_text(text):
+    # Display names are user-controlled, so brackets and parentheses can't be allowed to end the link
+    return re.sub(r'([\\\[\]()])', r'\\\1', str(text))
+
+
+def _badge_text(text):
+    # Shields.io static badges use '-' and '_' as separators, so literal ones are doubled
+    return quote(str(text).replace('-', '--').replace('_', '__'), safe='')
+
+
+def render_license(metadata, user_content):
+    """State the project's license, named by the user or taken from GitHub"""
+    name = (user_content or '').strip() or metadata.get('license')
+    if not _known(name) or '\n' in name or len(name) > 100:
+        # Custom license text is prose for the model to work with
+        return None
+    if 'license' not in name.lower():
+        name = f'{name} License'
+    return f'This project is licensed under the {name}.'
+
+
+def render_contributors(metadata, user_content):
+    """List the repository's contributors, most active first, linked to their GitHub profiles"""
+    contributors = metadata.get('contributors') or []
+    if (user_content or '').strip() or not contributors:
+        return None
+    lines = ['Thanks to everyone who has contributed to this project:', '']
+    for contributor in sorted(contributors, key=lambda c: -(c.get('contributions') or 0)):
+        login = contributor['login']
+        name = contributor.get('name') or login
+        count = contributor.get('contributions') or 0
+        plural = '' if count == 1 else 's'
+        lines.append(f'- [{_link_text(name)}](https://github.com/{login}) ({count} contribution{plural})')
+    return '\n'.join(lines)
+
+
+def render_badges(metadata, user_content):
+    """Shields.io badges for the repository's stars, forks, license and language, then its topics"""
+    owner, repo_name = metadata.get('owner'), metadata.get('repo_name')
+    badges = []
+    if (user_content or '').strip():
+        return None
+    if owner and repo_name:
+        # Dynamic badges stay current as the repository changes
+        for label, path in (('Stars', 'stars'), ('Forks', 'forks'), ('License', 'license')):
+            if label != 'License' or _known(metadata.get('license')):
+                badges.append(f'![{label}]({SHIELDS_URL}/github/{path}/{owner}/{repo_name})')
+    if _known(metadata.get('language')):
+        language = metadata['language']
+        badges.append(f'![Language]({SHIELDS_URL}/badge/language-{_badge_text(language)}-blue)')
+    if not badges:
+        return None
+    lines = [' '.join(badges)]
+    if metadata.get('topics'):
+        lines += ['', ' '.join(f'`{topic}`' for topic in metadata['topics'])]
+    return '\n'.join(lines)
+
+
+# Sections made entirely from repository metadata. Each renderer returns the section's
+# body, or None when it lacks the data (or the user wrote custom content) and the model
+# should write the section instead.
+RENDERERS = {
+    'license': render_license,
+    'contributors': render_contributors,
+    'badges': render_badges,
+}
+
+
+def render_section(section_id, metadata, user_content=None):
+    renderer = RENDERERS.get(section_id.lower())
+    if renderer is None or not (user_content is None or isinstance(user_content, str)):
+        return None
+    return renderer(metadata or {}, user_content)
+
+
+def placeholder(section_id):
+    return PLACEHOLDER.format(section_id=section_id)
+
+
+class SectionSplicer:
+    """Replace placeholder lines in model output with locally rendered sections.
+
+    sections maps section ids to the Markdown (header and body) that replaces
+    their placeholder lines. Text can be fed in chunks as it streams; complete
+    lines are passed on, and finish() flushes the rest, appending any section
+    whose placeholder the model left out.
+    """
+
+    def __init__(self, sections):
+        self.rendered = {placeholder(section_id): text for section_id, text in sections.items()}
+        self._buffer = ''
+        self._emitted = False
+
+    def _replace(self, line):
+        section = self.rendered.pop(line.strip(), None)
+        return line if section is None else section
+
+    def feed(self, text):
+        lines = (self._buffer + text).split('\n')
+        self._buffer = lines.pop()
+        self._emitted = self._emitted or bool(lines)
+        return ''.join(self._replace(line) + '\n' for line in lines)
+
+    def finish(self):
+        text = self._replace(self._buffer) if self._buffer else ''
+        self._buffer = ''
+        missing = list(self.rendered.values())
+        self.rendered.clear()
+        if missing:
+            if text.strip():
+                text = text.rstrip('\n') + '\n\n'
+            elif self._emitted:
+                # Earlier output already ended in a newline, so one more leaves a blank line
+                text = '\n'
+            text += '\n\n'.join(missing) + '\n'
+        return text
+
+    def splice(self, text):
+        return self.feed(text) + self.finish()
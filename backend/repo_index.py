@@ -0,0 +1,145 @@
+import posixpath
+from collections import Counter
+
+# Directories holding vendored, generated or environment files, which say nothing about the project itself
+IGNORED_DIRS = {
+    '.git', '.venv', 'venv', 'env', 'node_modules', 'vendor', 'third_party', 'dist', 'build',
+    'target', '__pycache__', '.tox', '.next', 'bower_components',
+}
+
+# Evidence for each stack: marker file names with their weight when found at the root.
+# Order matters: on equal confidence the earlier stack is reported first.
+STACK_RULES = [
+    ('Web Application', {
+        'package.json': 0.6, 'yarn.lock': 0.2, 'pnpm-lock.yaml': 0.2, 'package-lock.json': 0.2,
+        'webpack.config.js': 0.3, 'vite.config.js': 0.3, 'vite.config.ts': 0.3, 'next.config.js': 0.4,
+        'angular.json': 0.4, 'index.html': 0.2,
+    }),
+    ('Python Application', {
+        'requirements.txt': 0.6, 'setup.py': 0.6, 'pyproject.toml': 0.6, 'pipfile': 0.5, 'setup.cfg': 0.3,
+    }),
+    ('Java Application', {'pom.xml': 0.7, 'build.gradle': 0.7, 'build.gradle.kts': 0.7}),
+    ('Rust Application', {'cargo.toml': 0.8}),
+    ('Go Application', {'go.mod': 0.8}),
+    ('Containerized Application', {
+        'dockerfile': 0.4, 'docker-compose.yml': 0.5, 'docker-compose.yaml': 0.5, 'compose.yaml': 0.5,
+    }),
+]
+
+# Source file extensions that add to a stack's confidence in proportion to their share of the code
+STACK_EXTENSIONS = {
+    'Web Application': {'.js', '.jsx', '.ts', '.tsx', '.vue', '.svelte'},
+    'Python Application': {'.py'},
+    'Java Application': {'.java', '.kt'},
+    'Rust Application': {'.rs'},
+    'Go Application': {'.go'},
+}
+
+# Root files taken as the README, in order of preference
+README_NAMES = ('readme.md', 'readme.markdown', 'readme.rst', 'readme.txt', 'readme')
+
+# Markers further from the root are weaker evidence for what the repository is
+_DEPTH_FACTORS = (1.0, 0.8)
+_DEEP_FACTOR = 0.5
+_EXTENSION_WEIGHT = 0.4
+MIN_CONFIDENCE = 0.3
+
+
+class RepoIndex:
+    """Every path in a repository's tree at one commit, mapped to its (type, size).
+
+    Built from a recursive git trees response, where type is 'blob' or 'tree'
+    and size is None for trees. readme is the {'path', 'sha', 'size'} of the
+    root README blob, if there is one. Immutable once built, so one index can
+    be shared by every request for the same commit.
+    """
+
+    def __init__(self, sha, entries, truncated=False, readme=None):
+        self.sha = sha
+        self.entries = entries
+        self.truncated = truncated
+        self.readme = readme
+        self._names = None
+
+    @classmethod
+    def from_tree(cls, sha, payload):
+        """Index a GET /git/trees/{sha}?recursive=1 response body"""
+        entries = {}
+        readmes = {}
+        for entry in payload.get('tree') or []:
+            path, kind = entry.get('path'), entry.get('type')
+            if kind not in ('blob', 'tree'):
+                continue
+            entries[path] = (kind, entry.get('size'))
+            if kind == 'blob' and path.lower() in README_NAMES:
+                readmes[path.lower()] = {'path': path, 'sha': entry.get('sha'), 'size': entry.get('size')}
+        readme = next((readmes[name] for name in README_NAMES if name in readmes), None)
+        return cls(sha, entries, bool(payload.get('truncated')), readme)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def root_names(self):
+        """Lower-cased names of the entries at the top of the tree"""
+        return [path.lower() for path in self.entries if '/' not in path]
+
+    def files_named(self):
+        """Map lower-cased file names to the paths they appear at, skipping ignored directories"""
+        if self._names is None:
+            names = {}
+            for path, (kind, _) in self.entries.items():
+                if kind != 'blob':
+                    continue
+                parts = path.split('/')
+                if any(part in IGNORED_DIRS for part in parts[:-1]):
+                    continue
+                names.setdefault(parts[-1].lower(), []).append(path)
+            self._names = names
+        return self._names
+
+    def extension_counts(self):
+        """Count files by lower-cased extension, skipping ignored directories"""
+        counts = Counter()
+        for name, paths in self.files_named().items():
+            extension = posixpath.splitext(name)[1]
+            if extension:
+                counts[extension] += len(paths)
+        return counts
+
+
+def detect_stacks(index, min_confidence=MIN_CONFIDENCE):
+    """Score each stack in STACK_RULES against a repository index.
+
+    Returns a list of {'type', 'confidence', 'paths'} dicts, most confident first,
+    where paths are the directories ('.' for the root) holding the stack's markers.
+    A monorepo with frontend/package.json and backend/requirements.txt reports both.
+    """
+    names = index.files_named()
+    extensions = index.extension_counts()
+    source_files = sum(count for ext, count in extensions.items()
+                       if any(ext in family for family in STACK_EXTENSIONS.values()))
+
+    stacks = []
+    for order, (stack, markers) in enumerate(STACK_RULES):
+        # Combine independent pieces of evidence: 1 - product of (1 - weight)
+        disbelief = 1.0
+        directories = set()
+        for marker, weight in markers.items():
+            for path in names.get(marker, []):
+                depth = path.count('/')
+                factor = _DEPTH_FACTORS[depth] if depth < len(_DEPTH_FACTORS) else _DEEP_FACTOR
+                disbelief *= 1 - weight * factor
+                directories.add(posixpath.dirname(path) or '.')
+        family = STACK_EXTENSIONS.get(stack)
+        if family and source_files:
+            share = sum(extensions[ext] for ext in family) / source_files
+            disbelief *= 1 - _EXTENSION_WEIGHT * share
+        confidence = 1 - disbelief
+        if confidence >= min_confidence and directories:
+            stacks.append((confidence, -order, {
+                'type': stack,
+                'confidence': round(confidence, 2),
+                'paths': sorted(directories, key=lambda d: (d != '.', d)),
+            }))
+    stacks.sort(key=lambda item: item[:2], reverse=True)
+    return [stack for _, _, stack in stacks]
@@ -0,0 +1,382 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+from limits.storage import Storage
+
+
+class StateError(Exception):
+    """Raised when the state backend rejects a command"""
+
+
+class MemoryState:
+    """Keys with optional expiry held in this process; nothing is shared between workers"""
+
+    shared = False
+    name = 'memory'
+
+    def __init__(self):
+        self._entries = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        """Add amount to a counter, creating it with the given TTL if it does not exist"""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                entry = (0, time.time() + ttl if ttl else None)
+            self._entries[key] = (entry[0] + amount, entry[1])
+            return entry[0] + amount
+
+    def expiry(self, key):
+        """Return when key expires as a Unix timestamp, or None if it does not exist or never expires"""
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else entry[1]
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def check(self):
+        return True
+
+
+class SQLiteState:
+    """Keys with optional expiry in a SQLite file, shared by every worker process on one host.
+
+    Counters are updated with a single upsert, so increments from concurrent
+    processes are never lost. Each thread of each process uses its own connection.
+    """
+
+    shared = True
+    name = 'sqlite'
+    PURGE_EVERY = 200  # Writes between sweeps of expired keys
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)')
+
+    def _conn(self):
+        # A connection must not be used across a fork, e.g. under gunicorn --preload
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
+
+    def _written(self, conn):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM state WHERE expires_at <= ?', (time.time(),))
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)', (key, time.time())
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)',
+                     (key, json.dumps(value), time.time() + ttl if ttl else None))
+        self._written(conn)
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM state WHERE key = ?', (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        """Add amount to a counter, creating it with the given TTL if it does not exist or has expired"""
+        conn = self._conn()
+        now = time.time()
+        (value,) = conn.execute(
+            'INSERT INTO state (key, value, expires_at) VALUES (:key, :amount, :expires_at) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = CASE WHEN expires_at <= :now THEN :amount ELSE CAST(value AS INTEGER) + :amount END, '
+            'expires_at = CASE WHEN expires_at <= :now THEN :expires_at ELSE expires_at END '
+            'RETURNING CAST(value AS INTEGER)',
+            {'key': key, 'amount': amount, 'expires_at': now + ttl if ttl else None, 'now': now},
+        ).fetchone()
+        self._written(conn)
+        return value
+
+    def expiry(self, key):
+        """Return when key expires as a Unix timestamp, or None if it does not exist or never expires"""
+        row = self._conn().execute(
+            'SELECT expires_at FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)', (key, time.time())
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def clear(self, prefix=''):
+        self._conn().execute('DELETE FROM state WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+
+    def check(self):
+        try:
+            self._conn().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class RedisState:
+    """Keys with optional expiry on a Redis-protocol server, shared by workers on any host.
+
+    Speaks RESP over one socket per thread and process, so the client library
+    is not needed. Commands for one operation are pipelined in a single round trip.
+    """
+
+    shared = True
+    name = 'redis'
+
+    def __init__(self, url, timeout=2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader, self._local.pid = sock, sock.makefile('rb'), os.getpid()
+        setup = ([('AUTH', self.password)] if self.password else []) + ([('SELECT', self.db)] if self.db else [])
+        if setup:
+            self._pipeline(setup)
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = self._local.pid = None
+        if sock is not None:
+            sock.close()
+
+    @staticmethod
+    def _encode(command):
+        parts = [str(arg).encode('utf-8') if not isinstance(arg, bytes) else arg for arg in command]
+        return b'*%d\r\n' % len(parts) + b''.join(b'$%d\r\n%s\r\n' % (len(part), part) for part in parts)
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by the state server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            return StateError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            return None if length < 0 else self._local.reader.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise StateError(f'Unexpected reply from the state server: {line!r}')
+
+    def _pipeline(self, commands):
+        self._local.sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, StateError):
+                raise reply
+        return replies
+
+    def execute(self, *commands):
+        """Send commands in one round trip and return their replies, reconnecting once if the socket broke"""
+        for attempt in range(2):
+            if getattr(self._local, 'pid', None) != os.getpid():
+                self._connect()
+            try:
+                return self._pipeline(commands)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                if attempt:
+                    raise
+
+    def get(self, key):
+        (value,) = self.execute(('GET', key))
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        command = ('SET', key, json.dumps(value)) + (('PX', int(ttl * 1000)) if ttl else ())
+        self.execute(command)
+
+    def delete(self, key):
+        self.execute(('DEL', key))
+
+    def incr(self, key, amount=1, ttl=None):
+        """Add amount to a counter, creating it with the given TTL if it does not exist"""
+        if not ttl:
+            return self.execute(('INCRBY', key, amount))[0]
+        ms = int(ttl * 1000)
+        _, value, remaining = self.execute(('SET', key, 0, 'PX', ms, 'NX'), ('INCRBY', key, amount), ('PTTL', key))
+        if remaining == -1:
+            # The key expired between SET and INCRBY and was recreated without a TTL
+            self.execute(('PEXPIRE', key, ms))
+        return value
+
+    def expiry(self, key):
+        """Return when key expires as a Unix timestamp, or None if it does not exist or never expires"""
+        (remaining,) = self.execute(('PTTL', key))
+        return time.time() + remaining / 1000 if remaining >= 0 else None
+
+    def clear(self, prefix=''):
+        cursor = 0
+        while True:
+            cursor, keys = self.execute(('SCAN', cursor, 'MATCH', _glob_escape(prefix) + '*', 'COUNT', 500))[0]
+            if keys:
+                self.execute(('DEL', *keys))
+            cursor = int(cursor)
+            if cursor == 0:
+                return
+
+    def check(self):
+        try:
+            return self.execute(('PING',))[0] == 'PONG'
+        except (OSError, ConnectionError, StateError):
+            return False
+
+
+def _glob_escape(text):
+    return ''.join('\\' + char if char in '*?[]\\' else char for char in text)
+
+
+def state_from_url(url):
+    """Build a state backend from memory://, sqlite:///path/to/file.db or redis://[:password@]host:port/db"""
+    scheme = url.split('://', 1)[0].lower()
+    if scheme == 'memory':
+        return MemoryState()
+    if scheme == 'sqlite':
+        return SQLiteState(url[len('sqlite:///'):])
+    if scheme == 'redis':
+        return RedisState(url)
+    raise ValueError(f'Unsupported state backend: {url}')
+
+
+class SharedCache:
+    """TTLCache-compatible cache kept in a state backend, so every worker sees the same entries.
+
+    Entries are kept for stale_ttl seconds past their TTL so that peek() can
+    still return them for conditional revalidation. Values must be JSON-serialisable.
+    Hit and miss counts are for this process only.
+    """
+
+    def __init__(self, state, namespace, ttl=300, stale_ttl=None):
+        self.state = state
+        self.prefix = f'cache:{namespace}:'
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'revalidated': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _store(self, key, value, etag):
+        self.state.set(self.prefix + key, [value, etag, time.time() + self.ttl], ttl=self.ttl + self.stale_ttl)
+
+    def get(self, key, default=None):
+        entry = self.state.get(self.prefix + key)
+        if entry is None or entry[2] <= time.time():
+            self._count('misses')
+            return default
+        self._count('hits')
+        return entry[0]
+
+    def peek(self, key):
+        """Return (value, etag) for key even if expired, or None if absent"""
+        entry = self.state.get(self.prefix + key)
+        return None if entry is None else (entry[0], entry[1])
+
+    def set(self, key, value, etag=None):
+        self._store(key, value, etag)
+
+    def refresh(self, key):
+        """Extend the lifetime of an entry that was revalidated upstream"""
+        entry = self.state.get(self.prefix + key)
+        if entry is None:
+            return False
+        self._store(key, entry[0], entry[1])
+        self._count('revalidated')
+        return True
+
+    def clear(self):
+        self.state.clear(self.prefix)
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, ttl=self.ttl, backend=self.state.name)
+
+
+class LimiterStorage(Storage):
+    """Flask-Limiter storage keeping its counters in a state backend.
+
+    Use storage_uri='shared-state://' with storage_options={'state': backend}.
+    Only the fixed-window strategy is supported.
+    """
+
+    STORAGE_SCHEME = ['shared-state']
+    PREFIX = 'limiter:'
+
+    def __init__(self, uri=None, wrap_exceptions=False, state=None, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.state = state if state is not None else MemoryState()
+
+    @property
+    def base_exceptions(self):
+        return (StateError, OSError, ConnectionError, sqlite3.Error)
+
+    def incr(self, key, expiry, amount=1):
+        return self.state.incr(self.PREFIX + key, amount, ttl=expiry)
+
+    def get(self, key):
+        return self.state.get(self.PREFIX + key) or 0
+
+    def get_expiry(self, key):
+        return self.state.expiry(self.PREFIX + key) or time.time()
+
+    def check(self):
+        return self.state.check()
+
+    def reset(self):
+        self.state.clear(self.PREFIX)
+        return None
+
+    def clear(self, key):
+        self.state.delete(self.PREFIX + key)
@@ -1,15 +1,60 @@
 
 import pytest
 import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest.mock import MagicMock, patch
-from app import app
+from app import (
+    app, repo_metadata_cache, contributor_name_cache, llm_response_cache, github_clients, user_repos_cache,
+    github_scheduler, quota_key, llm_governor, metrics, create_app, repo_tree_cache, repo_flights, llm_flights,
+    readme_cache,
+)
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
+    repo_metadata_cache.clear()
+    contributor_name_cache.clear()
+    llm_response_cache.clear()
+    github_clients.clear()
+    user_repos_cache.clear()
+    repo_tree_cache.clear()
+    readme_cache.clear()
+    github_scheduler.clear()
+    llm_governor.reset()
+    metrics.clear()
+    repo_flights.clear()
+    llm_flights.clear()
     with app.test_client() as client:
         yield client
 
+@pytest.fixture
+def graphql_server():
+    """Serve canned GitHub GraphQL responses from a local stub server."""
+    state = {'response': {'data': {}}, 'requests': []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            state['requests'].append(json.loads(body))
+            payload = json.dumps(state['response']).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state['url'] = f'http://127.0.0.1:{server.server_port}/graphql'
+    yield state
+    server.shutdown()
+
 def test_health_check(client):
     """Test the health check endpoint."""
     response = client.get('/api/health')
@@ -32,7 +77,7 @@ def test_validate_repo_with_url_success(client, mocker):
     mock_repo.get_contributors.return_value.totalCount = 1
     mock_repo.get_contents.return_value.decoded_content = b'# Test README'
 
-    mocker.patch('app.Github').return_value.get_repo.return_value = mock_repo
+    mocker.patch('github.Github').return_value.get_repo.return_value = mock_repo
     
     response = client.post('/api/validate-repo', json={'repo_url': 'https://github.com/owner/test-repo'})
     
@@ -57,7 +102,7 @@ def test_validate_repo_with_owner_repo_success(client, mocker):
     mock_repo.get_contributors.return_value.totalCount = 1
     mock_repo.get_contents.return_value.decoded_content = b'# Test README'
 
-    mocker.patch('app.Github').return_value.get_repo.return_value = mock_repo
+    mocker.patch('github.Github').return_value.get_repo.return_value = mock_repo
     
     response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
     
@@ -66,6 +111,518 @@ def test_validate_repo_with_owner_repo_success(client, mocker):
     assert json_data['valid'] is True
     assert json_data['metadata']['name'] == 'test-repo'
 
+def test_validate_repo_served_from_cache(client, mocker):
+    """Test that a repeat validation of the same repository does not hit GitHub again."""
+    mock_repo = MagicMock()
+    mock_repo.name = 'test-repo'
+    mock_repo.description = 'A test repository'
+    mock_repo.language = 'Python'
+    mock_repo.license.name = 'MIT License'
+    mock_repo.stargazers_count = 10
+    mock_repo.forks_count = 5
+    mock_repo.default_branch = 'main'
+    mock_repo.get_topics.return_value = ['python']
+    mock_repo.created_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.updated_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.get_contents.return_value.decoded_content = b'# Test README'
+    mock_repo.etag = 'W/"abc"'
+
+    mock_github = mocker.patch('github.Github')
+    mock_github.return_value.get_repo.return_value = mock_repo
+
+    client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+    fetches = mock_github.return_value.get_repo.call_count
+    response = client.post('/api/validate-repo', json={'repo_url': 'https://github.com/Owner/test-repo'})
+
+    assert response.get_json()['metadata']['name'] == 'test-repo'
+    assert response.get_json()['metadata']['owner'] == 'owner'
+    assert mock_github.return_value.get_repo.call_count == fetches
+    stats = client.get('/api/stats').get_json()['caches']['repo_metadata']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+def test_validate_repo_revalidates_expired_entry(client, mocker):
+    """Test that an expired cache entry is reused when GitHub answers 304 Not Modified."""
+    repo_metadata_cache.set('owner/test-repo', {'name': 'test-repo'}, etag='W/"abc"')
+    mocker.patch('cache.time.monotonic', return_value=float('inf'))
+    mock_get = mocker.patch('app.github_clients.session.get')
+    mock_get.return_value.status_code = 304
+    mock_github = mocker.patch('github.Github')
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+
+    assert response.get_json()['valid'] is True
+    assert mock_get.call_args.kwargs['headers']['If-None-Match'] == 'W/"abc"'
+    mock_github.return_value.get_repo.assert_not_called()
+    assert repo_metadata_cache.stats()['revalidated'] == 1
+
+def test_validate_repo_fetches_each_resource_once(client, mocker):
+    """Test that validation and project type detection share a single repository fetch."""
+    mock_repo = MagicMock()
+    mock_repo.name = 'test-repo'
+    mock_repo.description = 'A test repository'
+    mock_repo.language = 'Rust'
+    mock_repo.license.name = 'MIT License'
+    mock_repo.stargazers_count = 10
+    mock_repo.forks_count = 5
+    mock_repo.default_branch = 'main'
+    mock_repo.is_template = False
+    mock_repo.get_topics.return_value = []
+    mock_repo.created_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.updated_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.get_git_ref.return_value.object.sha = 'abc123'
+    mock_repo.get_git_tree.return_value.raw_data = {'sha': 'abc123', 'tree': [
+        {'path': 'Cargo.toml', 'type': 'blob', 'size': 120},
+        {'path': 'README.md', 'type': 'blob', 'size': 13, 'sha': 'f' * 40},
+        {'path': 'src', 'type': 'tree'},
+        {'path': 'src/main.rs', 'type': 'blob', 'size': 900},
+    ]}
+    mock_repo.get_contents.return_value.decoded_content = b'# Test README'
+    alice, bob = MagicMock(login='alice', contributions=7), MagicMock(login='bob', contributions=3)
+    alice.name, bob.name = 'Alice', None
+    mock_repo.get_contributors.return_value.__getitem__.return_value = [alice, bob]
+
+    mock_github = mocker.patch('github.Github')
+    mock_github.return_value.get_repo.return_value = mock_repo
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+
+    metadata = response.get_json()['metadata']
+    assert metadata['detected_project_type'] == 'Rust Application'
+    assert metadata['detected_stacks'] == [{'type': 'Rust Application', 'confidence': 0.88, 'paths': ['.']}]
+    assert metadata['detected_team_context'] == 'Team'
+    assert metadata['readme'] == {'present': True, 'path': 'README.md', 'sha': 'f' * 40, 'size': 13}
+    assert 'existing_readme' not in metadata
+    mock_repo.get_contents.assert_not_called()
+    assert metadata['contributors'][1] == {'login': 'bob', 'name': 'bob', 'contributions': 3}
+    assert mock_github.return_value.get_repo.call_count == 1
+    assert mock_repo.get_topics.call_count == 1
+    assert mock_repo.get_contributors.call_count == 1
+    mock_repo.get_git_ref.assert_called_once_with('heads/main')
+    mock_repo.get_git_tree.assert_called_once_with('abc123', True)
+
+def _tree_repo(mocker, paths, sha='abc123'):
+    mock_repo = MagicMock()
+    mock_repo.name = 'monorepo'
+    mock_repo.description = ''
+    mock_repo.language = 'TypeScript'
+    mock_repo.license = None
+    mock_repo.get_contents.side_effect = Exception('Not Found')
+    mock_repo.stargazers_count = 0
+    mock_repo.forks_count = 0
+    mock_repo.is_template = False
+    mock_repo.default_branch = 'main'
+    mock_repo.get_topics.return_value = []
+    mock_repo.created_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.updated_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.get_git_ref.return_value.object.sha = sha
+    mock_repo.get_git_tree.return_value.raw_data = {'sha': sha, 'tree': [
+        {'path': path, 'type': 'blob', 'size': 100} for path in paths
+    ]}
+    mocker.patch('github.Github').return_value.get_repo.return_value = mock_repo
+    return mock_repo
+
+def test_validate_repo_detects_every_stack_in_a_monorepo(client, mocker):
+    """Test that stacks in subdirectories are detected from the recursive tree."""
+    _tree_repo(mocker, [
+        'README.md', 'setup.sh',
+        'frontend/package.json', 'frontend/src/App.tsx', 'frontend/src/index.ts',
+        'frontend/node_modules/left-pad/setup.py',
+        'backend/requirements.txt', 'backend/app.py', 'backend/test_app.py',
+    ])
+
+    metadata = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'monorepo'}).get_json()['metadata']
+
+    assert [(stack['type'], stack['paths']) for stack in metadata['detected_stacks']] == [
+        ('Web Application', ['frontend']),
+        ('Python Application', ['backend']),
+    ]
+    assert metadata['detected_project_type'] == 'Web Application'
+    assert all(0 < stack['confidence'] < 1 for stack in metadata['detected_stacks'])
+
+def test_validate_repo_tree_cached_by_commit(client, mocker):
+    """Test that the tree of an unchanged commit is not fetched again."""
+    mock_repo = _tree_repo(mocker, ['go.mod', 'main.go'])
+
+    client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'monorepo'})
+    repo_metadata_cache.clear()
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'monorepo'})
+
+    assert response.get_json()['metadata']['detected_project_type'] == 'Go Application'
+    assert mock_repo.get_git_ref.call_count == 2
+    assert mock_repo.get_git_tree.call_count == 1
+    assert repo_tree_cache.stats()['hits'] == 1
+
+def _wait_for_coalesced(flights, count):
+    deadline = time.monotonic() + 5
+    while flights.stats()['coalesced'] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_validate_repo_coalesces_concurrent_lookups(client, mocker):
+    """Test that concurrent validations of one repository share a single GitHub fetch."""
+    mock_repo = _tree_repo(mocker, ['go.mod'])
+    mock_github = mocker.patch('github.Github')
+    release = threading.Event()
+    mock_github.return_value.get_repo.side_effect = lambda name: release.wait(5) and mock_repo
+
+    responses = []
+    def validate():
+        responses.append(app.test_client().post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'monorepo'}))
+    threads = [threading.Thread(target=validate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    _wait_for_coalesced(repo_flights, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [response.get_json()['metadata']['detected_project_type'] for response in responses] == ['Go Application'] * 4
+    assert mock_github.return_value.get_repo.call_count == 1
+    assert repo_flights.stats() == {'calls': 1, 'coalesced': 3, 'in_flight': 0}
+    assert 'coalesced_calls_total{flight="repos"} 3' in client.get('/api/metrics').get_data(as_text=True)
+
+def test_validate_repo_private_result_not_shared_across_tokens(client, mocker):
+    """Test that a private repository fetched with one user's token is refetched for another user."""
+    mock_repo = _tree_repo(mocker, ['go.mod'])
+    mock_repo.private = True
+    mock_github = mocker.patch('github.Github')
+    release = threading.Event()
+    mock_github.return_value.get_repo.side_effect = lambda name: release.wait(5) and mock_repo
+
+    responses = []
+    def validate(token):
+        responses.append(app.test_client().post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'monorepo'},
+                                                headers={'Authorization': f'Bearer {token}'}))
+    first = threading.Thread(target=validate, args=('token-a',))
+    first.start()
+    while repo_flights.stats()['calls'] == 0:
+        time.sleep(0.01)
+    second = threading.Thread(target=validate, args=('token-b',))
+    second.start()
+    _wait_for_coalesced(repo_flights, 1)
+    release.set()
+    first.join()
+    second.join()
+
+    assert all(response.get_json()['valid'] for response in responses)
+    assert mock_github.return_value.get_repo.call_count == 2
+    assert {call.args[0] for call in mock_github.call_args_list} == {'token-a', 'token-b'}
+
+def test_validate_repo_graphql_backend(client, mocker, graphql_server):
+    """Test that the GraphQL backend returns the same metadata shape from a single query."""
+    graphql_server['response'] = {'data': {'repository': {
+        'name': 'test-repo',
+        'description': 'A test repository',
+        'primaryLanguage': {'name': 'Go'},
+        'licenseInfo': {'name': 'MIT License'},
+        'stargazerCount': 10,
+        'forkCount': 5,
+        'repositoryTopics': {'nodes': [{'topic': {'name': 'cli'}}]},
+        'defaultBranchRef': {'name': 'main', 'target': {'oid': 'abc123', 'history': {'nodes': [
+            {'author': {'user': {'login': 'alice', 'name': 'Alice'}}},
+            {'author': {'user': {'login': 'bob', 'name': None}}},
+            {'author': {'user': {'login': 'alice', 'name': 'Alice'}}},
+            {'author': {'user': None}},
+        ]}}},
+        'createdAt': '2025-01-01T00:00:00Z',
+        'updatedAt': '2025-01-02T00:00:00Z',
+        'isTemplate': False,
+        'readme': {'oid': 'f' * 40, 'byteSize': 13},
+    }}}
+    mocker.patch('app.GITHUB_FETCH_BACKEND', 'graphql')
+    mocker.patch('app.GITHUB_TOKEN', 'test_token')
+    mocker.patch('app.GITHUB_GRAPHQL_URL', graphql_server['url'])
+    mock_github = mocker.patch('github.Github')
+    mock_get = mocker.patch('app.github_clients.session.get')
+    mock_get.return_value.headers = {}
+    mock_get.return_value.json.return_value = {'sha': 'abc123', 'tree': [
+        {'path': 'go.mod', 'type': 'blob', 'size': 40},
+        {'path': 'main.go', 'type': 'blob', 'size': 400},
+    ]}
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+
+    metadata = response.get_json()['metadata']
+    assert len(graphql_server['requests']) == 1
+    assert mock_get.call_args.args[0].endswith('/repos/owner/test-repo/git/trees/abc123')
+    assert graphql_server['requests'][0]['variables'] == {'owner': 'owner', 'name': 'test-repo'}
+    mock_github.assert_not_called()
+    assert metadata['language'] == 'Go'
+    assert metadata['topics'] == ['cli']
+    assert metadata['created_at'] == '2025-01-01T00:00:00+00:00'
+    assert metadata['detected_project_type'] == 'Go Application'
+    assert metadata['detected_team_context'] == 'Team'
+    assert metadata['readme'] == {'present': True, 'path': 'README.md', 'sha': 'f' * 40, 'size': 13}
+    assert metadata['contributors'] == [
+        {'login': 'alice', 'name': 'Alice', 'contributions': 2},
+        {'login': 'bob', 'name': 'bob', 'contributions': 1},
+    ]
+
+def test_validate_repo_graphql_not_found(client, mocker, graphql_server):
+    """Test that GraphQL errors surface as an invalid repository."""
+    graphql_server['response'] = {'data': {'repository': None}, 'errors': [
+        {'type': 'NOT_FOUND', 'message': "Could not resolve to a Repository with the name 'owner/missing'."}
+    ]}
+    mocker.patch('app.GITHUB_FETCH_BACKEND', 'graphql')
+    mocker.patch('app.GITHUB_TOKEN', 'test_token')
+    mocker.patch('app.GITHUB_GRAPHQL_URL', graphql_server['url'])
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'missing'})
+
+    json_data = response.get_json()
+    assert json_data['valid'] is False
+    assert 'Could not resolve' in json_data['error']
+
+def _contributor_repo(mocker, contributors):
+    mock_repo = MagicMock()
+    mock_repo.name = 'test-repo'
+    mock_repo.description = ''
+    mock_repo.language = 'Python'
+    mock_repo.license = None
+    mock_repo.get_contents.side_effect = Exception('Not Found')
+    mock_repo.stargazers_count = 0
+    mock_repo.forks_count = 0
+    mock_repo.default_branch = 'main'
+    mock_repo.get_topics.return_value = []
+    mock_repo.created_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.updated_at.isoformat.return_value = '2025-01-01T00:00:00Z'
+    mock_repo.get_contributors.return_value.__getitem__.return_value = contributors
+    mocker.patch('github.Github').return_value.get_repo.return_value = mock_repo
+    return mock_repo
+
+def test_contributor_names_batched_graphql(client, mocker, graphql_server):
+    """Test that contributor names are fetched in one GraphQL request and cached across repos."""
+    graphql_server['response'] = {'data': {'u0': {'name': 'Alice'}, 'u1': {'name': None}}}
+    mocker.patch('app.GITHUB_TOKEN', 'test_token')
+    mocker.patch('app.GITHUB_GRAPHQL_URL', graphql_server['url'])
+    alice, bob = MagicMock(login='alice', contributions=7), MagicMock(login='bob', contributions=3)
+    _contributor_repo(mocker, [alice, bob])
+
+    first = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+    second = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'other-repo'})
+
+    assert len(graphql_server['requests']) == 1
+    assert graphql_server['requests'][0]['variables'] == {'l0': 'alice', 'l1': 'bob'}
+    for response in (first, second):
+        assert response.get_json()['metadata']['contributors'] == [
+            {'login': 'alice', 'name': 'Alice', 'contributions': 7},
+            {'login': 'bob', 'name': 'bob', 'contributions': 3},
+        ]
+
+def test_contributor_names_graphql_partial_errors(client, mocker, graphql_server):
+    """Test that a login that does not resolve to a user keeps the other names and is not looked up again."""
+    graphql_server['response'] = {'data': {'u0': {'name': 'Alice'}, 'u1': None}, 'errors': [
+        {'type': 'NOT_FOUND', 'path': ['u1'], 'message': "Could not resolve to a User with the login of 'dependabot[bot]'."}
+    ]}
+    mocker.patch('app.GITHUB_TOKEN', 'test_token')
+    mocker.patch('app.GITHUB_GRAPHQL_URL', graphql_server['url'])
+    alice, bot = MagicMock(login='alice', contributions=7), MagicMock(login='dependabot[bot]', contributions=3)
+    _contributor_repo(mocker, [alice, bot])
+
+    first = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+    second = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'other-repo'})
+
+    assert len(graphql_server['requests']) == 1
+    for response in (first, second):
+        assert response.get_json()['metadata']['contributors'] == [
+            {'login': 'alice', 'name': 'Alice', 'contributions': 7},
+            {'login': 'dependabot[bot]', 'name': 'dependabot[bot]', 'contributions': 3},
+        ]
+
+def test_contributor_names_disabled(client, mocker):
+    """Test that no per-user lookups happen when contributor names are turned off."""
+    mocker.patch('app.CONTRIBUTOR_NAMES', 'none')
+    alice = MagicMock(login='alice', contributions=7)
+    name = mocker.PropertyMock(return_value='Alice')
+    type(alice).name = name
+    _contributor_repo(mocker, [alice])
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+
+    assert response.get_json()['metadata']['contributors'] == [
+        {'login': 'alice', 'name': 'alice', 'contributions': 7},
+    ]
+    name.assert_not_called()
+
+def test_validate_repo_quota_exhausted(client, mocker):
+    """Test that an exhausted quota fails fast with 429 instead of calling GitHub."""
+    mock_github = mocker.patch('github.Github')
+    github_scheduler.record(quota_key(), remaining=0, limit=5000, reset=time.time() + 120)
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+
+    assert response.status_code == 429
+    assert 115 <= int(response.headers['Retry-After']) <= 120
+    assert response.get_json()['valid'] is False
+    mock_github.return_value.get_repo.assert_not_called()
+
+def test_validate_repo_low_quota_sheds_optional_calls(client, mocker):
+    """Test that topics and contributors are skipped when quota runs low and the result is not cached."""
+    mock_repo = _contributor_repo(mocker, [MagicMock(login='alice', contributions=7)])
+    github_scheduler.record(quota_key(), remaining=50, limit=5000, reset=time.time() + 120)
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+
+    assert response.get_json()['valid'] is True
+    assert response.get_json()['metadata']['contributors'] == []
+    mock_repo.get_topics.assert_not_called()
+    mock_repo.get_contributors.assert_not_called()
+    assert repo_metadata_cache.peek('owner/test-repo') is None
+    assert client.get('/api/stats').get_json()['rate_limits']['shed'] == 2
+
+def test_validate_repo_uses_user_token(client, mocker):
+    """Test that a signed-in user's token is used for lookups instead of the server token."""
+    mock_repo = _contributor_repo(mocker, [])
+    mock_repo.private = True
+    github_scheduler.record(quota_key(), remaining=0, limit=5000, reset=time.time() + 120)
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'},
+                           headers={'Authorization': 'Bearer user_token'})
+
+    assert response.status_code == 200
+    assert response.get_json()['valid'] is True
+    # Private repos fetched with a user's token are not shared through the cache
+    assert repo_metadata_cache.peek('owner/test-repo') is None
+
+def test_private_repo_cached_per_token(client, mocker):
+    """Test that a private repository's metadata is reused by the token that fetched it, and only by that token."""
+    mock_repo = _contributor_repo(mocker, [])
+    mock_repo.private = True
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = MagicMock(text='# README')
+    get_repo = mocker.patch('github.Github').return_value.get_repo
+    get_repo.return_value = mock_repo
+    body = {'owner': 'owner', 'repo_name': 'test-repo'}
+
+    client.post('/api/validate-repo', json=body, headers={'Authorization': 'Bearer token-a'})
+    generated = client.post('/api/generate-readme', headers={'Authorization': 'Bearer token-a'},
+                            json={'selected_sections': ['Overview'], 'repo': body})
+    assert get_repo.call_count == 1
+    other = client.post('/api/validate-repo', json=body, headers={'Authorization': 'Bearer token-b'})
+
+    assert generated.get_json()['success'] is True
+    assert 'test-repo' in mock_model.generate_content.call_args.args[0]
+    assert other.get_json()['valid'] is True
+    assert get_repo.call_count == 2
+    assert repo_metadata_cache.peek('owner/test-repo') is None
+
+def test_metrics_endpoint(client, mocker):
+    """Test that route, GitHub, classification and Gemini timings are exposed in Prometheus format."""
+    _contributor_repo(mocker, []).get_topics.side_effect = Exception('Not Found')
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '# Generated README'
+    mock_model.generate_content.return_value.usage_metadata = MagicMock(prompt_token_count=120, candidates_token_count=30)
+
+    client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+    client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+    client.post('/api/generate-readme', json={'selected_sections': ['Overview']})
+    response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/validate-repo",status="200"} 2' in body
+    assert 'github_request_seconds_count{operation="repo"} 1' in body
+    assert 'github_request_errors_total{error="Exception",operation="topics"} 1' in body
+    assert 'detect_project_type_seconds_count 1' in body
+    assert 'gemini_request_seconds_count{operation="generate"} 1' in body
+    assert 'gemini_tokens_total{kind="prompt"} 120' in body
+    assert 'gemini_tokens_total{kind="response"} 30' in body
+    assert 'cache_hits_total{cache="repo_metadata"} 1' in body
+
+def test_server_timing_header(client, mocker):
+    """Test that the optional Server-Timing header breaks a request down by stage."""
+    _contributor_repo(mocker, [])
+
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'test-repo'})
+    assert 'Server-Timing' not in response.headers
+
+    mocker.patch('app.SERVER_TIMING', True)
+    response = client.post('/api/validate-repo', json={'owner': 'owner', 'repo_name': 'other-repo'})
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert {'github-repo', 'github-topics', 'github-tree', 'detect-project-type'} <= set(stages)
+    assert stages[-1] == 'total'
+
+def test_server_timing_includes_section_calls(client, mocker):
+    """Test that model calls made for each section are timed as part of the request."""
+    mocker.patch('app.SERVER_TIMING', True)
+    mocker.patch('app.model').generate_content.return_value.text = 'Body'
+
+    response = client.post('/api/generate-readme', json={
+        'generation_mode': 'sections',
+        'selected_sections': ['installation', 'usage'],
+    })
+
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert 'gemini-generate' in stages
+
+def test_structured_logging_redacts_secrets(tmp_path):
+    """Test that queued log records are written as JSON with request ids and without secrets, leaving plain text alone."""
+    import logging
+    from logs import configure_logging, request_id_var
+    logger = logging.getLogger('test_structured_logging')
+    logger.propagate = False
+    log_path = tmp_path / 'app.log'
+    listener = configure_logging(logger, level='INFO', path=str(log_path), sample_rates={logging.DEBUG: 0.0})
+
+    request_id_var.set('req-123')
+    logger.info("Token data: {'access_token': 'gho_abcdefghijklmnopqrstuvwxyz', 'scope': 'repo'}", extra={'status': 200})
+    logger.info('Callback for /auth/callback?code=0123456789abcdef&state=xyz')
+    logger.info('The token expired, so the source code: 401 path ran')
+    logger.debug('Dropped by sampling')
+    listener.stop()
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert len(records) == 3
+    assert records[0]['request_id'] == 'req-123'
+    assert records[0]['status'] == 200
+    assert 'gho_' not in records[0]['message'] and '[REDACTED]' in records[0]['message']
+    assert '0123456789abcdef' not in records[1]['message'] and 'state=xyz' in records[1]['message']
+    assert records[2]['message'] == 'The token expired, so the source code: 401 path ran'
+
+def test_create_app_registers_routes_on_a_new_app():
+    """Test that the app factory builds independent apps serving the same routes."""
+    other = create_app()
+
+    assert other is not app
+    assert other.test_client().get('/api/health').status_code == 200
+
+def test_gemini_model_built_once_on_first_use(mocker):
+    """Test that concurrent first calls build the Gemini model exactly once."""
+    import app as app_module
+    import google.generativeai as genai
+    mocker.patch.object(app_module, 'model', None)
+    build = mocker.patch.object(genai, 'GenerativeModel', side_effect=lambda name: (time.sleep(0.05), object())[1])
+    mocker.patch.object(genai, 'configure')
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(app_module.get_model())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert build.call_count == 1
+    assert len({id(result) for result in results}) == 1
+    assert 'gemini_init_ms' in app_module.startup_report
+
+def test_stats_reports_startup_timings(client):
+    """Test that /api/stats reports how long startup took."""
+    startup = client.get('/api/stats').get_json()['startup']
+
+    assert startup['import_ms'] > 0
+    assert 'create_app_ms' in startup
+
+def test_request_id_header(client):
+    """Test that each response carries a request id, reusing a well-formed one from the client."""
+    generated = client.get('/api/health').headers['X-Request-ID']
+    forwarded = client.get('/api/health', headers={'X-Request-ID': 'edge-42'}).headers['X-Request-ID']
+    rejected = client.get('/api/health', headers={'X-Request-ID': 'bad id; drop'}).headers['X-Request-ID']
+
+    assert len(generated) == 32
+    assert forwarded == 'edge-42'
+    assert rejected not in ('bad id; drop', generated)
+
 def test_validate_repo_invalid_url(client):
     """Test repository validation with an invalid URL."""
     response = client.post('/api/validate-repo', json={'repo_url': 'https://invalid-url.com'})
@@ -84,7 +641,7 @@ def test_validate_repo_missing_info(client):
 
 def test_validate_repo_not_found(client, mocker):
     """Test repository validation for a repository that does not exist."""
-    mocker.patch('app.Github').return_value.get_repo.side_effect = Exception('Repository not found')
+    mocker.patch('github.Github').return_value.get_repo.side_effect = Exception('Repository not found')
     
     response = client.post('/api/validate-repo', json={'repo_url': 'https://github.com/owner/non-existent-repo'})
     
@@ -120,6 +677,872 @@ def test_generate_readme_missing_data(client):
     json_data = response.get_json()
     assert json_data['success'] is True
 
+def test_generate_readme_cached(client, mocker):
+    """Test that identical generation requests reuse the cached response unless bypassed."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '# Generated README'
+    payload = {'project_type': 'Web Application', 'selected_sections': ['Overview']}
+
+    first = client.post('/api/generate-readme', json=payload).get_json()
+    second = client.post('/api/generate-readme', json=payload).get_json()
+    bypassed = client.post('/api/generate-readme', json=dict(payload, bypass_cache=True)).get_json()
+
+    assert (first['cached'], second['cached'], bypassed['cached']) == (False, True, False)
+    assert second['content'] == '# Generated README'
+    assert mock_model.generate_content.call_count == 2
+
+def test_generate_readme_resolves_repo_reference(client, mocker):
+    """Test that a repository reference is expanded from the metadata cache, keeping inline edits."""
+    repo_metadata_cache.set('owner/test-repo', {
+        'name': 'test-repo', 'description': 'From GitHub', 'language': 'Rust', 'license': 'MIT License',
+    })
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '# Generated README'
+    mock_github = mocker.patch('github.Github')
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['Overview', 'License'],
+        'repo': {'owner': 'owner', 'repo_name': 'test-repo'},
+        'repo_metadata': {'description': 'Edited by the user'},
+    }).get_json()
+
+    prompt = mock_model.generate_content.call_args.args[0]
+    assert response['success'] is True
+    assert 'Edited by the user' in prompt and 'From GitHub' not in prompt
+    assert 'Primary Language: Rust' in prompt
+    assert 'licensed under the MIT License' in response['content']
+    mock_github.assert_not_called()
+
+CONTRIBUTOR_METADATA = {
+    'name': 'test-repo', 'owner': 'owner', 'repo_name': 'test-repo', 'language': 'C++', 'license': 'MIT License',
+    'topics': ['cli'], 'contributors': [
+        {'login': 'bob', 'name': 'bob', 'contributions': 1},
+        {'login': 'alice', 'name': 'Alice Smith', 'contributions': 42},
+    ],
+}
+
+def test_generate_readme_data_sections_skip_model(client, mocker):
+    """Test that a README made only of data sections is rendered locally without a model call."""
+    mock_model = mocker.patch('app.model')
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['badges', 'license', 'contributors'],
+        'repo_metadata': CONTRIBUTOR_METADATA,
+    }).get_json()
+
+    mock_model.generate_content.assert_not_called()
+    assert response['rendered_sections'] == ['badges', 'license', 'contributors']
+    assert response['content'] == (
+        '## Badges\n'
+        '![Stars](https://img.shields.io/github/stars/owner/test-repo) '
+        '![Forks](https://img.shields.io/github/forks/owner/test-repo) '
+        '![License](https://img.shields.io/github/license/owner/test-repo) '
+        '![Language](https://img.shields.io/badge/language-C%2B%2B-blue)\n\n`cli`\n\n'
+        '## License\nThis project is licensed under the MIT License.\n\n'
+        '## Contributors\nThanks to everyone who has contributed to this project:\n\n'
+        '- [Alice Smith](https://github.com/alice) (42 contributions)\n'
+        '- [bob](https://github.com/bob) (1 contribution)\n'
+    )
+
+def test_generate_readme_rendered_sections_untrusted_metadata(client, mocker):
+    """Test that an unidentified license goes to the model and contributor names can't inject links."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '## License\nSee LICENSE.\n<!-- section:contributors -->'
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['license', 'contributors'],
+        'repo_metadata': dict(CONTRIBUTOR_METADATA, license='Other', contributors=[
+            {'login': 'mallory', 'name': 'x](http://evil.example)', 'contributions': 2},
+        ]),
+    }).get_json()
+
+    assert response['rendered_sections'] == ['contributors']
+    assert '- [x\\]\\(http://evil.example\\)](https://github.com/mallory) (2 contributions)' in response['content']
+
+def test_generate_readme_splices_rendered_sections(client, mocker):
+    """Test that only prose sections go to the model and rendered sections keep their place."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = (
+        '# Test Repo\n## Overview\nA tool.\n<!-- section:license -->\n## Usage\nRun it.'
+    )
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['Overview', 'license', 'Usage', 'contributors'],
+        'section_content': {'license': 'Apache 2.0', 'contributors': 'Thanks to the Rust community.'},
+        'repo_metadata': CONTRIBUTOR_METADATA,
+    }).get_json()
+
+    prompt = mock_model.generate_content.call_args.args[0]
+    assert 'sections listed here: Overview, Usage, contributors.' in prompt
+    assert 'order: Overview, <!-- section:license -->, Usage, contributors' in prompt
+    assert 'Apache' not in prompt and 'Thanks to the Rust community.' in prompt
+    assert response['rendered_sections'] == ['license']
+    assert response['content'] == (
+        '# Test Repo\n## Overview\nA tool.\n## License\nThis project is licensed under the Apache 2.0 License.\n'
+        '## Usage\nRun it.'
+    )
+
+def test_generate_readme_stream_splices_rendered_sections(client, mocker):
+    """Test that streamed output has placeholders replaced even when split across chunks."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = [MagicMock(text='## Overview\nA tool.\n<!-- sect'),
+                                                MagicMock(text='ion:license -->\n## Usage\nRun it.')]
+
+    response = client.post('/api/generate-readme/stream', json={
+        'selected_sections': ['Overview', 'license', 'Usage', 'badges'],
+        'repo_metadata': {'license': 'MIT License', 'language': 'Go'},
+    })
+
+    deltas = [json.loads(line[len('data: '):])['delta']
+              for line in response.get_data(as_text=True).splitlines() if line.startswith('data: {"delta"')]
+    assert ''.join(deltas) == (
+        '## Overview\nA tool.\n## License\nThis project is licensed under the MIT License.\n## Usage\nRun it.\n\n'
+        '## Badges\n![Language](https://img.shields.io/badge/language-Go-blue)\n'
+    )
+
+def test_repo_readme_fetched_by_blob_sha(client, mocker):
+    """Test that README content is fetched on demand, cached by blob SHA and revalidated by ETag."""
+    import base64
+    sha = 'a' * 40
+    mock_get = mocker.patch('app.github_clients.session.get')
+    mock_get.return_value.headers = {}
+    mock_get.return_value.json.return_value = {'sha': sha, 'encoding': 'base64',
+                                               'content': base64.b64encode(b'# Existing README').decode()}
+    url = f'/api/repo-readme?owner=owner&repo_name=test-repo&sha={sha}'
+
+    first = client.get(url)
+    second = client.get(url).get_json()
+    not_modified = client.get(url, headers={'If-None-Match': f'"{sha}"'})
+
+    assert first.get_json() == {'success': True, 'sha': sha, 'content': '# Existing README'}
+    assert first.headers['ETag'] == f'"{sha}"'
+    assert second['content'] == '# Existing README'
+    assert not_modified.status_code == 304
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.args[0].endswith(f'/repos/owner/test-repo/git/blobs/{sha}')
+    assert client.get('/api/repo-readme?owner=owner&repo_name=test-repo&sha=../x').status_code == 400
+
+def test_refine_readme_cached_on_disk(client, mocker, tmp_path):
+    """Test that the persistent tier serves responses after the in-memory tier is lost."""
+    from cache import SQLiteCache, TieredCache, TTLCache
+    tiered_cache = TieredCache(TTLCache(), SQLiteCache(str(tmp_path / 'llm.db')))
+    mocker.patch('app.llm_response_cache', tiered_cache)
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '# Refined'
+    payload = {'current_content': '# README', 'prompt': 'Shorten it'}
+
+    client.post('/api/refine-readme', json=payload)
+    tiered_cache.memory.clear()
+    response = client.post('/api/refine-readme', json=payload).get_json()
+
+    assert response['cached'] is True
+    assert response['content'] == '# Refined'
+    assert mock_model.generate_content.call_count == 1
+    stats = tiered_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['disk_hits']) == (1, 0, 1)
+
+def test_generate_readme_by_section(client, mocker):
+    """Test that per-section generation assembles sections in the user's order with Title Case headers."""
+    def fake_generate(prompt, **kwargs):
+        response = MagicMock()
+        if '"Tech Stack"' in prompt:
+            response.text = '## Tech Stack\n\n- Flask'
+        else:
+            response.text = '\nPip install it.'
+        return response
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.side_effect = fake_generate
+
+    response = client.post('/api/generate-readme', json={
+        'generation_mode': 'sections',
+        'selected_sections': ['tech-stack', 'installation'],
+    })
+
+    json_data = response.get_json()
+    assert json_data['success'] is True
+    assert json_data['content'] == '## Tech Stack\n- Flask\n\n## Installation\nPip install it.\n'
+    assert mock_model.generate_content.call_count == 2
+
+def test_generate_readme_by_section_retries_failed_section(client, mocker):
+    """Test that a failing section is retried on its own without regenerating the others."""
+    from google.api_core import exceptions as google_exceptions
+    mocker.patch('app.llm_governor.backoff_base', 0.001)
+    calls = {'usage': 0, 'roadmap': 0}
+    def fake_generate(prompt, **kwargs):
+        section = 'usage' if '"Usage"' in prompt else 'roadmap'
+        calls[section] += 1
+        if section == 'usage' and calls['usage'] == 1:
+            raise google_exceptions.ServiceUnavailable('overloaded')
+        return MagicMock(text=f'{section} body')
+    mocker.patch('app.model').generate_content.side_effect = fake_generate
+
+    response = client.post('/api/generate-readme', json={
+        'generation_mode': 'sections',
+        'selected_sections': ['usage', 'roadmap'],
+    })
+
+    assert response.get_json()['content'] == '## Usage\nusage body\n\n## Roadmap\nroadmap body\n'
+    assert calls == {'usage': 2, 'roadmap': 1}
+
+README_WITH_SECTIONS = (
+    '# Test Repo\n'
+    'A test project.\n\n'
+    '## Installation Instructions\n'
+    'Run the installer, then configure it, then run it again.\n\n'
+    '## Usage\n'
+    'Call `test-repo --help`.\n'
+)
+
+def test_refine_readme_only_targeted_sections(client, mocker):
+    """Test that refinement sends only the sections named in the prompt and splices them back."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '## Installation Instructions\nRun the installer.\n'
+
+    response = client.post('/api/refine-readme', json={
+        'current_content': README_WITH_SECTIONS,
+        'prompt': 'Make the installation section shorter',
+    })
+
+    json_data = response.get_json()
+    sent_prompt = mock_model.generate_content.call_args.args[0]
+    assert 'Run the installer, then configure it' in sent_prompt
+    assert 'test-repo --help' not in sent_prompt
+    assert json_data['scope'] == 'sections'
+    assert json_data['content'] == README_WITH_SECTIONS.replace(
+        'Run the installer, then configure it, then run it again.', 'Run the installer.')
+    statuses = {change['title']: change['status'] for change in json_data['diff']}
+    assert statuses == {'Test Repo': 'unchanged', 'Installation Instructions': 'modified', 'Usage': 'unchanged'}
+
+def test_refine_readme_stream_only_targeted_sections(client, mocker):
+    """Test that streamed refinement also sends only the targeted sections and streams the spliced README."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '## Installation Instructions\nRun the installer.\n'
+
+    response = client.post('/api/refine-readme/stream', json={
+        'current_content': README_WITH_SECTIONS,
+        'prompt': 'Make the installation section shorter',
+    })
+
+    events = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('data: ')]
+    sent_prompt = mock_model.generate_content.call_args.args[0]
+    assert 'Run the installer, then configure it' in sent_prompt
+    assert 'test-repo --help' not in sent_prompt
+    assert events[0]['delta'] == README_WITH_SECTIONS.replace(
+        'Run the installer, then configure it, then run it again.', 'Run the installer.')
+    assert events[1]['scope'] == 'sections'
+
+def test_refine_readme_whole_document_when_untargeted(client, mocker):
+    """Test that a prompt naming no section refines the whole document."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = README_WITH_SECTIONS + '\n## License\nMIT\n'
+
+    response = client.post('/api/refine-readme', json={
+        'current_content': README_WITH_SECTIONS,
+        'prompt': 'Add a license note',
+    })
+
+    json_data = response.get_json()
+    assert json_data['scope'] == 'document'
+    assert 'test-repo --help' in mock_model.generate_content.call_args.args[0]
+    assert {'title': 'License', 'status': 'added', 'diff': '## License\nMIT\n'} in json_data['diff']
+
+def test_generate_readme_stream(client, mocker):
+    """Test that README generation can be streamed as Server-Sent Events."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = [MagicMock(text='# Generated'), MagicMock(text=' README')]
+
+    response = client.post('/api/generate-readme/stream', json={
+        'project_type': 'Web Application',
+        'selected_sections': ['Overview'],
+    })
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.startswith(
+        'data: {"delta": "# Generated"}\n\n'
+        'data: {"delta": " README"}\n\n'
+        'event: done\ndata: {"prompt": {'
+    )
+    kwargs = mock_model.generate_content.call_args.kwargs
+    assert kwargs['stream'] is True
+    assert 0 < kwargs['request_options']['timeout'] <= llm_governor.timeout
+
+def test_refine_readme_stream_error_event(client, mocker):
+    """Test that a failure mid-stream is reported as an error event."""
+    def chunks():
+        yield MagicMock(text='# Partial')
+        raise RuntimeError('upstream reset')
+    mocker.patch('app.model').generate_content.return_value = chunks()
+
+    response = client.post('/api/refine-readme/stream', json={'current_content': '# README', 'prompt': 'Shorten it'})
+
+    body = response.get_data(as_text=True)
+    assert body.endswith('event: error\ndata: {"error": "upstream reset"}\n\n')
+
+def test_refine_readme_stream_empty_not_cached(client, mocker):
+    """Test that a stream with no text is not cached, so the next request calls the model again."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.side_effect = lambda *args, **kwargs: [MagicMock(text='')]
+    payload = {'current_content': '# README', 'prompt': 'Shorten it'}
+
+    client.post('/api/refine-readme/stream', json=payload).get_data()
+    body = client.post('/api/refine-readme/stream', json=payload).get_data(as_text=True)
+
+    assert '"cached": true' not in body
+    assert mock_model.generate_content.call_count == 2
+
+def test_refine_readme_stream_missing_data(client):
+    """Test that streaming refinement validates its input before streaming."""
+    response = client.post('/api/refine-readme/stream', json={'prompt': 'Shorten it'})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+    response = client.post('/api/refine-readme/stream', data='not json', content_type='text/plain')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+def test_generate_readme_prompt_compaction(client, mocker):
+    """Test that empty and deselected section content is left out of the prompt and reported."""
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = MagicMock(text='# README')
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['Overview', 'Usage'],
+        'section_content': {'Overview': 'A tool.\n\n\n\nFor READMEs.   ', 'Usage': '  ', 'License': 'MIT'},
+    })
+
+    report = response.get_json()['prompt']
+    prompt = mock_model.generate_content.call_args.args[0]
+    assert '[Overview]\nA tool.\n\nFor READMEs.' in prompt
+    assert 'MIT' not in prompt
+    assert sorted(report['dropped_sections']) == ['License', 'Usage']
+    assert report['tokens_saved'] > 0
+
+def test_generate_readme_rendered_sections_not_reported_dropped(client, mocker):
+    """Test that sections rendered from metadata are not reported as dropped from the prompt."""
+    mocker.patch('app.model').generate_content.return_value = MagicMock(text='## Overview\nA tool.')
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['Overview', 'license'],
+        'section_content': {'license': '', 'Roadmap': 'Old plans'},
+        'repo_metadata': CONTRIBUTOR_METADATA,
+    }).get_json()
+
+    assert response['rendered_sections'] == ['license']
+    assert response['prompt']['dropped_sections'] == ['Roadmap']
+
+def test_generate_readme_trims_content_to_budget(client, mocker):
+    """Test that section content over the token budget is trimmed, the largest first."""
+    mocker.patch('app.PROMPT_TOKEN_BUDGET', 1500)
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = MagicMock(text='# README')
+
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['Overview', 'Usage'],
+        'section_content': {'Overview': 'Short overview.', 'Usage': 'run it\n' * 2000},
+    })
+
+    report = response.get_json()['prompt']
+    prompt = mock_model.generate_content.call_args.args[0]
+    assert report['trimmed'] == ['Usage']
+    assert 'Short overview.' in prompt
+    assert 'more tokens trimmed' in prompt
+    assert report['tokens'] <= 1500
+
+def test_refine_readme_over_budget(client, mocker):
+    """Test that refining a README too large for the token budget is refused without a model call."""
+    mocker.patch('app.PROMPT_TOKEN_BUDGET', 100)
+    mock_model = mocker.patch('app.model')
+
+    response = client.post('/api/refine-readme', json={'current_content': '# README\n' + 'text ' * 1000, 'prompt': 'Shorten it'})
+
+    assert response.status_code == 413
+    assert response.get_json()['success'] is False
+    mock_model.generate_content.assert_not_called()
+
+class FakeModel:
+    """Stand-in for a Gemini model that replays scripted outcomes."""
+
+    def __init__(self, *outcomes, release=None):
+        self.outcomes = list(outcomes)
+        self.release = release
+        self.calls = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        if self.release is not None:
+            self.release.wait(5)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return MagicMock(text=outcome)
+
+def test_generate_readme_coalesces_identical_prompts(client, mocker):
+    """Test that concurrent identical prompts make one model call and share its text."""
+    release = threading.Event()
+    model = FakeModel('# Shared README', release=release)
+    mocker.patch('app.model', model)
+
+    responses = []
+    def generate():
+        responses.append(app.test_client().post('/api/generate-readme', json={'selected_sections': ['Overview']}))
+    threads = [threading.Thread(target=generate) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for_coalesced(llm_flights, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [response.get_json()['content'] for response in responses] == ['# Shared README'] * 3
+    assert len(model.calls) == 1
+    assert llm_flights.stats()['coalesced'] == 2
+
+def test_single_flight_shares_errors():
+    """Test that callers waiting on a failed call get its exception."""
+    from singleflight import SingleFlight
+    flights = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        release.wait(5)
+        raise ValueError('upstream failed')
+
+    def call():
+        try:
+            flights.do('key', fail)
+        except ValueError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for_coalesced(flights, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3 and len({id(error) for error in errors}) == 1
+    assert flights.do('key', lambda: 'fresh') == ('fresh', False)
+
+def test_llm_governor_retries_retryable_errors():
+    """Test that rate-limit errors are retried with backoff and other errors are not."""
+    from google.api_core import exceptions as google_exceptions
+    from llm import GeminiGovernor
+    governor = GeminiGovernor(backoff_base=0.001, retryable_errors=(google_exceptions.TooManyRequests,))
+
+    model = FakeModel(google_exceptions.ResourceExhausted('quota'), '# README')
+    assert governor.generate(model, 'prompt').text == '# README'
+    assert len(model.calls) == 2
+    assert model.calls[0]['request_options']['retry'] is None
+
+    model = FakeModel(ValueError('bad prompt'))
+    with pytest.raises(ValueError):
+        governor.generate(model, 'prompt')
+    assert len(model.calls) == 1
+    assert governor.stats()['retries'] == 1
+
+def test_llm_governor_caps_concurrent_calls():
+    """Test that a call waiting past its deadline for a slot is rejected."""
+    from llm import GeminiGovernor, LLMUnavailable
+    governor = GeminiGovernor(max_concurrent=1, timeout=0.2)
+    release = threading.Event()
+    model = FakeModel('# README', release=release)
+    worker = threading.Thread(target=governor.generate, args=(model, 'first'))
+    worker.start()
+    try:
+        with pytest.raises(LLMUnavailable):
+            governor.generate(model, 'second')
+    finally:
+        release.set()
+        worker.join()
+    assert len(model.calls) == 1
+    assert governor.stats()['in_flight'] == 0
+
+def test_generate_readme_circuit_open(client, mocker):
+    """Test that repeated upstream failures open the circuit and later calls get a 503."""
+    from google.api_core import exceptions as google_exceptions
+    from llm import GeminiGovernor
+    governor = GeminiGovernor(retries=0, failure_threshold=2, reset_timeout=60,
+                              retryable_errors=(google_exceptions.ServerError,))
+    mocker.patch('app.llm_governor', governor)
+    model = FakeModel(google_exceptions.ServiceUnavailable('overloaded'))
+    mocker.patch('app.model', model)
+    payload = {'project_type': 'Web Application', 'selected_sections': ['Overview']}
+
+    for _ in range(2):
+        client.post('/api/generate-readme', json=payload)
+    response = client.post('/api/generate-readme', json=payload)
+    stream_response = client.post('/api/generate-readme/stream', json=payload)
+
+    assert response.status_code == 503
+    assert stream_response.status_code == 503
+    assert 55 <= int(response.headers['Retry-After']) <= 60
+    assert len(model.calls) == 2
+    assert governor.stats()['circuit'] == 'open'
+
+@pytest.fixture
+def job_queue(mocker, tmp_path):
+    from jobs import JobQueue
+    queue = JobQueue(str(tmp_path / 'jobs.db'), workers=1, max_pending=1)
+    mocker.patch('app.job_queue', queue)
+    return queue
+
+def test_generate_readme_job(client, mocker, job_queue):
+    """Test that generation can run as a background job retrieved by long-polling."""
+    mocker.patch('app.model').generate_content.return_value.text = '# Generated README'
+
+    submitted = client.post('/api/jobs/generate-readme', json={'selected_sections': ['Overview']})
+    job_id = submitted.get_json()['job_id']
+    response = client.get(f'/api/jobs/{job_id}?wait=2')
+
+    assert submitted.status_code == 202
+    assert submitted.headers['Location'] == f'/api/jobs/{job_id}'
+    job = response.get_json()['job']
+    assert job['status'] == 'succeeded'
+    assert job['result']['content'] == '# Generated README'
+
+def test_job_submission_requires_json(client, job_queue):
+    """Test that job submissions without a JSON object body are rejected with 400."""
+    generate = client.post('/api/jobs/generate-readme', data='', content_type='text/plain')
+    refine = client.post('/api/jobs/refine-readme', data='not json', content_type='application/json')
+
+    assert generate.status_code == 400
+    assert refine.status_code == 400
+    assert generate.get_json()['success'] is False
+
+def test_job_queue_full(client, mocker, job_queue):
+    """Test that submissions beyond the queue limit are rejected with Retry-After."""
+    release = threading.Event()
+    mocker.patch('app.generate_readme_content', side_effect=lambda data: release.wait(5) and {})
+
+    first = client.post('/api/jobs/generate-readme', json={})
+    second = client.post('/api/jobs/refine-readme', json={'current_content': '# README', 'prompt': 'Shorten it'})
+    release.set()
+
+    assert first.status_code == 202
+    assert second.status_code == 429
+    assert int(second.headers['Retry-After']) >= 1
+
+def test_get_unknown_job(client, job_queue):
+    """Test that polling an unknown job id returns 404."""
+    response = client.get('/api/jobs/does-not-exist')
+    assert response.status_code == 404
+
+@pytest.fixture
+def batch_runner(mocker, tmp_path):
+    from batches import BatchRunner
+    runner = BatchRunner(str(tmp_path / 'jobs.db'), inspect_workers=2, generate_workers=1)
+    mocker.patch('app.batch_runner', runner)
+    return runner
+
+def _batch_lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_batch_streams_results(client, mocker, batch_runner):
+    """Test that a batch generates a README per repository and streams each result as it finishes."""
+    def lookup(owner, repo_name, token=None):
+        if repo_name == 'missing':
+            return {'valid': False, 'error': 'Repository not found'}
+        return {'valid': True, 'metadata': {'name': repo_name, 'detected_project_type': 'Python Application'}}
+    mocker.patch('app.validate_github_repo', side_effect=lookup)
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.side_effect = lambda prompt, **kwargs: MagicMock(text=f'# {prompt.count("api")}')
+
+    created = client.post('/api/batches', json={
+        'repos': ['acme/api', {'owner': 'acme', 'repo_name': 'missing'}, 'acme/web'],
+        'selected_sections': ['Overview'],
+    })
+    batch_id = created.get_json()['batch']['id']
+    lines = _batch_lines(client.get(f'/api/batches/{batch_id}/results'))
+
+    assert created.status_code == 202
+    results = {line['repo_name']: line for line in lines[:-1]}
+    assert [line['seq'] for line in lines[:-1]] == [1, 2, 3]
+    assert results['api']['status'] == 'succeeded'
+    assert results['missing'] == dict(results['missing'], status='failed', error='Repository not found')
+    assert 'Python Application' in mock_model.generate_content.call_args.args[0]
+    assert lines[-1]['done'] is True
+    assert lines[-1]['batch']['counts'] == {'pending': 0, 'succeeded': 2, 'failed': 1}
+
+def test_dead_worker_jobs_and_batches_end_for_followers(client, mocker, batch_runner, job_queue):
+    """Test that following a batch or job whose worker died ends instead of waiting for it forever."""
+    mocker.patch('app.validate_github_repo', return_value={'valid': False, 'error': 'Repository not found'})
+    mocker.patch('app.model').generate_content.return_value.text = '# Generated README'
+    batch_id = client.post('/api/batches', json={'repos': ['acme/one']}).get_json()['batch']['id']
+    job_id = client.post('/api/jobs/generate-readme', json={'selected_sections': ['Overview']}).get_json()['job_id']
+    job_queue.wait(job_id, 5)
+    _batch_lines(client.get(f'/api/batches/{batch_id}/results'))
+    # Simulate another worker, forked after this one started, dying part way through both
+    dead_pid = 2 ** 22 + 1
+    with batch_runner._conn:
+        batch_runner._conn.execute("UPDATE batches SET status = 'running', pid = ? WHERE id = ?", (dead_pid, batch_id))
+    with job_queue._conn:
+        job_queue._conn.execute("UPDATE jobs SET status = 'running', pid = ? WHERE id = ?", (dead_pid, job_id))
+
+    lines = _batch_lines(client.get(f'/api/batches/{batch_id}/results?after=1'))
+    job = client.get(f'/api/jobs/{job_id}').get_json()['job']
+
+    assert lines == [dict(lines[-1], done=True)]
+    assert lines[-1]['batch']['status'] == 'interrupted'
+    assert (job['status'], job['error']) == ('failed', 'Interrupted by a worker restart')
+
+def test_batch_resume_skips_completed_repos(client, mocker, batch_runner):
+    """Test that resuming an interrupted batch only regenerates the repositories that did not succeed."""
+    mocker.patch('app.validate_github_repo',
+                 side_effect=lambda owner, repo_name, token=None: {'valid': True, 'metadata': {'name': repo_name}})
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.side_effect = [MagicMock(text='# One'), ValueError('blocked prompt')]
+    headers = {'Authorization': 'Bearer user-token'}
+
+    batch_id = client.post('/api/batches', json={'repos': ['acme/one', 'acme/two']}, headers=headers).get_json()['batch']['id']
+    first = _batch_lines(client.get(f'/api/batches/{batch_id}/results', headers=headers))
+    # Simulate the worker that ran the batch dying part way through
+    with batch_runner._conn:
+        batch_runner._conn.execute("UPDATE batches SET status = 'running', pid = ? WHERE id = ?", (2 ** 22 + 1, batch_id))
+    from batches import BatchRunner
+    restarted = BatchRunner(batch_runner.path, inspect_workers=2, generate_workers=1)
+    mocker.patch('app.batch_runner', restarted)
+    mock_model.generate_content.side_effect = [MagicMock(text='# Two')]
+
+    assert restarted.get(batch_id)['status'] == 'interrupted'
+    assert client.post(f'/api/batches/{batch_id}/resume').status_code == 404
+    resumed = client.post(f'/api/batches/{batch_id}/resume', headers=headers)
+    second = _batch_lines(client.get(f'/api/batches/{batch_id}/results?after=2', headers=headers))
+
+    assert [line['status'] for line in first[:-1]] == ['succeeded', 'failed']
+    assert resumed.status_code == 202
+    assert mock_model.generate_content.call_count == 3
+    assert second[0]['seq'] == 3
+    assert second[0]['result']['content'] == '# Two'
+    assert second[-1]['batch']['status'] == 'completed'
+    assert client.post(f'/api/batches/{batch_id}/resume', headers=headers).status_code == 409
+
+def test_batch_enumerates_owner_repos(client, mocker, batch_runner):
+    """Test that a batch for an owner lists its repositories, skipping forks and archived ones."""
+    listing = [
+        {'name': 'api', 'owner': {'login': 'acme'}, 'fork': False, 'archived': False},
+        {'name': 'fork', 'owner': {'login': 'acme'}, 'fork': True, 'archived': False},
+        {'name': 'old', 'owner': {'login': 'acme'}, 'fork': False, 'archived': True},
+    ]
+    rest_get = mocker.patch('app.github_rest_get', return_value=listing)
+    mocker.patch('app.validate_github_repo', return_value={'valid': False, 'error': 'Repository not found'})
+
+    created = client.post('/api/batches', json={'owner': 'acme'})
+    invalid = client.post('/api/batches', json={'owner': '../admin'})
+
+    assert created.get_json()['batch']['total'] == 1
+    assert rest_get.call_args.args[0] == '/users/acme/repos'
+    assert invalid.status_code == 400
+
+@pytest.fixture
+def prefetcher(mocker):
+    from prefetch import Prefetcher
+    from state import MemoryState
+    prefetcher = Prefetcher(MemoryState(), workers=1, budget=2)
+    mocker.patch('app.prefetcher', prefetcher)
+    return prefetcher
+
+def _finished_prefetch(client, prefetch_id, headers):
+    for _ in range(200):
+        prefetch = client.get(f'/api/prefetch/{prefetch_id}', headers=headers).get_json()['prefetch']
+        if prefetch['status'] in ('completed', 'failed', 'cancelled'):
+            return prefetch
+        time.sleep(0.01)
+    raise AssertionError('Prefetch did not finish')
+
+def test_prefetch_drafts_reused_by_generation(client, mocker, prefetcher):
+    """Test that sections drafted by a prefetch are reused by the generate request that follows it."""
+    mocker.patch('app.README_GENERATION_MODE', 'sections')
+    metadata = {'owner': 'acme', 'repo_name': 'api', 'name': 'api', 'description': 'An API',
+                'detected_project_type': 'Python Application', 'detected_team_context': 'Team'}
+    mocker.patch('app.validate_github_repo', return_value={'valid': True, 'metadata': metadata})
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.side_effect = lambda prompt, **kwargs: [MagicMock(text=f'Body {len(prompt)}')] \
+        if kwargs.get('stream') else MagicMock(text=f'Body {len(prompt)}')
+    headers = {'Authorization': 'Bearer user-token'}
+
+    started = client.post('/api/prefetch', json={'owner': 'acme', 'repo_name': 'api'}, headers=headers)
+    prefetch = _finished_prefetch(client, started.get_json()['prefetch']['id'], headers)
+    response = client.post('/api/generate-readme/stream', headers=headers, json={
+        'project_type': 'Downloadable Application',
+        'team_context': 'Team',
+        'selected_sections': ['installation', 'usage', 'roadmap'],
+        'repo': {'owner': 'acme', 'repo_name': 'api'},
+        'repo_metadata': {'name': 'api', 'description': 'An API'},
+        'prefetch_id': prefetch['id'],
+    })
+    body = response.get_data(as_text=True)
+
+    assert started.status_code == 202
+    assert prefetch['steps'] == {'inspect': 'ready', 'installation': 'ready', 'usage': 'ready'}
+    # Only the section the prefetch did not draft needs a model call
+    assert mock_model.generate_content.call_count == 3
+    assert '"delta": "## Installation\\nBody' in body
+    assert '## Roadmap' in body
+    assert 'event: done\ndata: {"cached": false' in body
+
+def test_prefetch_keeps_document_mode(client, mocker, prefetcher):
+    """Test that a generation following a prefetch still writes the whole document, title and tagline included."""
+    metadata = {'owner': 'acme', 'repo_name': 'api', 'name': 'api', 'description': 'An API'}
+    mocker.patch('app.validate_github_repo', return_value={'valid': True, 'metadata': metadata})
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value.text = '# api\nAn API for everything.\n\n## Installation\nPip install it.'
+
+    started = client.post('/api/prefetch', json={'owner': 'acme', 'repo_name': 'api'})
+    prefetch = _finished_prefetch(client, started.get_json()['prefetch']['id'], {})
+    response = client.post('/api/generate-readme', json={
+        'selected_sections': ['installation', 'usage'],
+        'repo_metadata': metadata,
+        'prefetch_id': prefetch['id'],
+    }).get_json()
+
+    # Section drafts would be wasted on a whole-document prompt, so none are written
+    assert prefetch['steps'] == {'inspect': 'ready'}
+    assert mock_model.generate_content.call_count == 1
+    assert response['content'].startswith('# api\nAn API for everything.\n')
+
+def test_prefetch_budget(client, mocker, prefetcher):
+    """Test that a prefetch stops drafting once the user's budget for speculative work is spent."""
+    mocker.patch('app.README_GENERATION_MODE', 'sections')
+    metadata = {'name': 'api', 'license': 'MIT License'}
+    mocker.patch('app.validate_github_repo', return_value={'valid': True, 'metadata': metadata})
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = MagicMock(text='Body')
+
+    started = client.post('/api/prefetch', json={
+        'owner': 'acme', 'repo_name': 'api', 'selected_sections': ['installation', 'usage', 'license', 'roadmap'],
+    })
+    prefetch = _finished_prefetch(client, started.get_json()['prefetch']['id'], {})
+    status = client.get(f"/api/prefetch/{prefetch['id']}").get_json()
+
+    assert prefetch['steps'] == {'inspect': 'ready', 'installation': 'ready', 'usage': 'ready',
+                                 'license': 'rendered', 'roadmap': 'over_budget'}
+    assert mock_model.generate_content.call_count == 2
+    assert status['budget_remaining'] == 0
+    assert client.post('/api/prefetch', json={'owner': '../admin', 'repo_name': 'api'}).status_code == 400
+
+def test_prefetch_cancel(client, mocker, prefetcher):
+    """Test that a cancelled prefetch makes no model calls and can only be cancelled by its user."""
+    release = threading.Event()
+    def lookup(owner, repo_name, token=None):
+        release.wait(5)
+        return {'valid': True, 'metadata': {'name': repo_name}}
+    mocker.patch('app.validate_github_repo', side_effect=lookup)
+    mock_model = mocker.patch('app.model')
+    headers = {'Authorization': 'Bearer user-token'}
+
+    prefetch_id = client.post('/api/prefetch', json={'owner': 'acme', 'repo_name': 'api'},
+                              headers=headers).get_json()['prefetch']['id']
+    other_user = client.delete(f'/api/prefetch/{prefetch_id}', headers={'Authorization': 'Bearer other-token'})
+    cancelled = client.delete(f'/api/prefetch/{prefetch_id}', headers=headers)
+    release.set()
+    # The lookup under way when it was cancelled still finishes
+    prefetcher._pool.shutdown(wait=True)
+    prefetch = client.get(f'/api/prefetch/{prefetch_id}', headers=headers).get_json()['prefetch']
+
+    assert other_user.status_code == 404
+    assert cancelled.get_json()['prefetch']['status'] == 'cancelled'
+    assert prefetch['status'] == 'cancelled'
+    assert prefetch['steps'] == {'inspect': 'ready'}
+    mock_model.generate_content.assert_not_called()
+
+def test_batch_charged_to_batch_generation_limit(client, mocker, batch_runner):
+    """Test that each repository in a batch counts against the batch limit, which also caps the batch size."""
+    mocker.patch('app.BATCH_GENERATION_LIMIT', '3 per hour')
+    mocker.patch('app.GENERATION_LIMIT', '1 per hour')
+    mocker.patch('app.validate_github_repo', return_value={'valid': False, 'error': 'Repository not found'})
+    mock_model = mocker.patch('app.model')
+    mock_model.generate_content.return_value = MagicMock(text='# README')
+    environ = {'REMOTE_ADDR': '10.0.0.22'}
+
+    first = client.post('/api/batches', json={'repos': ['acme/one', 'acme/two']}, environ_base=environ)
+    second = client.post('/api/batches', json={'repos': ['acme/three', 'acme/four']}, environ_base=environ)
+    oversized = client.post('/api/batches', json={'repos': ['acme/a', 'acme/b', 'acme/c', 'acme/d']},
+                            environ_base=environ)
+    single = client.post('/api/generate-readme', json={'selected_sections': ['Overview']}, environ_base=environ)
+
+    assert first.status_code == 202
+    assert second.status_code == 429
+    assert int(second.headers['Retry-After']) > 0
+    assert oversized.status_code == 400
+    assert oversized.get_json()['error'] == 'A batch can hold at most 3 repositories'
+    # Batches leave the interactive generation limit alone
+    assert single.status_code == 200
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def state_backend(request, tmp_path):
+    from bench.stubs import RedisStub
+    from state import state_from_url
+    if request.param == 'redis':
+        stub = RedisStub().start()
+        request.addfinalizer(stub.stop)
+        return state_from_url(stub.url)
+    return state_from_url('memory://' if request.param == 'memory' else f'sqlite:///{tmp_path / "state.db"}')
+
+def test_state_backend_counters_and_ttls(state_backend):
+    """Test that counters are atomic under concurrency and that keys expire after their TTL."""
+    def bump():
+        for _ in range(50):
+            state_backend.incr('limiter:hits', ttl=60)
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    state_backend.set('cache:a:key', {'value': [1, 2]}, ttl=0.1)
+    state_backend.set('other', 'kept')
+
+    assert state_backend.get('limiter:hits') == 200
+    assert 55 < state_backend.expiry('limiter:hits') - time.time() <= 60
+    assert state_backend.get('cache:a:key') == {'value': [1, 2]}
+    time.sleep(0.15)
+    assert state_backend.get('cache:a:key') is None
+    assert state_backend.incr('cache:a:count', 2, ttl=0.1) == 2
+    state_backend.clear('limiter:')
+    assert state_backend.get('limiter:hits') is None
+    assert state_backend.get('other') == 'kept'
+
+def test_rate_limit_shared_between_workers(tmp_path):
+    """Test that workers using a shared state backend enforce one limit between them."""
+    from flask import Flask
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+    from state import SQLiteState
+
+    def worker():
+        # Each worker process opens the same database
+        worker_app = Flask(__name__)
+        limiter = Limiter(get_remote_address, app=worker_app, storage_uri='shared-state://',
+                          storage_options={'state': SQLiteState(str(tmp_path / 'state.db'))})
+        worker_app.add_url_rule('/', 'index', limiter.limit('3 per minute')(lambda: 'ok'))
+        return worker_app.test_client()
+
+    first, second = worker(), worker()
+    statuses = [client.get('/').status_code for client in (first, second, first, second)]
+
+    assert statuses == [200, 200, 200, 429]
+
+def test_shared_cache_revalidation(mocker, tmp_path):
+    """Test that a shared cache entry expires but can still be peeked at and refreshed."""
+    from state import SharedCache, SQLiteState
+    now = mocker.patch('state.time.time', return_value=1000.0)
+    cache = SharedCache(SQLiteState(str(tmp_path / 'state.db')), 'repos', ttl=60)
+    other_worker = SharedCache(SQLiteState(str(tmp_path / 'state.db')), 'repos', ttl=60)
+    cache.set('owner/repo', {'name': 'repo'}, etag='W/"abc"')
+
+    assert other_worker.get('owner/repo') == {'name': 'repo'}
+    now.return_value = 1061.0
+    assert other_worker.get('owner/repo') is None
+    assert other_worker.peek('owner/repo') == ({'name': 'repo'}, 'W/"abc"')
+    assert other_worker.refresh('owner/repo') is True
+    assert cache.get('owner/repo') == {'name': 'repo'}
+    now.return_value = 1200.0
+    assert cache.peek('owner/repo') is None
+    assert other_worker.stats() == {'hits': 1, 'misses': 1, 'revalidated': 1, 'ttl': 60, 'backend': 'sqlite'}
+
 def test_get_github_oauth_url(client, mocker):
     """Test getting the GitHub OAuth URL."""
     mocker.patch.dict(os.environ, {'GITHUB_CLIENT_ID': 'test_client_id'})
@@ -129,7 +1552,7 @@ def test_get_github_oauth_url(client, mocker):
     assert 'oauth_url' in json_data
     assert 'test_client_id' in json_data['oauth_url']
 
-@patch('app.requests.post')
+@patch('app.github_clients.session.post')
 def test_github_callback_success(mock_post, client, mocker):
     """Test successful GitHub callback."""
     mock_response = MagicMock()
@@ -164,7 +1587,8 @@ def test_get_user_repos_success(client, mocker):
     mock_user.login = 'test-user'
     mock_user.get_repos.return_value = [mock_repo]
 
-    mocker.patch('app.Github').return_value.get_user.return_value = mock_user
+    mocker.patch('github.Github').return_value.get_user.return_value = mock_user
+    mocker.patch('app.github_clients.session.get').return_value.headers = {}
     
     response = client.get('/api/github-repos', headers={'Authorization': 'Bearer test_token'})
     
@@ -174,6 +1598,143 @@ def test_get_user_repos_success(client, mocker):
     assert len(json_data['repos']) == 1
     assert json_data['repos'][0]['name'] == 'test-repo'
 
+def test_github_clients_are_reused(client, mocker):
+    """Test that GitHub clients are pooled per token instead of rebuilt per request."""
+    mock_github = mocker.patch('github.Github')
+    mock_github.return_value.get_user.return_value.get_repos.return_value = []
+    mocker.patch('app.github_clients.session.get').return_value.headers = {}
+
+    for token in ('token_a', 'token_a', 'token_b'):
+        user_repos_cache.clear()  # Force a GitHub call on every request
+        client.get('/api/github-repos', headers={'Authorization': f'Bearer {token}'})
+
+    assert [c.args[0] for c in mock_github.call_args_list] == ['token_a', 'token_b']
+    stats = client.get('/api/stats').get_json()['pools']['github_clients']
+    assert stats['created'] == 2
+    assert stats['reused'] == 1
+    assert stats['user_clients'] == 2
+
+def test_github_client_requests_are_not_spaced(mocker):
+    """Test that the pooled GitHub client does not hold every call to PyGithub's default request spacing."""
+    from bench.stubs import GitHubHandler, StubServer
+    from app import create_github_client
+    stub = StubServer(GitHubHandler).start()
+    try:
+        mocker.patch('app.GITHUB_API_URL', stub.url)
+        github = create_github_client('token')
+        started = time.perf_counter()
+        for _ in range(4):
+            github.get_repo('acme/api')
+        elapsed = time.perf_counter() - started
+    finally:
+        stub.stop()
+
+    # With the default spacing the four calls take at least 0.75 s
+    assert elapsed < 0.5
+
+def _listed_repo(name, language, updated_at, stars):
+    repo = MagicMock(id=hash(name), full_name=f'user/{name}', description='', language=language,
+                     private=False, fork=False, stargazers_count=stars, forks_count=0)
+    repo.name = name
+    repo.updated_at.isoformat.return_value = updated_at
+    return repo
+
+@pytest.fixture
+def listed_repos(mocker):
+    repos = [
+        _listed_repo('web-app', 'TypeScript', '2025-03-01T00:00:00+00:00', 5),
+        _listed_repo('cli-tool', 'Python', '2025-02-01T00:00:00+00:00', 50),
+        _listed_repo('py-lib', 'Python', '2025-01-01T00:00:00+00:00', 20),
+    ]
+    mock_github = mocker.patch('github.Github')
+    mock_github.return_value.get_user.return_value.get_repos.return_value = repos
+    probe = mocker.patch('app.github_clients.session.get')
+    probe.return_value.status_code = 200
+    probe.return_value.headers = {'ETag': 'W/"list"'}
+    return mock_github, probe
+
+def test_get_user_repos_paginated_and_filtered(client, listed_repos):
+    """Test server-side filtering, sorting and pagination of user repositories."""
+    headers = {'Authorization': 'Bearer test_token'}
+
+    first = client.get('/api/github-repos?language=python&sort=stars&per_page=1', headers=headers).get_json()
+    second = client.get('/api/github-repos?language=python&sort=stars&per_page=1&page=2', headers=headers).get_json()
+    search = client.get('/api/github-repos?q=LIB&updated_after=2024-12-31', headers=headers).get_json()
+
+    assert [repo['name'] for repo in first['repos']] == ['cli-tool']
+    assert (first['total'], first['next_page'], first['cached']) == (2, 2, False)
+    assert [repo['name'] for repo in second['repos']] == ['py-lib']
+    assert second['next_page'] is None
+    assert second['cached'] is True
+    assert [repo['name'] for repo in search['repos']] == ['py-lib']
+    assert listed_repos[0].return_value.get_user.return_value.get_repos.call_count == 1
+
+def test_get_user_repos_cold_page_fetches_only_its_github_pages(client, mocker, listed_repos):
+    """Test that a cold page of an unfiltered listing is served from the GitHub pages holding it."""
+    mock_github, probe = listed_repos
+    probe.return_value.links = {'last': {'url': 'https://api.github.com/user/repos?per_page=1&page=250'}}
+    listing = mock_github.return_value.get_user.return_value.get_repos.return_value = MagicMock()
+    listing.get_page.side_effect = lambda number: [
+        _listed_repo(f'repo-{number * 100 + i}', 'Python', '2025-01-01T00:00:00+00:00', 0) for i in range(100)
+    ]
+    background = mocker.patch('app._submit')
+
+    response = client.get('/api/github-repos?q=&page=3&per_page=50',
+                          headers={'Authorization': 'Bearer test_token'}).get_json()
+
+    assert [repo['name'] for repo in response['repos']][::49] == ['repo-100', 'repo-149']
+    assert (response['total'], response['next_page'], response['cached']) == (250, 4, False)
+    assert [call.args for call in listing.get_page.call_args_list] == [(1,)]
+    # The whole listing is cached in the background for the pages and filters that follow
+    assert background.call_args.args[0].__name__ == '_list_user_repos_in_background'
+
+def test_get_user_repos_revalidated_with_etag(client, mocker, listed_repos):
+    """Test that an expired listing is reused while its ETag and repository count are unchanged."""
+    mock_github, probe = listed_repos
+    probe.return_value.links = {'last': {'url': 'https://api.github.com/user/repos?per_page=1&page=3'}}
+    headers = {'Authorization': 'Bearer test_token'}
+    client.get('/api/github-repos', headers=headers)
+
+    mocker.patch('cache.time.monotonic', return_value=float('inf'))
+    response = client.get('/api/github-repos', headers=headers).get_json()
+
+    assert len(response['repos']) == 3
+    assert response['cached'] is True
+    assert probe.call_count == 2
+    assert mock_github.return_value.get_user.return_value.get_repos.call_count == 1
+
+def test_get_user_repos_refetched_when_count_changes_or_too_old(client, mocker, listed_repos):
+    """Test that a listing is fetched again when the repository count changes or it reaches its max age."""
+    mock_github, probe = listed_repos
+    probe.return_value.links = {'last': {'url': 'https://api.github.com/user/repos?per_page=1&page=3'}}
+    headers = {'Authorization': 'Bearer test_token'}
+    list_repos = mock_github.return_value.get_user.return_value.get_repos
+    client.get('/api/github-repos', headers=headers)
+    mocker.patch('cache.time.monotonic', return_value=float('inf'))
+
+    # An older repository was deleted: the newest one, and so the ETag, is unchanged
+    probe.return_value.links = {'last': {'url': 'https://api.github.com/user/repos?per_page=1&page=2'}}
+    deleted = client.get('/api/github-repos', headers=headers).get_json()
+    probes = probe.call_count
+    mocker.patch('app.REPO_LIST_MAX_AGE', 0)
+    aged = client.get('/api/github-repos', headers=headers).get_json()
+
+    assert deleted['cached'] is False
+    # The probe made while revalidating is reused for the new listing
+    assert probes == 2
+    assert aged['cached'] is False
+    assert list_repos.call_count == 3
+
+def test_get_user_repos_stream(client, listed_repos):
+    """Test that repositories can be streamed as NDJSON."""
+    response = client.get('/api/github-repos?stream=1&language=python', headers={'Authorization': 'Bearer test_token'})
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line['repo']['name'] for line in lines[:-1]] == ['cli-tool', 'py-lib']
+    assert lines[-1] == {'done': True, 'count': 2}
+    assert user_repos_cache.stats()['size'] == 1
+
 def test_get_user_repos_no_token(client):
     """Test getting user repositories without a token."""
     response = client.get('/api/github-repos')
@@ -31,6 +31,7 @@ const getInitialState = (): AppState => {
     isLoading: false,
     error: null,
     github_access_token: token,
+    prefetchId: null,
   };
 
   if (storedState) {
@@ -73,6 +74,11 @@ function App() {
   }, []);
 
   const resetApp = useCallback(() => {
+    // Stop drafting for a session that is ending
+    const { prefetchId } = JSON.parse(sessionStorage.getItem("rmgen_app_state") || "{}");
+    if (prefetchId) {
+      apiService.cancelPrefetch(prefetchId, sessionStorage.getItem("github_access_token"));
+    }
     sessionStorage.removeItem("github_access_token");
     sessionStorage.removeItem("rmgen_app_state");
     setUser(null);
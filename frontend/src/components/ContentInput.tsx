@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useMemo } from "react";
 import { AppState } from "../types";
+import { apiService } from "../services/api";
 import {
   ArrowLeft,
   ArrowRight,
@@ -31,6 +32,7 @@ const ContentInput: React.FC<ContentInputProps> = ({
 }) => {
   const [currentSectionIndex, setCurrentSectionIndex] = useState(0);
   const [copiedSection, setCopiedSection] = useState<string | null>(null);
+  const [loadingReadme, setLoadingReadme] = useState(false);
 
   const availableSections = useMemo(
     () => [
@@ -94,6 +96,22 @@ const ContentInput: React.FC<ContentInputProps> = ({
         placeholder: "Specify the license and usage terms...",
         defaultContent: appState.repositoryMetadata?.license || "MIT",
       },
+      {
+        id: "contributors",
+        title: "Contributors",
+        description: "Everyone who has contributed, listed from the repository",
+        icon: Users,
+        placeholder: "Leave empty to list the repository's contributors...",
+        defaultContent: "",
+      },
+      {
+        id: "badges",
+        title: "Badges",
+        description: "Stars, forks, license and language badges for the repository",
+        icon: Info,
+        placeholder: "Leave empty to add badges from the repository...",
+        defaultContent: "",
+      },
       {
         id: "credits",
         title: "Credits & Acknowledgments",
@@ -152,10 +170,16 @@ const ContentInput: React.FC<ContentInputProps> = ({
   // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [currentSection, appState.sectionContent]);
 
-  const handleUseExistingReadme = () => {
-    if (appState.repositoryMetadata?.existing_readme) {
+  const handleUseExistingReadme = async () => {
+    const metadata = appState.repositoryMetadata;
+    if (!metadata?.readme?.present) return;
+    // Validation only describes the README; its content is fetched when first needed
+    setLoadingReadme(true);
+    const result = await apiService.getRepoReadme(metadata, appState.github_access_token);
+    setLoadingReadme(false);
+    if (result.success && result.content !== undefined) {
       // Populate the textarea with the full content of the existing README
-      handleContentChange(appState.repositoryMetadata.existing_readme);
+      handleContentChange(result.content);
     }
   };
 
@@ -241,13 +265,14 @@ const ContentInput: React.FC<ContentInputProps> = ({
           </div>
 
           {/* Use Existing README Button */}
-          {appState.repositoryMetadata?.existing_readme && (
+          {appState.repositoryMetadata?.readme?.present && (
             <button
               onClick={handleUseExistingReadme}
+              disabled={loadingReadme}
               className="btn-outline flex items-center space-x-2 text-sm"
             >
               <Sparkles className="w-4 h-4" />
-              <span>Use Existing README</span>
+              <span>{loadingReadme ? "Loading README..." : "Use Existing README"}</span>
             </button>
           )}
         </div>
@@ -37,6 +37,7 @@ const Preview: React.FC<PreviewProps> = ({
   const [error, setError] = useState<string | null>(null);
   const [isPreviewModalOpen, setIsPreviewModalOpen] = useState(false);
   const [promptInput, setPromptInput] = useState(""); // New state for prompt input
+  const [streamedContent, setStreamedContent] = useState(""); // Partial output while streaming
 
   const handleApplyPrompt = async () => {
     if (!promptInput.trim()) {
@@ -47,8 +48,13 @@ const Preview: React.FC<PreviewProps> = ({
     setError(null);
 
     try {
-      // Call API to refine README based on prompt
-      const result = await apiService.refineReadme(editedContent, promptInput);
+      // Call API to refine README based on prompt, showing the result as it streams in
+      setStreamedContent("");
+      const result = await apiService.refineReadmeStream(
+        editedContent,
+        promptInput,
+        setStreamedContent
+      );
 
       if (result.success && result.content) {
         const content = result.content;
@@ -68,14 +74,18 @@ const Preview: React.FC<PreviewProps> = ({
   const generateReadme = useCallback(async () => {
     setIsGenerating(true);
     setError(null);
+    setStreamedContent("");
 
     try {
-      const result = await apiService.generateReadme(
+      const result = await apiService.generateReadmeStream(
         appState.projectType,
         appState.teamContext,
         appState.selectedSections,
         appState.sectionContent,
-        appState.repositoryMetadata
+        appState.repositoryMetadata,
+        setStreamedContent,
+        appState.github_access_token,
+        appState.prefetchId
       );
 
       if (result.success && result.content) {
@@ -96,6 +106,8 @@ const Preview: React.FC<PreviewProps> = ({
     appState.selectedSections,
     appState.sectionContent,
     appState.repositoryMetadata,
+    appState.github_access_token,
+    appState.prefetchId,
     updateAppState,
   ]);
 
@@ -158,17 +170,25 @@ const Preview: React.FC<PreviewProps> = ({
             Our AI is crafting a professional README based on your inputs. This
             may take a few moments...
           </p>
-          <div className="bg-gray-100 rounded-lg p-4 text-sm text-gray-600">
-            <p>
-              <strong>What's happening:</strong>
-            </p>
-            <ul className="list-disc list-inside mt-2 space-y-1">
-              <li>Analyzing your project type and team context</li>
-              <li>Processing your section content and preferences</li>
-              <li>Generating professional Markdown content</li>
-              <li>Ensuring proper formatting and structure</li>
-            </ul>
-          </div>
+          {streamedContent ? (
+            <div className="w-full h-96 border border-gray-300 rounded-lg bg-gray-50 overflow-auto text-left">
+              <pre className="font-mono text-sm text-gray-800 whitespace-pre-wrap p-4 w-full h-full box-border">
+                {streamedContent}
+              </pre>
+            </div>
+          ) : (
+            <div className="bg-gray-100 rounded-lg p-4 text-sm text-gray-600">
+              <p>
+                <strong>What's happening:</strong>
+              </p>
+              <ul className="list-disc list-inside mt-2 space-y-1">
+                <li>Analyzing your project type and team context</li>
+                <li>Processing your section content and preferences</li>
+                <li>Generating professional Markdown content</li>
+                <li>Ensuring proper formatting and structure</li>
+              </ul>
+            </div>
+          )}
         </div>
       </div>
     );
@@ -1,5 +1,6 @@
 import React, { useState } from "react";
 import { AppState, ReadmeSection } from "../types";
+import { apiService } from "../services/api";
 import {
   ArrowLeft,
   ArrowRight,
@@ -81,6 +82,18 @@ const SectionSelection: React.FC<SectionSelectionProps> = ({
       required: false,
       defaultContent: appState.repositoryMetadata?.license || "MIT",
     },
+    {
+      id: "contributors",
+      title: "Contributors",
+      description: "Everyone who has contributed, listed from the repository",
+      required: false,
+    },
+    {
+      id: "badges",
+      title: "Badges",
+      description: "Stars, forks, license and language badges for the repository",
+      required: false,
+    },
     {
       id: "credits",
       title: "Credits & Acknowledgments",
@@ -124,6 +137,19 @@ const SectionSelection: React.FC<SectionSelectionProps> = ({
     updateAppState({
       selectedSections: finalSections,
     });
+
+    // Redraft with the user's answers so far, replacing the drafts of the suggested sections
+    const metadata = appState.repositoryMetadata;
+    if (metadata?.owner && metadata?.repo_name) {
+      apiService
+        .prefetch(
+          metadata.owner,
+          metadata.repo_name,
+          { projectType: appState.projectType, teamContext: appState.teamContext, selectedSections: finalSections },
+          appState.github_access_token
+        )
+        .then((result) => updateAppState({ prefetchId: result.prefetch?.id ?? null }));
+    }
     goToStep("content");
   };
 
@@ -138,6 +164,8 @@ const SectionSelection: React.FC<SectionSelectionProps> = ({
       "tech-stack": Info,
       contributing: Users,
       license: FileText,
+      contributors: Users,
+      badges: Info,
       credits: Users,
       troubleshooting: HelpCircle,
       roadmap: Map,
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo } from 'react';
+import React, { useEffect, useState, useMemo, useCallback } from 'react';
 import { AppState, GithubRepo } from '../types';
 import { apiService } from '../services/api';
 import { Loader2, Github as GithubIcon, ArrowRight, AlertCircle, ArrowDown, Search, CheckCircle } from 'lucide-react';
@@ -9,6 +9,9 @@ interface SelectRepoProps {
   goToStep: (step: "landing" | "setup" | "sections" | "content" | "preview" | "authCallback" | "selectRepo") => void;
 }
 
+const REPOS_PER_PAGE = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+
 const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToStep }) => {
   const [repos, setRepos] = useState<GithubRepo[]>([]);
   const [isLoading, setIsLoading] = useState(true);
@@ -18,7 +21,28 @@ const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToS
   const [searchQuery, setSearchQuery] = useState('');
   const [showContinueCue, setShowContinueCue] = useState(false);
 
-  // Fetch repositories on component mount
+  const [nextPage, setNextPage] = useState<number | null>(null);
+  const [totalRepos, setTotalRepos] = useState(0);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
+  // Fetch one page of repositories; the backend filters by name and caches the listing
+  const fetchRepos = useCallback(async (query: string, page: number) => {
+    const result = await apiService.getUserRepositories(appState.github_access_token!, {
+      q: query,
+      page,
+      per_page: REPOS_PER_PAGE,
+    });
+    if (result.success && result.repos) {
+      const pageRepos = result.repos;
+      setRepos(prev => (page === 1 ? pageRepos : [...prev, ...pageRepos]));
+      setNextPage(result.next_page ?? null);
+      setTotalRepos(result.total ?? pageRepos.length);
+    } else {
+      setError(result.error || 'Failed to fetch repositories.');
+    }
+  }, [appState.github_access_token]);
+
+  // Fetch repositories on component mount, and again (debounced) as the search changes
   useEffect(() => {
     if (!appState.github_access_token) {
       setError('GitHub access token not found. Please re-authenticate.');
@@ -26,23 +50,30 @@ const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToS
       return;
     }
 
-    const fetchRepos = async () => {
+    const timer = setTimeout(async () => {
       try {
-        const result = await apiService.getUserRepositories(appState.github_access_token!);
-        if (result.success && result.repos) {
-          setRepos(result.repos);
-        } else {
-          setError(result.error || 'Failed to fetch repositories.');
-        }
+        await fetchRepos(searchQuery, 1);
       } catch (err) {
         setError('An error occurred while fetching repositories.');
       } finally {
         setIsLoading(false);
       }
-    };
+    }, searchQuery ? SEARCH_DEBOUNCE_MS : 0);
 
-    fetchRepos();
-  }, [appState.github_access_token]);
+    return () => clearTimeout(timer);
+  }, [appState.github_access_token, searchQuery, fetchRepos]);
+
+  const handleLoadMore = async () => {
+    if (!nextPage) return;
+    setIsLoadingMore(true);
+    try {
+      await fetchRepos(searchQuery, nextPage);
+    } catch (err) {
+      setError('An error occurred while fetching repositories.');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   // Filter repositories based on search query
   const filteredRepos = useMemo(() => {
@@ -61,6 +92,10 @@ const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToS
   const handleRepoSelect = (repo: GithubRepo) => {
     setSelectedRepo(repo);
     setShowContinueCue(true);
+    // Let the backend inspect the repository and draft likely sections while the user continues
+    apiService
+      .prefetch(repo.full_name.split('/')[0], repo.name, {}, appState.github_access_token)
+      .then(result => updateAppState({ prefetchId: result.prefetch?.id ?? null }));
   };
 
   const handleContinue = async () => {
@@ -80,7 +115,7 @@ const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToS
         repoName: selectedRepo.name,
         repoUrl: '',
       };
-      const result = await apiService.validateRepository(inputData);
+      const result = await apiService.validateRepository(inputData, appState.github_access_token);
 
       if (result.valid && result.metadata) {
         updateAppState({
@@ -148,7 +183,7 @@ const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToS
               />
             </div>
 
-            <h2 className="section-subtitle">Your Repositories ({filteredRepos.length})</h2>
+            <h2 className="section-subtitle">Your Repositories ({totalRepos})</h2>
             {filteredRepos.length === 0 ? (
               <p className="text-gray-600 text-center py-8">No repositories match your search.</p>
             ) : (
@@ -182,6 +217,16 @@ const SelectRepo: React.FC<SelectRepoProps> = ({ appState, updateAppState, goToS
                 ))}
               </div>
             )}
+            {nextPage && (
+              <button
+                onClick={handleLoadMore}
+                disabled={isLoadingMore}
+                className="btn-outline w-full mt-6 flex items-center justify-center space-x-2 disabled:opacity-50"
+              >
+                {isLoadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+                <span>{isLoadingMore ? 'Loading...' : 'Load more repositories'}</span>
+              </button>
+            )}
           </div>
         </div>
 
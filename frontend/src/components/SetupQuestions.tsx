@@ -228,6 +228,15 @@ const SetupQuestions: React.FC<SetupQuestionsProps> = ({
             <strong>{appState.repositoryMetadata.detected_project_type}</strong>{" "}
             based on the repository contents.
           </p>
+          {(appState.repositoryMetadata.detected_stacks?.length ?? 0) > 1 && (
+            <p className="text-blue-700 mb-3">
+              It contains several stacks:{" "}
+              {appState.repositoryMetadata.detected_stacks!
+                .map((stack) => `${stack.type} (${stack.paths.join(", ")})`)
+                .join("; ")}
+              .
+            </p>
+          )}
           <p className="text-blue-600 text-sm">
             You can change this above if our detection was incorrect.
           </p>
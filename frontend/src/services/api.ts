@@ -3,10 +3,27 @@ import {
   RepositoryMetadata,
   ApiResponse,
   SectionContent,
+  RepoListParams,
 } from "../types";
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || "http://localhost:5001/api";
 
+// Validated repositories are sent as an owner/repo reference that the backend
+// expands from its cache, plus the fields the user may have edited.
+function repositoryPayload(repoMetadata: RepositoryMetadata | null) {
+  if (repoMetadata?.owner && repoMetadata?.repo_name) {
+    return {
+      repo: { owner: repoMetadata.owner, repo_name: repoMetadata.repo_name },
+      repo_metadata: { name: repoMetadata.name, description: repoMetadata.description },
+    };
+  }
+  return { repo_metadata: repoMetadata || {} };
+}
+
+function authHeaders(accessToken?: string | null): Record<string, string> {
+  return accessToken ? { Authorization: `Bearer ${accessToken}` } : {};
+}
+
 class ApiService {
   private async request<T>(
     endpoint: string,
@@ -37,8 +54,80 @@ class ApiService {
     }
   }
 
+  // Reads a Server-Sent Events response, reporting each text delta as it
+  // arrives and resolving with the full content once the stream is done.
+  private async streamRequest(
+    endpoint: string,
+    payload: object,
+    onDelta: (content: string) => void,
+    accessToken?: string | null
+  ): Promise<ApiResponse<string>> {
+    try {
+      const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Accept: "text/event-stream",
+          ...authHeaders(accessToken),
+        },
+        body: JSON.stringify(payload),
+      });
+
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let content = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const message = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          let event = "message";
+          let data = "";
+          for (const line of message.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          const parsed = data ? JSON.parse(data) : {};
+
+          if (event === "error") {
+            return { success: false, error: parsed.error, content };
+          }
+          if (event === "done") {
+            return { success: true, content };
+          }
+          if (parsed.delta) {
+            content += parsed.delta;
+            onDelta(content);
+          }
+        }
+      }
+
+      return { success: false, error: "Stream ended unexpectedly", content };
+    } catch (error) {
+      console.error("API stream failed:", error);
+      return {
+        success: false,
+        error:
+          error instanceof Error ? error.message : "Unknown error occurred",
+      };
+    }
+  }
+
   async validateRepository(
-    input: RepositoryInput
+    input: RepositoryInput,
+    accessToken?: string | null
   ): Promise<ApiResponse<RepositoryMetadata>> {
     let payload: any = {};
 
@@ -51,9 +140,16 @@ class ApiService {
       throw new Error("Invalid repository input method");
     }
 
+    // Signed-in users' lookups count against their own GitHub rate limit
     return this.request<RepositoryMetadata>("/validate-repo", {
       method: "POST",
       body: JSON.stringify(payload),
+      ...(accessToken && {
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${accessToken}`,
+        },
+      }),
     });
   }
 
@@ -62,19 +158,88 @@ class ApiService {
     teamContext: string,
     selectedSections: string[],
     sectionContent: SectionContent,
-    repoMetadata: RepositoryMetadata | null
+    repoMetadata: RepositoryMetadata | null,
+    accessToken?: string | null,
+    prefetchId?: string | null
   ): Promise<ApiResponse<string>> {
     const payload = {
       project_type: projectType,
       team_context: teamContext,
       selected_sections: selectedSections,
       section_content: sectionContent,
-      repo_metadata: repoMetadata || {},
+      ...repositoryPayload(repoMetadata),
+      ...(prefetchId && { prefetch_id: prefetchId }),
     };
 
     return this.request<string>("/generate-readme", {
       method: "POST",
       body: JSON.stringify(payload),
+      headers: { "Content-Type": "application/json", ...authHeaders(accessToken) },
+    });
+  }
+
+  async generateReadmeStream(
+    projectType: string,
+    teamContext: string,
+    selectedSections: string[],
+    sectionContent: SectionContent,
+    repoMetadata: RepositoryMetadata | null,
+    onDelta: (content: string) => void,
+    accessToken?: string | null,
+    prefetchId?: string | null
+  ): Promise<ApiResponse<string>> {
+    const payload = {
+      project_type: projectType,
+      team_context: teamContext,
+      selected_sections: selectedSections,
+      section_content: sectionContent,
+      ...repositoryPayload(repoMetadata),
+      ...(prefetchId && { prefetch_id: prefetchId }),
+    };
+
+    return this.streamRequest("/generate-readme/stream", payload, onDelta, accessToken);
+  }
+
+  // Starts inspecting a repository and drafting its likely sections while the
+  // wizard is filled in, replacing any earlier prefetch. Pass what is known so
+  // far; the backend assumes the wizard's suggestions for the rest.
+  async prefetch(
+    owner: string,
+    repoName: string,
+    answers: { projectType?: string; teamContext?: string; selectedSections?: string[] } = {},
+    accessToken?: string | null
+  ): Promise<ApiResponse<any>> {
+    return this.request<any>("/prefetch", {
+      method: "POST",
+      body: JSON.stringify({
+        owner,
+        repo_name: repoName,
+        project_type: answers.projectType,
+        team_context: answers.teamContext,
+        selected_sections: answers.selectedSections,
+      }),
+      headers: { "Content-Type": "application/json", ...authHeaders(accessToken) },
+    });
+  }
+
+  async cancelPrefetch(prefetchId: string, accessToken?: string | null): Promise<ApiResponse<any>> {
+    return this.request<any>(`/prefetch/${encodeURIComponent(prefetchId)}`, {
+      method: "DELETE",
+      headers: { "Content-Type": "application/json", ...authHeaders(accessToken) },
+    });
+  }
+
+  async getRepoReadme(
+    repoMetadata: RepositoryMetadata,
+    accessToken?: string | null
+  ): Promise<ApiResponse<string>> {
+    const query = new URLSearchParams({
+      owner: repoMetadata.owner,
+      repo_name: repoMetadata.repo_name,
+      sha: repoMetadata.readme?.sha || "",
+    });
+    return this.request<string>(`/repo-readme?${query.toString()}`, {
+      headers: { "Content-Type": "application/json", ...authHeaders(accessToken) },
     });
   }
 
@@ -89,8 +254,19 @@ class ApiService {
     });
   }
 
-  async getUserRepositories(accessToken: string): Promise<ApiResponse<any[]>> {
-    return this.request<any[]>("/github-repos", {
+  async getUserRepositories(
+    accessToken: string,
+    params: RepoListParams = {}
+  ): Promise<ApiResponse<any[]>> {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== "") {
+        query.append(key, String(value));
+      }
+    });
+    const queryString = query.toString();
+
+    return this.request<any[]>(`/github-repos${queryString ? `?${queryString}` : ""}`, {
       headers: {
         Authorization: `Bearer ${accessToken}`,
       },
@@ -112,6 +288,19 @@ class ApiService {
       body: JSON.stringify(payload),
     });
   }
+
+  async refineReadmeStream(
+    currentContent: string,
+    prompt: string,
+    onDelta: (content: string) => void
+  ): Promise<ApiResponse<string>> {
+    const payload = {
+      current_content: currentContent,
+      prompt: prompt,
+    };
+
+    return this.streamRequest("/refine-readme/stream", payload, onDelta);
+  }
 }
 
 export const apiService = new ApiService();
@@ -16,14 +16,29 @@ export interface RepositoryMetadata {
   default_branch: string;
   created_at: string;
   updated_at: string;
-  existing_readme?: string;
+  readme?: ReadmeDescriptor;
   contributors: Contributor[];
   owner: string;
   repo_name: string;
   detected_project_type: string;
+  detected_stacks?: DetectedStack[];
   detected_team_context?: 'Solo' | 'Team';
 }
 
+// The repository's README without its content, which is fetched on demand by blob SHA
+export interface ReadmeDescriptor {
+  present: boolean;
+  path?: string;
+  sha?: string;
+  size?: number;
+}
+
+export interface DetectedStack {
+  type: string;
+  confidence: number;
+  paths: string[];
+}
+
 export interface Contributor {
   login: string;
   name: string;
@@ -46,6 +61,8 @@ export interface AppState {
   isLoading: boolean;
   error: string | null;
   github_access_token: string | null;
+  // Background drafts started for the selected repository, reused by the final generation
+  prefetchId: string | null;
 }
 
 export interface ReadmeSection {
@@ -69,6 +86,16 @@ export interface GithubRepo {
   forks: number;
 }
 
+export interface RepoListParams {
+  q?: string;
+  language?: string;
+  updated_after?: string;
+  sort?: "updated" | "name" | "stars";
+  direction?: "asc" | "desc";
+  page?: number;
+  per_page?: number;
+}
+
 export interface ApiResponse<T> {
   success?: boolean;
   valid?: boolean;
@@ -79,4 +106,19 @@ export interface ApiResponse<T> {
   oauth_url?: string;
   access_token?: string;
   repos?: GithubRepo[];
+  total?: number;
+  next_page?: number | null;
+  prefetch?: Prefetch;
+  budget_remaining?: number;
+}
+
+// Speculative work the backend does for a selected repository; steps maps
+// 'inspect' and each drafted section to its outcome
+export interface Prefetch {
+  id: string;
+  owner: string;
+  repo_name: string;
+  status: "queued" | "running" | "completed" | "failed" | "cancelled";
+  steps: { [key: string]: string };
+  error: string | null;
 }
\ No newline at end of file